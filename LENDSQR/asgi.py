@@ -14,3 +14,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LENDSQR.settings')
 
 application = get_asgi_application()
+
+# load the blacklist filter before the first registration needs it, without keeping a
+# connection a forking server would share between its workers.
+from django.db import connections  # noqa: E402
+from accounts.blacklist import blacklist_filter  # noqa: E402
+
+blacklist_filter.warm()
+connections.close_all()
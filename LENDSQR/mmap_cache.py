@@ -0,0 +1,323 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+# The following cache backend keeps its entries in a memory-mapped file shared by the worker
+# processes of one host.
+
+MAGIC = b"LNDSQRC1"
+
+# magic, slots, ways and slot size of a cache file.
+FILE_HEADER = struct.Struct("<8sIII")
+
+FILE_HEADER_SIZE = 64
+
+# key hash, expiry time (0 for never), last use, key length and value length of a slot.
+SLOT_HEADER = struct.Struct("<QdQHI")
+
+# fields of a slot header updated on their own.
+EXPIRES = struct.Struct("<d")
+EXPIRES_OFFSET = 8
+LAST_USED = struct.Struct("<Q")
+LAST_USED_OFFSET = 16
+
+DEFAULT_SLOTS = 16384
+
+DEFAULT_WAYS = 8  # slots a key may be stored in
+
+DEFAULT_SLOT_SIZE = 512  # bytes
+
+# locks serializing the threads of a process; fcntl locks only exclude other processes.
+THREAD_LOCK_STRIPES = 64
+
+
+def default_location():
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "lendsqr-cache")
+
+
+class SharedFile:
+    """The memory-mapped file of a cache, opened once per process."""
+
+    def __init__(self, path, slots, ways, slot_size):
+        self.path = path
+        self.size = FILE_HEADER_SIZE + slots * slot_size
+        self.pid = os.getpid()
+        self.locks = [threading.Lock() for _ in range(THREAD_LOCK_STRIPES)]
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # byte 0 guards the initialization of the file, byte 1 + n guards set n.
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, 0)
+            try:
+                self._initialize(slots, ways, slot_size)
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, 0)
+            self.map = mmap.mmap(self.fd, self.size)
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+    def _initialize(self, slots, ways, slot_size):
+        header = os.pread(self.fd, FILE_HEADER.size, 0)
+        if len(header) == FILE_HEADER.size and header[: len(MAGIC)] == MAGIC:
+            if FILE_HEADER.unpack(header)[1:] != (slots, ways, slot_size):
+                raise ImproperlyConfigured(
+                    f"The cache file {self.path} was created with other SLOTS, WAYS or "
+                    "SLOT_SIZE options. Remove it or use another LOCATION."
+                )
+            return
+        # a new (or unreadable) file starts with every slot empty.
+        os.ftruncate(self.fd, 0)
+        os.ftruncate(self.fd, self.size)
+        os.pwrite(self.fd, FILE_HEADER.pack(MAGIC, slots, ways, slot_size), 0)
+
+    @contextmanager
+    def locked(self, set_index):
+        with self.locks[set_index % THREAD_LOCK_STRIPES]:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, set_index + 1)
+            try:
+                yield self.map
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, set_index + 1)
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+
+# Files opened by this process, keyed by path.
+_files = {}
+_files_lock = threading.Lock()
+
+
+class MmapCache(BaseCache):
+    """
+    A cache shared by the worker processes of a host through a memory-mapped file.
+
+    The file at LOCATION holds OPTIONS["SLOTS"] slots of OPTIONS["SLOT_SIZE"] bytes, grouped
+    in sets of OPTIONS["WAYS"] slots. A key is stored in the set selected by its hash, where
+    it replaces the least recently used entry once the set is full. Every operation holds
+    the lock of its set, so add(), incr() and cas() are atomic across the processes and
+    threads of the host. Entries that do not fit in a slot are not stored.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.path = location or default_location()
+        self.slots = int(options.get("SLOTS", DEFAULT_SLOTS))
+        self.ways = int(options.get("WAYS", DEFAULT_WAYS))
+        self.slot_size = int(options.get("SLOT_SIZE", DEFAULT_SLOT_SIZE))
+        if self.ways < 1 or self.slots < self.ways or self.slots % self.ways:
+            raise ImproperlyConfigured("SLOTS must be a positive multiple of WAYS.")
+        if self.slot_size <= SLOT_HEADER.size:
+            raise ImproperlyConfigured(f"SLOT_SIZE must exceed {SLOT_HEADER.size} bytes.")
+        self.sets = self.slots // self.ways
+
+    def _file(self):
+        # Django creates a backend per thread, so the file is opened once per process.
+        shared = _files.get(self.path)
+        if shared is None or shared.pid != os.getpid():
+            with _files_lock:
+                shared = _files.get(self.path)
+                if shared is None or shared.pid != os.getpid():
+                    if shared is not None:
+                        # inherited from the parent of a forked worker.
+                        shared.close()
+                    shared = _files[self.path] = SharedFile(
+                        self.path, self.slots, self.ways, self.slot_size
+                    )
+        return shared
+
+    def _locate(self, key):
+        encoded = key.encode()
+        digest = hashlib.blake2b(encoded, digest_size=8).digest()
+        key_hash = int.from_bytes(digest, "little")
+        return key_hash % self.sets, key_hash, encoded
+
+    def _find(self, mm, set_index, key_hash, encoded):
+        """
+        Returns the offset of the key's slot in a set (or None) and the offset to store it.
+
+        New entries go to an empty or expired slot, or else replace the least recently used
+        entry of the set.
+        """
+        now = time.time()
+        free = oldest = oldest_use = None
+        for way in range(self.ways):
+            offset = FILE_HEADER_SIZE + (set_index * self.ways + way) * self.slot_size
+            slot_hash, expires, last_used, key_length, value_length = (
+                SLOT_HEADER.unpack_from(mm, offset)
+            )
+            if not key_length or (expires and expires <= now):
+                if free is None:
+                    free = offset
+                continue
+            start = offset + SLOT_HEADER.size
+            if slot_hash == key_hash and mm[start : start + key_length] == encoded:
+                return offset, offset
+            if oldest_use is None or last_used < oldest_use:
+                oldest, oldest_use = offset, last_used
+        return None, free if free is not None else oldest
+
+    def _read(self, mm, offset):
+        slot_hash, expires, last_used, key_length, value_length = SLOT_HEADER.unpack_from(
+            mm, offset
+        )
+        LAST_USED.pack_into(mm, offset + LAST_USED_OFFSET, time.monotonic_ns())
+        start = offset + SLOT_HEADER.size + key_length
+        return mm[start : start + value_length]
+
+    def _write(self, mm, offset, key_hash, encoded, pickled, expires):
+        SLOT_HEADER.pack_into(
+            mm,
+            offset,
+            key_hash,
+            0.0 if expires is None else expires,
+            time.monotonic_ns(),
+            len(encoded),
+            len(pickled),
+        )
+        start = offset + SLOT_HEADER.size
+        mm[start : start + len(encoded) + len(pickled)] = encoded + pickled
+
+    def _clear(self, mm, offset):
+        SLOT_HEADER.pack_into(mm, offset, 0, 0.0, 0, 0, 0)
+
+    def _fits(self, encoded, pickled):
+        return SLOT_HEADER.size + len(encoded) + len(pickled) <= self.slot_size
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        set_index, key_hash, encoded = self._locate(key)
+        with self._file().locked(set_index) as mm:
+            found, target = self._find(mm, set_index, key_hash, encoded)
+            if found is not None or not self._fits(encoded, pickled):
+                return False
+            self._write(
+                mm, target, key_hash, encoded, pickled, self.get_backend_timeout(timeout)
+            )
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        set_index, key_hash, encoded = self._locate(key)
+        with self._file().locked(set_index) as mm:
+            found, target = self._find(mm, set_index, key_hash, encoded)
+            if found is None:
+                return default
+            pickled = self._read(mm, found)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set(key, value, timeout, version)
+
+    def _set(self, key, value, timeout, version):
+        """Stores a value and returns True, or removes the key if the value does not fit."""
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        set_index, key_hash, encoded = self._locate(key)
+        with self._file().locked(set_index) as mm:
+            found, target = self._find(mm, set_index, key_hash, encoded)
+            if not self._fits(encoded, pickled):
+                # an older value must not outlive a write that could not be stored.
+                if found is not None:
+                    self._clear(mm, found)
+                return False
+            self._write(
+                mm, target, key_hash, encoded, pickled, self.get_backend_timeout(timeout)
+            )
+            return True
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return [key for key, value in data.items() if not self._set(key, value, timeout, version)]
+
+    def cas(self, key, expected, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Stores a value only if the key currently holds `expected` and returns True if it did.
+
+        An `expected` value of None matches a missing key.
+        """
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        set_index, key_hash, encoded = self._locate(key)
+        with self._file().locked(set_index) as mm:
+            found, target = self._find(mm, set_index, key_hash, encoded)
+            current = None if found is None else pickle.loads(self._read(mm, found))
+            if current != expected or not self._fits(encoded, pickled):
+                return False
+            self._write(
+                mm, target, key_hash, encoded, pickled, self.get_backend_timeout(timeout)
+            )
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        set_index, key_hash, encoded = self._locate(key)
+        with self._file().locked(set_index) as mm:
+            found, target = self._find(mm, set_index, key_hash, encoded)
+            if found is None:
+                raise ValueError(f"Key '{key}' not found")
+            slot_hash, expires, last_used, key_length, value_length = (
+                SLOT_HEADER.unpack_from(mm, found)
+            )
+            value = pickle.loads(self._read(mm, found)) + delta
+            pickled = pickle.dumps(value, self.pickle_protocol)
+            if not self._fits(encoded, pickled):
+                self._clear(mm, found)
+                raise ValueError(f"The new value of key '{key}' does not fit in a slot.")
+            # the entry keeps its expiry time.
+            self._write(mm, found, key_hash, encoded, pickled, expires or None)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        set_index, key_hash, encoded = self._locate(key)
+        with self._file().locked(set_index) as mm:
+            found, target = self._find(mm, set_index, key_hash, encoded)
+            if found is None:
+                return False
+            expires = self.get_backend_timeout(timeout)
+            EXPIRES.pack_into(mm, found + EXPIRES_OFFSET, 0.0 if expires is None else expires)
+            return True
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        set_index, key_hash, encoded = self._locate(key)
+        with self._file().locked(set_index) as mm:
+            found, target = self._find(mm, set_index, key_hash, encoded)
+            if found is None:
+                return False
+            self._clear(mm, found)
+            return True
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        set_index, key_hash, encoded = self._locate(key)
+        with self._file().locked(set_index) as mm:
+            found, target = self._find(mm, set_index, key_hash, encoded)
+            return found is not None
+
+    def clear(self):
+        shared = self._file()
+        empty = bytes(self.ways * self.slot_size)
+        for set_index in range(self.sets):
+            start = FILE_HEADER_SIZE + set_index * self.ways * self.slot_size
+            with shared.locked(set_index) as mm:
+                mm[start : start + len(empty)] = empty
+
+    def close(self, **kwargs):
+        # the file stays mapped for the life of the process.
+        pass
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 from dotenv import load_dotenv
@@ -60,11 +61,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "api.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "wallet.middleware.WalletMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -205,6 +208,86 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",  # grant unrestricted access at project-level
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication"  # enable token authentication
+        "api.authentication.CachedTokenAuthentication"  # enable token authentication
     ],
+    # MessagePack is selected with "Accept: application/msgpack" or a ".msgpack" suffix.
+    "DEFAULT_RENDERER_CLASSES": [
+        "rest_framework.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        "api.renderers.MessagePackRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "rest_framework.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+        "api.parsers.MessagePackParser",
+    ],
+}
+
+# API responses of at least this many bytes are compressed (None disables compression).
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+
+
+# ADJUTOR KARMA API
+
+ADJUTOR_API_KEY = os.environ.get("ADJUTOR_API_KEY")
+
+ADJUTOR_KARMA_URL = os.environ.get(
+    "ADJUTOR_KARMA_URL", "https://adjutor.lendsqr.com/v2/verification/karma/"
+)
+
+KARMA_BLOOM_ERROR_RATE = 0.001  # false-positive rate of the local blacklist filter
+
+KARMA_BLOOM_MAX_BYTES = 16 * 1024 * 1024  # memory cap of the filter per worker
+
+KARMA_BLOOM_RELOAD_INTERVAL = 60  # seconds between checks for a newer blacklist sync
+
+
+# IDEMPOTENCY KEYS
+
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)  # how long responses to retried requests are replayed
+
+
+# CACHES
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
 }
+
+# A cache shared by the workers of one host through a memory-mapped file, e.g.
+# SHARED_CACHE_PATH=/dev/shm/lendsqr-cache (see LENDSQR/mmap_cache.py).
+if os.environ.get("SHARED_CACHE_PATH"):
+    CACHES["shared"] = {
+        "BACKEND": "LENDSQR.mmap_cache.MmapCache",
+        "LOCATION": os.environ.get("SHARED_CACHE_PATH"),
+        "OPTIONS": {
+            "SLOTS": int(os.environ.get("SHARED_CACHE_SLOTS", 65536)),
+            "WAYS": 8,
+            "SLOT_SIZE": 512,
+        },
+    }
+
+# The balance cache must be shared by every worker, as writes in one worker have to be seen
+# by the others. It stays off until a shared backend is configured: Redis (needs the redis
+# package), or the host's shared cache when every worker runs on a single host.
+BALANCE_CACHE_ALIAS = None
+
+if os.environ.get("BALANCE_CACHE_REDIS_URL"):
+    CACHES["balances"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("BALANCE_CACHE_REDIS_URL"),
+    }
+    BALANCE_CACHE_ALIAS = "balances"
+elif "shared" in CACHES and os.environ.get("SHARED_CACHE_SINGLE_HOST") == "True":
+    BALANCE_CACHE_ALIAS = "shared"
+
+BALANCE_CACHE_TIMEOUT = 24 * 60 * 60  # seconds cached wallets are kept without writes
+
+KARMA_CACHE_ALIAS = "shared" if "shared" in CACHES else None  # verdicts shared by workers
+
+# Cached tokens must be invalidated in every worker at once, so they need the same cache.
+TOKEN_CACHE_ALIAS = BALANCE_CACHE_ALIAS
+
+TOKEN_CACHE_TTL = 5 * 60  # seconds a worker remembers the user of a token
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from django.test import SimpleTestCase
+from LENDSQR.local_cache import LocalCache
+from LENDSQR.mmap_cache import MmapCache
+
+# The following classes handle tests for the shared memory-mapped cache backend.
+
+
+def increment(location, times):
+    """Increments a shared counter from another process."""
+    cache = MmapCache(location, {"OPTIONS": {"SLOTS": 64, "WAYS": 4}})
+    for _ in range(times):
+        cache.incr("counter")
+
+
+class MmapCacheTest(SimpleTestCase):
+    """This subclass tests the cache backend shared by the workers of a host."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, "cache")
+        self.cache = self.cache_for()
+
+    def cache_for(self, **options):
+        options = {"SLOTS": 64, "WAYS": 4, **options}
+        return MmapCache(self.location, {"OPTIONS": options})
+
+    def test_set_get_and_delete(self):
+        self.cache.set("wallet", {"balance": "500.00"})
+        self.assertEqual(self.cache.get("wallet"), {"balance": "500.00"})
+        self.assertTrue(self.cache.delete("wallet"))
+        self.assertIsNone(self.cache.get("wallet"))
+
+    def test_entries_are_shared_by_instances(self):
+        self.cache.set("token", "john")
+        self.assertEqual(self.cache_for().get("token"), "john")
+
+    def test_entries_expire(self):
+        self.cache.set("token", "john", timeout=0.05)
+        self.assertTrue(self.cache.add("other", 1, timeout=None))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get("token"))
+        self.assertEqual(self.cache.get("other"), 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = self.cache_for(SLOTS=2, WAYS=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+
+    def test_oversized_values_are_not_stored(self):
+        cache = self.cache_for(SLOT_SIZE=128)
+        cache.set("wallet", "small")
+        failed = cache.set_many({"wallet": "x" * 200, "token": "john"})
+        self.assertEqual(failed, ["wallet"])
+        # the older value does not outlive the failed write.
+        self.assertIsNone(cache.get("wallet"))
+        self.assertEqual(cache.get("token"), "john")
+
+    def test_compare_and_swap(self):
+        self.assertTrue(self.cache.cas("version", None, 1))
+        self.assertFalse(self.cache.cas("version", None, 2))
+        self.assertTrue(self.cache.cas("version", 1, 2))
+        self.assertEqual(self.cache.get("version"), 2)
+
+    def test_add_does_not_replace(self):
+        self.assertTrue(self.cache.add("token", "john"))
+        self.assertFalse(self.cache.add("token", "jane"))
+        self.assertEqual(self.cache.get("token"), "john")
+
+    def test_increments_are_atomic_across_processes(self):
+        self.cache.set("counter", 0)
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=increment, args=(self.location, 200)) for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get("counter"), 800)
+
+    def test_clear(self):
+        self.cache.set_many({"a": 1, "b": 2})
+        self.cache.clear()
+        self.assertEqual(self.cache.get_many(["a", "b"]), {})
+
+
+class LocalCacheTest(SimpleTestCase):
+    """This subclass tests the TTL and LRU eviction of the per-process cache."""
+
+    def test_entries_expire(self):
+        now = [0]
+        cache = LocalCache(max_size=10, ttl=10, clock=lambda: now[0])
+        cache.set("janedoe@gmail.com", False)
+        now[0] = 9
+        self.assertIs(cache.get("janedoe@gmail.com"), False)
+        now[0] = 10
+        self.assertIsNone(cache.get("janedoe@gmail.com"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LocalCache(max_size=2, ttl=60)
+        cache.set("a", False)
+        cache.set("b", True)
+        cache.get("a")
+        cache.set("c", False)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
@@ -1,3 +1,6 @@
 from django.contrib import admin
+from .models import BlacklistedIdentity, BlacklistSync
 
 # Register your models here.
+admin.site.register(BlacklistedIdentity)
+admin.site.register(BlacklistSync)
@@ -0,0 +1,124 @@
+import csv
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from .bloom import BloomFilter, DEFAULT_ERROR_RATE, DEFAULT_MAX_BYTES
+from .models import BlacklistedIdentity, BlacklistSync
+
+# The following helpers keep a local mirror of the karma blacklist and a Bloom filter of it.
+
+# identities written by a single INSERT.
+SYNC_BATCH_SIZE = 5000
+
+# how often a worker checks for a newer sync of the mirror.
+DEFAULT_RELOAD_INTERVAL = 60  # seconds
+
+# identities read per round trip while loading the filter.
+LOAD_CHUNK_SIZE = 10000
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(identity):
+    return identity.strip().lower()
+
+
+def read_export(lines):
+    """Yields the normalized identities of a blacklist export, one per line or CSV row."""
+    for row in csv.reader(lines):
+        if not row:
+            continue
+        identity = normalize(row[0])
+        if identity and identity not in {"identity", "email", "karma_identity"}:
+            yield identity
+
+
+def sync(identities, source=""):
+    """
+    Replaces the mirrored blacklist with the given identities in one transaction.
+
+    Returns the BlacklistSync recorded for it; a newer sync tells workers to reload their
+    filters.
+    """
+    with transaction.atomic():
+        BlacklistedIdentity.objects.all().delete()
+        batch = []
+        for identity in identities:
+            batch.append(BlacklistedIdentity(identity=identity))
+            if len(batch) == SYNC_BATCH_SIZE:
+                BlacklistedIdentity.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        BlacklistedIdentity.objects.bulk_create(batch, ignore_conflicts=True)
+        return BlacklistSync.objects.create(
+            identities=BlacklistedIdentity.objects.count(), source=source
+        )
+
+
+class BlacklistFilter:
+    """
+    The Bloom filter of the mirrored blacklist held by this process.
+
+    The filter is rebuilt, without a restart, once a newer sync is found; workers look for
+    one at most every KARMA_BLOOM_RELOAD_INTERVAL seconds. Web workers build it at startup
+    with warm() (see LENDSQR/wsgi.py and asgi.py), so no registration waits for the load.
+    It is not built in AppConfig.ready(), which also runs for migrate and every other
+    management command, and other processes still build it on first use.
+    """
+
+    def __init__(self):
+        self.bloom = None
+        self.generation = None
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def clears(self, identity):
+        """
+        Returns True if an identity is definitely not in the mirrored blacklist.
+
+        Returns False for probable matches, and for every identity while the mirror has
+        never been synced, so that those are checked against the remote API.
+        """
+        bloom = self.current()
+        return bloom is not None and normalize(identity) not in bloom
+
+    def current(self):
+        interval = getattr(settings, "KARMA_BLOOM_RELOAD_INTERVAL", DEFAULT_RELOAD_INTERVAL)
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < interval:
+            return self.bloom
+        with self._lock:
+            if self.checked_at is None or now - self.checked_at >= interval:
+                latest = BlacklistSync.objects.first()
+                generation = (latest.id, latest.created) if latest else None
+                if generation != self.generation:
+                    self.bloom = self.build(latest) if latest else None
+                    self.generation = generation
+                self.checked_at = now
+        return self.bloom
+
+    def warm(self):
+        """Loads the filter ahead of the first check; failures are retried on first use."""
+        try:
+            self.current()
+        except DatabaseError:
+            logger.warning("Could not load the blacklist filter.", exc_info=True)
+
+    def build(self, latest):
+        identities = BlacklistedIdentity.objects.values_list("identity", flat=True)
+        return BloomFilter.from_items(
+            identities.iterator(chunk_size=LOAD_CHUNK_SIZE),
+            capacity=latest.identities,
+            error_rate=getattr(settings, "KARMA_BLOOM_ERROR_RATE", DEFAULT_ERROR_RATE),
+            max_bytes=getattr(settings, "KARMA_BLOOM_MAX_BYTES", DEFAULT_MAX_BYTES),
+        )
+
+    def reset(self):
+        with self._lock:
+            self.bloom = None
+            self.generation = None
+            self.checked_at = None
+
+
+blacklist_filter = BlacklistFilter()
@@ -0,0 +1,74 @@
+import hashlib
+import math
+
+# The following Bloom filter answers "definitely not present" or "probably present" in constant memory.
+
+DEFAULT_ERROR_RATE = 0.001
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+def optimal_size(capacity, error_rate):
+    """Returns the number of bits and hash functions that hold `capacity` items at `error_rate`."""
+    capacity = max(capacity, 1)
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+class BloomFilter:
+    """
+    A set of strings that may report false positives but never false negatives.
+
+    The filter is sized for `capacity` items at a false-positive rate of `error_rate`, but
+    never takes more than `max_bytes` of memory; when the cap applies, the false-positive
+    rate is higher than requested (see `expected_error_rate`).
+    """
+
+    def __init__(self, capacity, error_rate=DEFAULT_ERROR_RATE, max_bytes=DEFAULT_MAX_BYTES):
+        if not 0 < error_rate < 1:
+            raise ValueError("The error rate must be between 0 and 1.")
+        bits, hashes = optimal_size(capacity, error_rate)
+        bits = min(bits, max_bytes * 8)
+        self.capacity = max(capacity, 1)
+        self.size = bits
+        # the best number of hashes depends on the bits actually available per item.
+        self.hashes = max(1, min(hashes, round(bits / self.capacity * math.log(2))))
+        self.count = 0
+        self._bits = bytearray(math.ceil(bits / 8))
+
+    def _positions(self, item):
+        # two 64-bit hashes combined to simulate any number of hash functions.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + index * second) % self.size for index in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+    def expected_error_rate(self):
+        """Returns the false-positive rate expected for the items added so far."""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    @classmethod
+    def from_items(cls, items, capacity, error_rate=DEFAULT_ERROR_RATE, max_bytes=DEFAULT_MAX_BYTES):
+        bloom = cls(capacity, error_rate=error_rate, max_bytes=max_bytes)
+        for item in items:
+            bloom.add(item)
+        return bloom
@@ -0,0 +1,323 @@
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
+from urllib.parse import quote
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from LENDSQR.local_cache import LocalCache
+from .blacklist import blacklist_filter
+
+# The following client checks identities against the Adjutor karma blacklist.
+
+DEFAULT_KARMA_URL = "https://adjutor.lendsqr.com/v2/verification/karma/"
+
+# message returned by the karma API for identities that are not blacklisted.
+NOT_FOUND_MESSAGE = "Identity not found in karma ecosystem"
+
+CONNECT_TIMEOUT = 2.0  # seconds
+
+READ_TIMEOUT = 3.0  # seconds
+
+# verdicts remembered per process.
+CACHE_SIZE = 10000
+
+CACHE_TTL = 60 * 60  # seconds
+
+# connections kept open to the karma API per process.
+POOL_SIZE = 10
+
+# consecutive failures that open the circuit.
+FAILURE_THRESHOLD = 5
+
+# time an open circuit waits before letting a trial request through.
+RECOVERY_TIMEOUT = 30  # seconds
+
+
+class KarmaUnavailable(Exception):
+    """Raised when the karma API cannot give a verdict."""
+
+
+class SharedVerdictCache:
+    """
+    A verdict cache kept in a Django cache, so that the workers using it share verdicts.
+
+    Entries expire after a fixed time; errors of the cache count as misses.
+    """
+
+    def __init__(self, alias, ttl=CACHE_TTL):
+        self.alias = alias
+        self.ttl = ttl
+
+    def key_for(self, key):
+        return "karma:" + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        try:
+            return caches[self.alias].get(self.key_for(key))
+        except Exception:
+            return None
+
+    def set(self, key, value):
+        try:
+            caches[self.alias].set(self.key_for(key), value, self.ttl)
+        except Exception:
+            pass
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service until it has had time to recover.
+
+    The circuit opens after `failure_threshold` consecutive failures. Once `recovery_timeout`
+    seconds have passed, a single trial call is let through: its success closes the circuit
+    and its failure keeps it open for another period.
+    """
+
+    def __init__(
+        self,
+        failure_threshold=FAILURE_THRESHOLD,
+        recovery_timeout=RECOVERY_TIMEOUT,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        """Returns True if a call may be made to the service."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial_running or self.clock() - self.opened_at < self.recovery_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._trial_running = False
+
+
+def parse_verdict(status_code, payload):
+    """Returns True if a karma API response reports a blacklisted identity."""
+    message = payload.get("message") if isinstance(payload, dict) else None
+    if message == NOT_FOUND_MESSAGE:
+        return False
+    if status_code == 200:
+        return True
+    raise KarmaUnavailable(f"The karma service responded with status {status_code}.")
+
+
+class KarmaClient:
+    """
+    Checks identities against the karma API over a pooled, time-bounded connection.
+
+    Verdicts are cached for CACHE_TTL seconds. Errors, timeouts and unexpected responses
+    raise KarmaUnavailable, and repeated failures open a circuit breaker which fails
+    further checks immediately instead of letting them wait on the service.
+    """
+
+    def __init__(
+        self,
+        api_key,
+        base_url=DEFAULT_KARMA_URL,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        cache=None,
+        breaker=None,
+        pool_size=POOL_SIZE,
+    ):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.timeout = timeout
+        self.cache = cache if cache is not None else LocalCache(CACHE_SIZE, CACHE_TTL)
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def is_blacklisted(self, identity):
+        """Returns True if an identity (e.g. an email address) is on the karma blacklist."""
+        key = identity.strip().lower()
+        verdict = self.cache.get(key)
+        if verdict is not None:
+            return verdict
+        if not self.breaker.allow():
+            raise KarmaUnavailable("The karma service is unavailable.")
+        try:
+            verdict = self._fetch(key)
+        except KarmaUnavailable:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        self.cache.set(key, verdict)
+        return verdict
+
+    def _fetch(self, identity):
+        try:
+            response = self.session.get(self.url_for(identity), timeout=self.timeout)
+            payload = response.json()
+        except (requests.RequestException, ValueError) as error:
+            raise KarmaUnavailable(f"The karma service could not be reached: {error}")
+        return parse_verdict(response.status_code, payload)
+
+    def url_for(self, identity):
+        return self.base_url + quote(identity, safe="@")
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncKarmaClient:
+    """
+    Async version of KarmaClient for ASGI views.
+
+    Checks wait on the karma API without holding a worker thread. The verdict cache and the
+    circuit breaker are shared with the process's KarmaClient.
+    """
+
+    def __init__(
+        self,
+        api_key,
+        base_url=DEFAULT_KARMA_URL,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        cache=None,
+        breaker=None,
+        pool_size=POOL_SIZE,
+    ):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.cache = cache if cache is not None else LocalCache(CACHE_SIZE, CACHE_TTL)
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        connect_timeout, read_timeout = timeout
+        self.client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def is_blacklisted(self, identity):
+        key = identity.strip().lower()
+        verdict = self.cache.get(key)
+        if verdict is not None:
+            return verdict
+        if not self.breaker.allow():
+            raise KarmaUnavailable("The karma service is unavailable.")
+        try:
+            verdict = await self._fetch(key)
+        except KarmaUnavailable:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        self.cache.set(key, verdict)
+        return verdict
+
+    async def _fetch(self, identity):
+        try:
+            response = await self.client.get(self.base_url + quote(identity, safe="@"))
+            payload = response.json()
+        except (httpx.HTTPError, ValueError) as error:
+            raise KarmaUnavailable(f"The karma service could not be reached: {error}")
+        return parse_verdict(response.status_code, payload)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+# httpx clients cannot be shared between event loops, so each loop gets its own.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """Returns the karma client shared by the threads of this process."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                alias = getattr(settings, "KARMA_CACHE_ALIAS", None)
+                _client = KarmaClient(
+                    api_key=settings.ADJUTOR_API_KEY,
+                    base_url=getattr(settings, "ADJUTOR_KARMA_URL", DEFAULT_KARMA_URL),
+                    cache=SharedVerdictCache(alias) if alias else None,
+                )
+    return _client
+
+
+def get_async_client():
+    """Returns the async karma client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        shared = get_client()
+        client = _async_clients[loop] = AsyncKarmaClient(
+            api_key=settings.ADJUTOR_API_KEY,
+            base_url=shared.base_url,
+            cache=shared.cache,
+            breaker=shared.breaker,
+        )
+    return client
+
+
+def reset_client():
+    """Discards the shared clients, so the next check uses the current settings."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        # async clients are closed with their event loops.
+        _async_clients.clear()
+
+
+@receiver(setting_changed)
+def reset_client_on_setting_change(setting, **kwargs):
+    if setting in {"ADJUTOR_API_KEY", "ADJUTOR_KARMA_URL", "KARMA_CACHE_ALIAS"}:
+        reset_client()
+    if setting.startswith("KARMA_BLOOM_"):
+        blacklist_filter.reset()
+
+
+def is_blacklisted(identity):
+    """
+    Returns True if an identity is on the karma blacklist.
+
+    Identities that the Bloom filter of the local mirror clears are accepted without a
+    remote call; probable matches are confirmed with the karma API (see KarmaClient).
+    """
+    if blacklist_filter.clears(identity):
+        return False
+    return get_client().is_blacklisted(identity)
+
+
+async def ais_blacklisted(identity):
+    """Async version of is_blacklisted."""
+    if await sync_to_async(blacklist_filter.clears)(identity):
+        return False
+    return await get_async_client().is_blacklisted(identity)
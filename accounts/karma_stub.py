@@ -0,0 +1,111 @@
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+from .karma import NOT_FOUND_MESSAGE
+
+# The following server stands in for the karma API in tests and benchmarks.
+
+KARMA_PATH = "/v2/verification/karma/"
+
+
+class KarmaStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections alive, like the real API.
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.record_request()
+        if stub.delay:
+            time.sleep(stub.delay)
+        if stub.status_code is not None:
+            self.respond(stub.status_code, {"status": "error", "message": "Server error"})
+            return
+        if not self.path.startswith(KARMA_PATH):
+            self.respond(404, {"status": "error", "message": "Not found"})
+            return
+        identity = unquote(self.path[len(KARMA_PATH) :]).lower()
+        if identity in stub.blacklisted:
+            self.respond(
+                200,
+                {
+                    "status": "success",
+                    "message": "Successful",
+                    "data": {"karma_identity": identity, "reason": "Stub blacklist"},
+                },
+            )
+        else:
+            self.respond(404, {"status": "error", "message": NOT_FOUND_MESSAGE, "data": None})
+
+    def respond(self, status_code, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class KarmaStubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # room for bursts of concurrent connections from benchmarks.
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # clients that time out hang up mid-response, which is expected rather than an error.
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class KarmaStubServer:
+    """
+    A local karma API answering from an in-memory blacklist.
+
+    `delay` slows every response down and `status_code` makes every request fail with that
+    status, to exercise timeouts and the circuit breaker. Use as a context manager to serve
+    from a background thread; `url` is the base URL to configure as ADJUTOR_KARMA_URL.
+    """
+
+    def __init__(self, blacklisted=(), delay=0, status_code=None, host="127.0.0.1", port=0):
+        self.blacklisted = {identity.lower() for identity in blacklisted}
+        self.delay = delay
+        self.status_code = status_code
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = KarmaStubHTTPServer((host, port), KarmaStubHandler)
+        self.httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{KARMA_PATH}"
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
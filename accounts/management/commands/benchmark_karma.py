@@ -0,0 +1,50 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from accounts.karma import KarmaClient
+from accounts.karma_stub import KarmaStubServer
+
+
+class Command(BaseCommand):
+    help = "Measures the latency of karma checks against the local stub server."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--checks", type=int, default=1000, help="Number of checks.")
+        parser.add_argument(
+            "--identities",
+            type=int,
+            default=100,
+            help="Number of distinct identities checked (the rest are cache hits).",
+        )
+        parser.add_argument("--threads", type=int, default=10, help="Concurrent checks.")
+        parser.add_argument(
+            "--delay", type=float, default=0.05, help="Latency added by the stub, in seconds."
+        )
+
+    def handle(self, *args, **options):
+        identities = [f"user{index}@example.com" for index in range(options["identities"])]
+        checks = [identities[index % len(identities)] for index in range(options["checks"])]
+        with KarmaStubServer(blacklisted=identities[::10], delay=options["delay"]) as stub:
+            client = KarmaClient(api_key="benchmark", base_url=stub.url)
+            latencies = []
+
+            def check(identity):
+                started = time.perf_counter()
+                client.is_blacklisted(identity)
+                latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+                list(executor.map(check, checks))
+            elapsed = time.perf_counter() - started
+            client.close()
+
+        latencies.sort()
+        self.stdout.write(f"{len(checks)} checks in {elapsed:.3f}s ({len(checks) / elapsed:.1f}/s)")
+        self.stdout.write(f"{stub.requests} requests reached the karma stub")
+        self.stdout.write(
+            f"latency ms: median {statistics.median(latencies) * 1000:.2f}, "
+            f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f}, "
+            f"max {latencies[-1] * 1000:.2f}"
+        )
@@ -0,0 +1,188 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import httpx
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from accounts.karma_stub import KarmaStubServer
+
+# The following command serves the registration endpoints from real WSGI and ASGI workers,
+# each in a gunicorn process of its own, and registers users against them concurrently.
+
+# seconds a worker is given to start accepting connections.
+STARTUP_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares how many concurrent registrations a WSGI worker and an ASGI worker absorb "
+        "while the karma API is slow. Requests go through the URLconf, the middleware and "
+        "the views of /api/register/ and /api/async/register/, served by gunicorn. The "
+        "registered users are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--registrations", type=int, default=200, help="Concurrent registrations."
+        )
+        parser.add_argument(
+            "--delay", type=float, default=0.5, help="Latency of the karma stub, in seconds."
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=1,
+            help="Threads of the WSGI worker (1 for a sync gunicorn worker).",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=120,
+            help="Seconds a registration may take before it counts as failed.",
+        )
+
+    def handle(self, *args, **options):
+        if options["registrations"] < 1 or options["threads"] < 1:
+            raise CommandError("The registrations and threads must be greater than zero.")
+        count = options["registrations"]
+        # the sync endpoint is served by a WSGI worker and the async one by an ASGI worker.
+        workers = [
+            (
+                f"WSGI worker ({options['threads']} threads)",
+                "LENDSQR.wsgi:application",
+                ["--threads", str(options["threads"])],
+                "/api/register/",
+            ),
+            (
+                "ASGI worker",
+                "LENDSQR.asgi:application",
+                ["--worker-class", "uvicorn.workers.UvicornWorker"],
+                "/api/async/register/",
+            ),
+        ]
+        prefix = f"benchmark-{uuid.uuid4().hex[:8]}-"
+        results = []
+        try:
+            with KarmaStubServer(delay=options["delay"]) as stub:
+                for index, (name, application, worker_options, path) in enumerate(workers):
+                    with GunicornWorker(application, worker_options, stub.url) as url:
+                        result = asyncio.run(
+                            self.register(
+                                url + path, f"{prefix}{index}-", count, options["timeout"]
+                            )
+                        )
+                    results.append((name, *result))
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+
+        self.stdout.write(
+            f"{count} concurrent registrations, karma API latency {options['delay']}s"
+        )
+        for name, elapsed, registered, latencies in results:
+            self.stdout.write(
+                f"{name}: {registered}/{count} registered in {elapsed:.2f}s, "
+                f"{registered / elapsed:.1f} registrations/s, "
+                f"median latency {latencies[len(latencies) // 2]:.2f}s, "
+                f"slowest {latencies[-1]:.2f}s"
+            )
+        wsgi, asgi = [registered / elapsed for name, elapsed, registered, latencies in results]
+        if wsgi:
+            self.stdout.write(self.style.SUCCESS(f"ASGI speed-up: {asgi / wsgi:.1f}x"))
+
+    async def register(self, url, prefix, count, timeout):
+        """Returns the elapsed time, successes and sorted latencies of concurrent sign-ups."""
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+
+            async def register_one(number):
+                started = time.perf_counter()
+                try:
+                    response = await client.post(
+                        url,
+                        json={
+                            "username": f"{prefix}{number}",
+                            # distinct identities, so that no check is answered from the cache.
+                            "email": f"{prefix}{number}@example.com",
+                            "password": "LENDSQR001",
+                        },
+                    )
+                    registered = response.status_code == 201
+                except httpx.HTTPError:
+                    registered = False
+                return registered, time.perf_counter() - started
+
+            started = time.perf_counter()
+            outcomes = await asyncio.gather(*[register_one(number) for number in range(count)])
+            elapsed = time.perf_counter() - started
+        registered = sum(1 for success, latency in outcomes if success)
+        return elapsed, registered, sorted(latency for success, latency in outcomes)
+
+
+class GunicornWorker:
+    """A single gunicorn worker serving the project on a free local port."""
+
+    def __init__(self, application, worker_options, karma_url, host="127.0.0.1"):
+        with socket.socket() as probe:
+            probe.bind((host, 0))
+            self.address = probe.getsockname()
+        self.command = [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            application,
+            "--bind",
+            "{}:{}".format(*self.address),
+            "--workers",
+            "1",
+            "--backlog",
+            "4096",
+            "--log-level",
+            "warning",
+            *worker_options,
+        ]
+        self.env = {**os.environ, "ADJUTOR_KARMA_URL": karma_url}
+        self.process = None
+        # the log is only shown when the worker fails to start, as gunicorn reports the
+        # expected shutdown of its worker as an error.
+        self.log = tempfile.TemporaryFile("w+")
+
+    def __enter__(self):
+        try:
+            self.process = subprocess.Popen(
+                self.command, env=self.env, stdout=self.log, stderr=subprocess.STDOUT
+            )
+        except OSError as error:
+            raise CommandError(f"Could not start gunicorn: {error}")
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            if self.process.poll() is not None:
+                self.log.seek(0)
+                output = self.log.read()
+                self.log.close()
+                raise CommandError(
+                    "The worker exited while starting; are gunicorn and uvicorn installed?\n"
+                    + output
+                )
+            try:
+                socket.create_connection(self.address, timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    self.__exit__()
+                    raise CommandError("The worker did not start accepting connections.")
+                time.sleep(0.1)
+        return "http://{}:{}".format(*self.address)
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=STARTUP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
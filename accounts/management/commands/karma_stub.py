@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from accounts.karma_stub import KarmaStubServer
+
+
+class Command(BaseCommand):
+    help = "Serves a local stand-in for the karma API, for development and benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+        parser.add_argument(
+            "--delay", type=float, default=0, help="Seconds to wait before every response."
+        )
+        parser.add_argument(
+            "--blacklist",
+            nargs="*",
+            default=[],
+            help="Identities to report as blacklisted.",
+        )
+
+    def handle(self, *args, **options):
+        server = KarmaStubServer(
+            blacklisted=options["blacklist"], delay=options["delay"], port=options["port"]
+        )
+        self.stdout.write(f"Serving the karma stub at {server.url} (Ctrl-C to stop).")
+        self.stdout.write("Set ADJUTOR_KARMA_URL to this URL to use it.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.httpd.server_close()
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.blacklist import blacklist_filter, read_export, sync
+
+
+class Command(BaseCommand):
+    help = "Replaces the local karma blacklist mirror with the identities of an export file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", help="Path of the export: one identity per line, or a CSV of identities."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as lines:
+                latest = sync(read_export(lines), source=options["path"])
+        except OSError as error:
+            raise CommandError(str(error))
+        except UnicodeDecodeError:
+            raise CommandError("The export must be a UTF-8 encoded file.")
+
+        bloom = blacklist_filter.build(latest)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Blacklist mirror synced: {latest.identities} identities."
+            )
+        )
+        self.stdout.write(
+            f"Workers reload within their reload interval; each filter takes {bloom.nbytes} bytes "
+            f"at an expected false-positive rate of {bloom.expected_error_rate():.5f}."
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 5.1 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlacklistedIdentity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identity', models.CharField(help_text='Enter a blacklisted email address or other identity', max_length=254, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'blacklisted identities',
+            },
+        ),
+        migrations.CreateModel(
+            name='BlacklistSync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identities', models.PositiveIntegerField(help_text='Number of identities in the mirror after this sync')),
+                ('source', models.CharField(blank=True, max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+    ]
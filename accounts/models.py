@@ -1,3 +1,35 @@
 from django.db import models
 
 # Create your models here.
+
+
+class BlacklistedIdentity(models.Model):
+    """Model representing an identity found in the karma blacklist export."""
+
+    identity = models.CharField(
+        help_text="Enter a blacklisted email address or other identity",
+        max_length=254,
+        unique=True,
+    )
+
+    class Meta:
+        verbose_name_plural = "blacklisted identities"
+
+    def __str__(self):
+        return self.identity
+
+
+class BlacklistSync(models.Model):
+    """Model representing a completed sync of the karma blacklist mirror."""
+
+    identities = models.PositiveIntegerField(
+        help_text="Number of identities in the mirror after this sync"
+    )
+    source = models.CharField(max_length=255, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-id"]
+
+    def __str__(self):
+        return f"{self.created} - {self.identities}"
@@ -1,3 +1,260 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.contrib.auth.models import User
+from accounts import blacklist, karma
+from accounts.bloom import BloomFilter
+from accounts.models import BlacklistedIdentity, BlacklistSync
+from accounts.karma import (
+    CircuitBreaker,
+    KarmaClient,
+    KarmaUnavailable,
+    SharedVerdictCache,
+)
+from accounts.karma_stub import KarmaStubServer
 
 # Create your tests here.
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(SimpleTestCase):
+    """This subclass tests the circuit breaker guarding the karma API."""
+
+    def test_circuit_opens_and_recovers(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30, clock=clock)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        clock.now = 30
+        # a single trial call is let through once the recovery timeout has passed.
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow())
+
+    def test_failed_trial_reopens_circuit(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30, clock=clock)
+        breaker.record_failure()
+        clock.now = 30
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        clock.now = 59
+        self.assertFalse(breaker.allow())
+
+
+class KarmaClientTest(SimpleTestCase):
+    """This subclass tests the karma client against the local stub server."""
+
+    def setUp(self):
+        self.stub = KarmaStubServer(blacklisted=["fraud@gmail.com"]).start()
+        self.addCleanup(self.stub.stop)
+
+    def client_for(self, stub, **kwargs):
+        client = KarmaClient(api_key="test", base_url=stub.url, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_verdicts(self):
+        client = self.client_for(self.stub)
+        self.assertFalse(client.is_blacklisted("janedoe@gmail.com"))
+        self.assertTrue(client.is_blacklisted("Fraud@gmail.com"))
+
+    def test_stub_ignores_clients_hanging_up(self):
+        with mock.patch("sys.stderr", new_callable=StringIO) as stderr:
+            try:
+                raise BrokenPipeError
+            except BrokenPipeError:
+                self.stub.httpd.handle_error(None, ("127.0.0.1", 0))
+        self.assertEqual(stderr.getvalue(), "")
+
+    def test_verdicts_are_cached(self):
+        client = self.client_for(self.stub)
+        for _ in range(3):
+            client.is_blacklisted("janedoe@gmail.com")
+            client.is_blacklisted("fraud@gmail.com")
+        self.assertEqual(self.stub.requests, 2)
+
+    def test_verdicts_are_shared_between_clients(self):
+        caches["default"].clear()
+        for _ in range(2):
+            client = self.client_for(self.stub, cache=SharedVerdictCache("default"))
+            self.assertTrue(client.is_blacklisted("fraud@gmail.com"))
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_slow_service_times_out(self):
+        with KarmaStubServer(delay=0.5) as slow_stub:
+            client = self.client_for(slow_stub, timeout=(0.5, 0.1))
+            with self.assertRaises(KarmaUnavailable):
+                client.is_blacklisted("janedoe@gmail.com")
+
+    def test_failing_service_opens_circuit(self):
+        with KarmaStubServer(status_code=500) as failing_stub:
+            client = self.client_for(
+                failing_stub, breaker=CircuitBreaker(failure_threshold=2)
+            )
+            for _ in range(4):
+                with self.assertRaises(KarmaUnavailable):
+                    client.is_blacklisted("janedoe@gmail.com")
+            # checks fail without reaching the service once the circuit is open.
+            self.assertEqual(failing_stub.requests, 2)
+
+
+class RegisterViewTest(TestCase):
+    """This subclass tests the karma check of the registration page."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = KarmaStubServer(blacklisted=["fraud@gmail.com"]).start()
+        cls.addClassCleanup(cls.stub.stop)
+
+    def register(self, email):
+        data = {
+            "username": "jane",
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "email": email,
+            "password1": "1X<ISRUkw+tuK",
+            "password2": "1X<ISRUkw+tuK",
+        }
+        with override_settings(ADJUTOR_KARMA_URL=self.stub.url):
+            return self.client.post("/accounts/register/", data)
+
+    def test_user_registers(self):
+        response = self.register("janedoe@gmail.com")
+        self.assertRedirects(response, "/accounts/login/")
+        self.assertTrue(User.objects.filter(username="jane").exists())
+
+    def test_blacklisted_user_cannot_register(self):
+        response = self.register("fraud@gmail.com")
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(User.objects.exists())
+
+    async def test_user_registers_with_async_view(self):
+        data = {
+            "username": "jane",
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "email": "janedoe@gmail.com",
+            "password1": "1X<ISRUkw+tuK",
+            "password2": "1X<ISRUkw+tuK",
+        }
+        with override_settings(ADJUTOR_KARMA_URL=self.stub.url):
+            response = await self.async_client.post("/accounts/async/register/", data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], "/accounts/login/")
+        self.assertTrue(await User.objects.filter(username="jane").aexists())
+
+    def test_user_cannot_register_while_karma_is_unavailable(self):
+        self.stub.status_code = 503
+        self.addCleanup(setattr, self.stub, "status_code", None)
+        response = self.register("janedoe@gmail.com")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Please try again later.")
+        self.assertFalse(User.objects.exists())
+
+
+class BloomFilterTest(SimpleTestCase):
+    """This subclass tests the Bloom filter of the blacklist mirror."""
+
+    def test_no_false_negatives(self):
+        identities = [f"user{index}@gmail.com" for index in range(1000)]
+        bloom = BloomFilter.from_items(identities, capacity=1000, error_rate=0.01)
+        self.assertTrue(all(identity in bloom for identity in identities))
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter.from_items(
+            (f"user{index}@gmail.com" for index in range(1000)), capacity=1000, error_rate=0.01
+        )
+        false_positives = sum(f"other{index}@gmail.com" in bloom for index in range(10000))
+        self.assertLess(false_positives / 10000, 0.02)
+
+    def test_memory_is_bounded(self):
+        bloom = BloomFilter(capacity=1000000, error_rate=0.001, max_bytes=1024)
+        self.assertEqual(bloom.nbytes, 1024)
+        self.assertGreaterEqual(bloom.hashes, 1)
+
+
+@override_settings(KARMA_BLOOM_RELOAD_INTERVAL=0)
+class BlacklistMirrorTest(TestCase):
+    """This subclass tests the karma checks served from the local blacklist mirror."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = KarmaStubServer(blacklisted=["fraud@gmail.com"]).start()
+        cls.addClassCleanup(cls.stub.stop)
+
+    def setUp(self):
+        self.stub.requests = 0
+        settings = override_settings(ADJUTOR_KARMA_URL=self.stub.url)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_unsynced_mirror_defers_to_remote_api(self):
+        self.assertFalse(karma.is_blacklisted("janedoe@gmail.com"))
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_cleared_identities_skip_remote_api(self):
+        blacklist.sync(["fraud@gmail.com"])
+        blacklist.blacklist_filter.current()
+        with self.assertNumQueries(1):
+            # only the generation of the mirror is checked once the filter is loaded.
+            blacklist.blacklist_filter.current()
+        self.assertFalse(karma.is_blacklisted("janedoe@gmail.com"))
+        self.assertEqual(self.stub.requests, 0)
+
+    def test_probable_matches_are_confirmed_remotely(self):
+        blacklist.sync(["fraud@gmail.com"])
+        self.assertTrue(karma.is_blacklisted("Fraud@gmail.com"))
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_filter_reloads_after_sync(self):
+        blacklist.sync(["someone@gmail.com"])
+        self.assertFalse(karma.is_blacklisted("fraud@gmail.com"))
+        blacklist.sync(["fraud@gmail.com"])
+        self.assertTrue(karma.is_blacklisted("fraud@gmail.com"))
+
+    def test_filter_is_warmed_ahead_of_first_check(self):
+        blacklist.sync(["fraud@gmail.com"])
+        blacklist.blacklist_filter.reset()
+        blacklist.blacklist_filter.warm()
+        self.assertIn("fraud@gmail.com", blacklist.blacklist_filter.bloom)
+        # a database that cannot be read yet leaves the filter to be built on first use.
+        blacklist.blacklist_filter.reset()
+        with mock.patch.object(
+            BlacklistSync.objects, "first", side_effect=DatabaseError
+        ), self.assertLogs("accounts.blacklist", "WARNING"):
+            blacklist.blacklist_filter.warm()
+        self.assertIsNone(blacklist.blacklist_filter.checked_at)
+        self.assertTrue(karma.is_blacklisted("fraud@gmail.com"))
+
+    def test_sync_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as export:
+            export.write("email\nFraud@gmail.com\nscam@gmail.com\nfraud@gmail.com\n\n")
+        self.addCleanup(os.remove, export.name)
+        call_command("sync_karma_blacklist", export.name, stdout=StringIO())
+        self.assertEqual(
+            sorted(BlacklistedIdentity.objects.values_list("identity", flat=True)),
+            ["fraud@gmail.com", "scam@gmail.com"],
+        )
+        self.assertEqual(BlacklistSync.objects.get().identities, 2)
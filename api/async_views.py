@@ -0,0 +1,109 @@
+import json
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.authtoken.models import Token
+from accounts import karma
+from accounts.views import KARMA_UNAVAILABLE_MESSAGE
+from wallet.models import Savings, Transactions
+from wallet.pagination import apaginate_transactions, InvalidCursor
+from .serializers import (
+    UnverifiedUserSerializer,
+    SavingsSerializer,
+    TransactionRowsSerializer,
+    TransactionFilterSerializer,
+)
+from .views import pagination_headers
+
+# The following views serve the registration and read endpoints without blocking a thread,
+# for deployments behind an ASGI server. They return the same data as their rest-framework
+# counterparts in views.py.
+
+
+async def authenticate(request):
+    """
+    Returns the active user of the token in the 'Authorization' header, if any.
+
+    The user's savings wallet is loaded by the same query, as user.savings.
+    """
+    header = request.headers.get("Authorization", "").split()
+    if len(header) != 2 or header[0].lower() != "token":
+        return None
+    try:
+        token = await Token.objects.select_related("user", "user__savings").aget(key=header[1])
+    except Token.DoesNotExist:
+        return None
+    return token.user if token.user.is_active else None
+
+
+def not_authenticated():
+    response = JsonResponse(
+        {"detail": "Authentication credentials were not provided."}, status=401
+    )
+    response["WWW-Authenticate"] = "Token"
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def register_user(request, format=None):
+    try:
+        data = json.loads(request.body)
+    except ValueError as error:
+        return JsonResponse({"detail": f"JSON parse error - {error}"}, status=400)
+    serializer = UnverifiedUserSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+    try:
+        blacklisted = await karma.ais_blacklisted(serializer.validated_data["email"])
+    except karma.KarmaUnavailable:
+        return JsonResponse({"email": [KARMA_UNAVAILABLE_MESSAGE]}, status=400)
+    if blacklisted:
+        return JsonResponse({"email": ["You have already been blacklisted."]}, status=400)
+    # password hashing is CPU-bound, so it runs off the event loop.
+    await sync_to_async(serializer.save)()
+    return JsonResponse(serializer.data, status=201)
+
+
+@require_GET
+async def savings_detail(request, format=None):
+    user = await authenticate(request)
+    if user is None:
+        return not_authenticated()
+    try:
+        savings_wallet = user.savings
+    except Savings.DoesNotExist:
+        return JsonResponse(["You do not have a savings wallet."], status=400, safe=False)
+    return JsonResponse(SavingsSerializer(savings_wallet).data)
+
+
+@require_GET
+async def user_transactions(request, format=None):
+    user = await authenticate(request)
+    if user is None:
+        return not_authenticated()
+    try:
+        savings_wallet = user.savings
+    except Savings.DoesNotExist:
+        return JsonResponse(["You do not have a savings wallet."], status=400, safe=False)
+    filters = TransactionFilterSerializer(data=request.GET)
+    if not filters.is_valid():
+        return JsonResponse(filters.errors, status=400)
+    cursor = request.GET.get("cursor")
+    try:
+        page = await apaginate_transactions(
+            Transactions.objects.filter(savings_id=savings_wallet)
+            .matching(**filters.validated_data)
+            .values_list(*TransactionRowsSerializer.fields, named=True),
+            cursor=cursor,
+            page_size=request.GET.get("page_size"),
+        )
+    except InvalidCursor as error:
+        return JsonResponse([str(error)], status=400, safe=False)
+    if not page.rows and not cursor and not filters.validated_data:
+        return JsonResponse(["You do not have any transactions."], status=400, safe=False)
+    serializer = TransactionRowsSerializer(page.rows)
+    return JsonResponse(
+        serializer.data, safe=False, headers=pagination_headers(request, page)
+    )
@@ -0,0 +1,48 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from wallet.models import Savings
+from . import token_cache
+
+# The following classes authenticate API requests.
+
+
+class WalletTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication which loads the user's savings wallet in the same query.
+
+    The token, its user and the user's wallet are fetched with one joined query, and the
+    wallet is stored as the request's wallet (see wallet.middleware.get_wallet).
+    """
+
+    def authenticate(self, request):
+        # authenticators are created per request.
+        self.request = request
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        try:
+            token = model.objects.select_related("user", "user__savings").get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        try:
+            wallet = token.user.savings
+        except Savings.DoesNotExist:
+            wallet = None
+        self.request._request._cached_wallet = wallet
+        return (token.user, token)
+
+
+class CachedTokenAuthentication(WalletTokenAuthentication):
+    """
+    Wallet token authentication which remembers the users of tokens (see api.token_cache).
+
+    Requests with a remembered token skip the token lookup; their wallet is then resolved
+    by request.wallet, from the balance cache when it is enabled.
+    """
+
+    def authenticate_credentials(self, key):
+        return token_cache.resolve(key, super().authenticate_credentials)
@@ -0,0 +1,123 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from wallet.transfers import run_in_transaction
+from .models import IdempotencyKey
+
+# The following helpers make money-moving endpoints safe to retry with an Idempotency-Key header.
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+MAX_KEY_LENGTH = 255
+
+# stored responses are replayed for this long (overridden by settings.IDEMPOTENCY_KEY_TTL).
+DEFAULT_TTL = timedelta(hours=24)
+
+
+def get_ttl():
+    return getattr(settings, "IDEMPOTENCY_KEY_TTL", DEFAULT_TTL)
+
+
+def expired_keys(now=None):
+    """Returns the stored keys that are older than the TTL."""
+    return IdempotencyKey.objects.filter(created__lt=(now or timezone.now()) - get_ttl())
+
+
+def request_hash(request):
+    """Returns a digest of the method, path and body of a request."""
+    data = request.data
+    if hasattr(data, "lists"):
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    content = "\n".join([request.method, request.path, body])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def idempotent(view):
+    """
+    Replays the stored response of a request whose Idempotency-Key has already been used.
+
+    The key is claimed by inserting it in the same transaction as the write it guards, and
+    the response is stored before that transaction commits. A retried request therefore
+    either waits for the original to finish and replays its response, or runs again if the
+    original was rolled back; it never applies the write twice. Keys are scoped to the user
+    and expire after the TTL. Requests without the header are handled as usual.
+
+    Must be applied below @api_view, so the request is authenticated first.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"The {IDEMPOTENCY_HEADER} header must be 1 to {MAX_KEY_LENGTH} characters long."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        fingerprint = request_hash(request)
+
+        def run():
+            stored = _claim(request, key, fingerprint)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+            response = view(request, *args, **kwargs)
+            IdempotencyKey.objects.filter(user=request.user, key=key).update(
+                status_code=response.status_code, response=response.data
+            )
+            return response
+
+        return run_in_transaction(run)
+
+    return wrapper
+
+
+def _claim(request, key, fingerprint):
+    """Inserts the key, or returns the stored key if it has already been used."""
+    while True:
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    key=key,
+                    user=request.user,
+                    method=request.method,
+                    path=request.path,
+                    request_hash=fingerprint,
+                )
+            return None
+        except IntegrityError:
+            # a concurrent request holding the key has committed by now.
+            stored = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            if stored is None:
+                # the key is held by a transaction this one cannot see yet.
+                return IdempotencyKey(request_hash=fingerprint)
+            if stored.created < timezone.now() - get_ttl():
+                stored.delete()
+                continue
+            return stored
+
+
+def _replay(stored, fingerprint):
+    if stored.request_hash != fingerprint:
+        return Response(
+            {"detail": f"This {IDEMPOTENCY_HEADER} has already been used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if stored.status_code is None:
+        return Response(
+            {"detail": f"A request with this {IDEMPOTENCY_HEADER} is still being processed."},
+            status=status.HTTP_409_CONFLICT,
+        )
+    return Response(
+        stored.response,
+        status=stored.status_code,
+        headers={"Idempotent-Replayed": "true"},
+    )
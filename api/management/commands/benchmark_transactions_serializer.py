@@ -0,0 +1,66 @@
+import time
+from collections import namedtuple
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from wallet.models import Savings, Transactions
+from api.serializers import TransactionRowsSerializer, TransactionsSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures how many transaction rows per second TransactionsSerializer and "
+        "TransactionRowsSerializer serialize and render as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100, help="Rows per page.")
+        parser.add_argument("--pages", type=int, default=200, help="Pages serialized.")
+
+    def handle(self, *args, **options):
+        # rows are built in memory, so only serialization and rendering are measured.
+        now = timezone.now()
+        instances = []
+        for index in range(options["rows"]):
+            instance = Transactions.funding(Savings(pk=1), index + 1)
+            instance.id, instance.date = index, now - timedelta(minutes=index)
+            instances.append(instance)
+        Row = namedtuple("Row", TransactionRowsSerializer.fields)
+        rows = [
+            Row(
+                instance.id,
+                instance.details,
+                instance.date,
+                instance.savings_id_id,
+                instance.entry_type,
+                instance.amount,
+                instance.reference,
+                None,
+                None,
+            )
+            for instance in instances
+        ]
+        renderer = JSONRenderer()
+        model_output = renderer.render(TransactionsSerializer(instances, many=True).data)
+        rows_output = renderer.render(TransactionRowsSerializer(rows).data)
+        if model_output != rows_output:
+            raise CommandError("The serializers do not produce the same output.")
+
+        results = {}
+        for name, serialize, page in [
+            (
+                "TransactionsSerializer",
+                lambda page: TransactionsSerializer(page, many=True),
+                instances,
+            ),
+            ("TransactionRowsSerializer", TransactionRowsSerializer, rows),
+        ]:
+            started = time.perf_counter()
+            for _ in range(options["pages"]):
+                renderer.render(serialize(page).data)
+            elapsed = time.perf_counter() - started
+            results[name] = options["rows"] * options["pages"] / elapsed
+            self.stdout.write(f"{name}: {results[name]:,.0f} rows/s")
+        speedup = results["TransactionRowsSerializer"] / results["TransactionsSerializer"]
+        self.stdout.write(f"speedup: {speedup:.1f}x")
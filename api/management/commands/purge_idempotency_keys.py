@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from api.idempotency import expired_keys
+
+# keys deleted by a single statement.
+PURGE_BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = "Deletes the stored Idempotency-Key responses that are older than their TTL."
+
+    def handle(self, *args, **options):
+        purged = 0
+        while True:
+            batch = list(expired_keys().values_list("pk", flat=True)[:PURGE_BATCH_SIZE])
+            if not batch:
+                break
+            purged += expired_keys().filter(pk__in=batch).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"{purged} expired idempotency keys purged."))
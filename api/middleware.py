@@ -0,0 +1,79 @@
+import re
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# The following middleware compresses large API responses for clients that accept it.
+
+DEFAULT_MIN_SIZE = 1024  # bytes
+
+# the media types of API responses, which carry no CSRF token an attacker could recover
+# from the compressed size (BREACH), unlike the HTML pages.
+DEFAULT_CONTENT_TYPES = ["application/json", "application/msgpack"]
+
+accepts_brotli = re.compile(r"\bbr\b")
+accepts_gzip = re.compile(r"\bgzip\b")
+
+
+@sync_and_async_middleware
+class CompressionMiddleware:
+    """
+    Compresses API responses of at least COMPRESSION_MIN_SIZE bytes with brotli or gzip.
+
+    Brotli is preferred when the 'brotli' package is installed and the client accepts it.
+    Setting COMPRESSION_MIN_SIZE to None disables compression, e.g. behind a proxy that
+    compresses responses itself. Under ASGI it runs in the event loop, like the async views.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        min_size = getattr(settings, "COMPRESSION_MIN_SIZE", DEFAULT_MIN_SIZE)
+        content_types = getattr(settings, "COMPRESSION_CONTENT_TYPES", DEFAULT_CONTENT_TYPES)
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        if (
+            min_size is None
+            or response.streaming
+            or response.has_header("Content-Encoding")
+            or content_type not in content_types
+        ):
+            return response
+        patch_vary_headers(response, ["Accept-Encoding"])
+        if len(response.content) < min_size:
+            return response
+
+        accept_encoding = request.headers.get("Accept-Encoding", "")
+        if brotli is not None and accepts_brotli.search(accept_encoding):
+            encoding, compressed = "br", brotli.compress(response.content)
+        elif accepts_gzip.search(accept_encoding):
+            encoding, compressed = "gzip", compress_string(response.content)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(response.content))
+        response.headers["Content-Encoding"] = encoding
+        # the compressed body is no longer byte-for-byte the one the strong ETag names.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        return response
@@ -1,3 +1,29 @@
 from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 
 # Create your models here.
+
+
+class IdempotencyKey(models.Model):
+    """Model representing the stored response of a request sent with an Idempotency-Key."""
+
+    key = models.CharField(help_text="Enter the idempotency key sent by the client", max_length=255)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    request_hash = models.CharField(
+        help_text="SHA-256 digest of the method, path and body of the request", max_length=64
+    )
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="idempotency_user_key_unique")
+        ]
+        indexes = [models.Index(fields=["created"], name="idempotency_created_idx")]
+
+    def __str__(self):
+        return f"{self.key} - {self.method} {self.path}"
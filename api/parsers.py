@@ -0,0 +1,71 @@
+import json
+import msgpack
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from wallet.bulk import MAX_BULK_TRANSFER_ITEMS
+
+# The following parsers handle request content types that are not supported by rest-framework.
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON into a list, one line at a time.
+
+    The body is read line by line from the request stream instead of being loaded whole.
+    """
+
+    media_type = "application/x-ndjson"
+    max_items = MAX_BULK_TRANSFER_ITEMS
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        items = []
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if len(items) == self.max_items:
+                raise ParseError(f"A request cannot contain more than {self.max_items} items.")
+            try:
+                items.append(json.loads(line.decode(encoding)))
+            except ValueError as error:
+                raise ParseError(f"Line {number}: JSON parse error - {error}")
+        return items
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack request bodies (see api.renderers.MessagePackRenderer).
+
+    Only the types of the JSON data model are accepted, so parsed data can be handled
+    exactly like parsed JSON.
+    """
+
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            data = msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as error:
+            raise ParseError(f"MessagePack parse error - {error}")
+        check_json_types(data)
+        return data
+
+
+def check_json_types(data):
+    """Raises ParseError when data holds values, e.g. bytes, that JSON cannot represent."""
+    pending = [data]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            if not all(isinstance(key, str) for key in value):
+                raise ParseError("MessagePack parse error - map keys must be strings.")
+            pending.extend(value.values())
+        elif isinstance(value, list):
+            pending.extend(value)
+        elif value is not None and not isinstance(value, (str, int, float)):
+            raise ParseError(
+                f"MessagePack parse error - unsupported {type(value).__name__} value."
+            )
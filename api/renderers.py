@@ -0,0 +1,25 @@
+import msgpack
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# The following renderers handle response content types that are not supported by rest-framework.
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders responses as MessagePack, a compact binary encoding of the JSON data model.
+
+    Values outside that model, e.g. lazy translations, are converted as JSONRenderer
+    converts them, so clients decode the same data from either format.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=self.encoder.default)
@@ -1,6 +1,27 @@
+import gzip
+import msgpack
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 from rest_framework.test import APITestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.core.cache import caches
+from rest_framework.authtoken.models import Token
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth.models import User
 from wallet.models import Savings, Transactions
+from wallet import bulk, services
+from api.models import IdempotencyKey
+from api.serializers import TransactionRowsSerializer, TransactionsSerializer
+from api import token_cache
+from accounts.karma_stub import KarmaStubServer
 from rest_framework import status
 
 # The following classes handle tests for the API.
@@ -11,6 +32,13 @@ class RegisterUserAndLoginAPITests(APITestCase):
     These tests ensure we can create a new user object and log in.
     """
 
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # serve karma checks from a local stub instead of the live API.
+        cls.karma_stub = KarmaStubServer(blacklisted=["fraud@gmail.com"]).start()
+        cls.addClassCleanup(cls.karma_stub.stop)
+
     def test_register_user(self):
         url = "/api/register/"
         data = {
@@ -18,7 +46,8 @@ class RegisterUserAndLoginAPITests(APITestCase):
             "email": "johndoe@gmail.com",
             "password": "LENDSQR001",
         }
-        response = self.client.post(url, data, format="json")
+        with override_settings(ADJUTOR_KARMA_URL=self.karma_stub.url):
+            response = self.client.post(url, data, format="json")
         # assert status code and response data.
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(
@@ -28,6 +57,19 @@ class RegisterUserAndLoginAPITests(APITestCase):
         expected_username = "john"
         self.assertEqual(User.objects.all().first().username, expected_username)
 
+    def test_blacklisted_user_cannot_register(self):
+        url = "/api/register/"
+        data = {
+            "username": "john",
+            "email": "fraud@gmail.com",
+            "password": "LENDSQR001",
+        }
+        with override_settings(ADJUTOR_KARMA_URL=self.karma_stub.url):
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["email"][0], "You have already been blacklisted.")
+        self.assertEqual(User.objects.count(), 0)
+
     def test_user_provides_invalid_credentials_during_login(self):
         # setup a user for our tests.
         User.objects.create_user(
@@ -106,6 +148,17 @@ class CreateSavingsWalletAPITests(APITestCase):
         expected_savings_owner = User.objects.all().first().username  # john
         self.assertEqual(savings.first().user_id.username, expected_savings_owner)
 
+    def test_user_cannot_create_second_savings_wallet(self):
+        user = User.objects.get(username="john")
+        Savings.objects.create(first_name="John", last_name="Doe", user_id=user)
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        data = {"first_name": "Johnny", "last_name": "Doe"}
+        response = self.client.post("/api/create-savings/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], "You already have a savings account.")
+        self.assertEqual(Savings.objects.get().first_name, "John")
+
 
 class CheckSavingsDetailsAPITests(APITestCase):
     """
@@ -157,6 +210,14 @@ class CheckSavingsDetailsAPITests(APITestCase):
             },
         )
 
+    def test_wallet_user_and_token_are_loaded_in_one_query(self):
+        token = Token.objects.create(user=User.objects.get(username="john"))
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/savings-details/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["user_id"], "john")
+
     def test_user2_has_no_savings_wallet(self):
         # login user to retrieve token key.
         url = "/api-dj-rest-auth/login/"
@@ -175,6 +236,142 @@ class CheckSavingsDetailsAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data[0], "You do not have a savings wallet.")
 
+    def test_user_without_wallet_is_authenticated_in_one_query(self):
+        token = Token.objects.create(user=User.objects.get(username="jane"))
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/savings-details/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConditionalRequestsAPITests(APITestCase):
+    """
+    These tests ensure that clients polling their wallet are answered with 304 until it changes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # setup a user with a savings wallet, a transaction and a token for our tests.
+        cls.user = User.objects.create_user(
+            username="john", email="johndoe@gmail.com", password="LENDSQR001"
+        )
+        cls.wallet = Savings.objects.create(
+            first_name="John", last_name="Doe", balance=500, user_id=cls.user
+        )
+        Transactions.objects.create(details="funded", savings_id=cls.wallet)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def test_unchanged_wallet_is_not_modified(self):
+        for url in ["/api/savings-details/", "/api/transactions/"]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # only the token and its wallet are read to answer a revalidation.
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_changed_wallet_is_sent_again(self):
+        etag = self.client.get("/api/savings-details/")["ETag"]
+        services.fund_wallet(self.wallet, Decimal("100"))
+        response = self.client.get("/api/savings-details/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["balance"], "600.00")
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_pages_have_their_own_etags(self):
+        first = self.client.get("/api/transactions/")["ETag"]
+        second = self.client.get("/api/transactions/?page_size=1")["ETag"]
+        self.assertNotEqual(first, second)
+
+    def test_last_modified_is_the_time_of_the_last_write(self):
+        Savings.objects.filter(pk=self.wallet.pk).update(
+            updated=timezone.now() - timedelta(minutes=5)
+        )
+        response = self.client.get("/api/savings-details/")
+        response = self.client.get(
+            "/api/savings-details/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_write_within_the_current_second_has_no_last_modified(self):
+        services.fund_wallet(self.wallet, Decimal("100"))
+        updated = Savings.objects.get(pk=self.wallet.pk).updated
+        with mock.patch("wallet.conditional.time.time", return_value=updated.timestamp()):
+            response = self.client.get("/api/savings-details/")
+        self.assertTrue(response.has_header("ETag"))
+        self.assertFalse(response.has_header("Last-Modified"))
+
+
+class BalanceAtAPITests(APITestCase):
+    """
+    These tests ensure that a user can get the balance of their wallet at a past moment.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # setup a user with a savings wallet and a token for our tests.
+        cls.user = User.objects.create_user(
+            username="john", email="johndoe@gmail.com", password="LENDSQR001"
+        )
+        cls.wallet = Savings.objects.create(first_name="John", last_name="Doe", user_id=cls.user)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def test_balance_at_a_past_moment(self):
+        services.fund_wallet(self.wallet, Decimal("100"))
+        moment = timezone.now()
+        services.fund_wallet(self.wallet, Decimal("50"))
+        response = self.client.get("/api/balance-at/", {"at": moment.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["balance"], "100.00")
+
+    def test_balance_at_requires_a_moment(self):
+        response = self.client.get("/api/balance-at/", {"at": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("at", response.data)
+
+
+class SummaryAPITests(APITestCase):
+    """
+    These tests ensure that a user can get the daily and monthly totals of their wallet.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # setup a user with a savings wallet and a token for our tests.
+        cls.user = User.objects.create_user(
+            username="john", email="johndoe@gmail.com", password="LENDSQR001"
+        )
+        cls.wallet = Savings.objects.create(first_name="John", last_name="Doe", user_id=cls.user)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def test_summary(self):
+        services.fund_wallet(self.wallet, Decimal("100"))
+        services.withdraw_from_wallet(self.wallet, Decimal("40"))
+        response = self.client.get("/api/summary/", {"days": 7})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        today = {
+            "period": timezone.localdate().isoformat(),
+            "inflow": "100.00",
+            "outflow": "40.00",
+            "entries": 2,
+        }
+        self.assertEqual(response.json()["daily"], [today])
+        self.assertEqual(response.json()["monthly"][0]["outflow"], "40.00")
+
+    def test_summary_validates_its_periods(self):
+        response = self.client.get("/api/summary/", {"days": 0, "months": 100})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {"days", "months"})
+
 
 class FundSavingsAPITests(APITestCase):
     """
@@ -310,7 +507,7 @@ class WithdrawFundsAPITests(APITestCase):
         # assert transactions on savings wallet.
         self.assertEqual(len(transactions), 1)
         self.assertEqual(
-            transactions.first().details, "You withdrew 100.00 naira from your account."
+            transactions.first().describe(), "You withdrew 100.00 naira from your account."
         )
         self.assertEqual(
             response.data,
@@ -389,6 +586,18 @@ class TransferFundsAPITests(APITestCase):
             response.data[0], "This beneficiary does not have a savings wallet."
         )
 
+    def test_remitter_does_not_have_a_savings_wallet(self):
+        # authenticate as the user without a savings wallet.
+        self.client.force_authenticate(user=self.user2)
+        url = "/api/transfer-funds/"
+        data = {"amount": "300", "email": "johndoe@gmail.com"}
+        response = self.client.put(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data[0],
+            "You cannot perform this transaction because you don't have a savings wallet.",
+        )
+
     def test_not_enough_funds_for_transfer(self):
         # create another wallet with an amount of 200 for the other user.
         Savings.objects.create(
@@ -456,6 +665,221 @@ class TransferFundsAPITests(APITestCase):
         self.assertEqual(len(transactions), 2)
 
 
+class BulkTransferAPITests(APITestCase):
+    """
+    These tests ensure that users can transfer funds to many beneficiaries in one request.
+    """
+
+    def setUp(self):
+        # set up a remitter with 1000 and two beneficiaries, one without a wallet.
+        self.user1 = User.objects.create_user(
+            username="john", email="johndoe@gmail.com", password="2HJ1vRV0Z&3iD"
+        )
+        self.user2 = User.objects.create_user(
+            username="jane", email="janedoe@gmail.com", password="1X<ISRUkw+tuK"
+        )
+        User.objects.create_user(
+            username="mary", email="marydoe@gmail.com", password="LENDSQR001"
+        )
+        self.remitter_wallet = Savings.objects.create(
+            first_name="John", last_name="Doe", balance=1000.00, user_id=self.user1
+        )
+        self.beneficiary_wallet = Savings.objects.create(
+            first_name="Jane", last_name="Doe", balance=200.00, user_id=self.user2
+        )
+
+    def test_user_not_authenticated(self):
+        url = "/api/bulk-transfer/"  # endpoint that requires authorization.
+        data = [{"amount": "300", "email": "janedoe@gmail.com"}]
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_transfers_funds_to_many_beneficiaries(self):
+        self.client.force_authenticate(user=self.user1)
+        data = [
+            {"amount": "100", "email": "janedoe@gmail.com"},
+            {"amount": "50", "email": "janedoe@gmail.com"},
+            {"amount": "10", "email": "marydoe@gmail.com"},  # no savings wallet.
+            {"amount": "ten", "email": "janedoe@gmail.com"},  # invalid amount.
+        ]
+        response = self.client.post("/api/bulk-transfer/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total"], "150.00")
+        self.assertEqual(response.data["succeeded"], 2)
+        self.assertEqual(response.data["failed"], 2)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["success", "success", "failed", "failed"],
+        )
+        self.assertEqual(
+            response.data["results"][2]["error"],
+            "This beneficiary does not have a savings wallet.",
+        )
+        self.assertEqual(
+            response.data["results"][3]["error"], "A valid number is required."
+        )
+        # assert both balances and the four transactions.
+        self.remitter_wallet.refresh_from_db()
+        self.beneficiary_wallet.refresh_from_db()
+        self.assertEqual(self.remitter_wallet.balance, 850)
+        self.assertEqual(self.beneficiary_wallet.balance, 350)
+        self.assertEqual(Transactions.objects.count(), 4)
+
+    def test_user_streams_transfers_as_ndjson(self):
+        self.client.force_authenticate(user=self.user1)
+        body = (
+            '{"amount": "100", "email": "janedoe@gmail.com"}\n'
+            '{"amount": "200", "email": "janedoe@gmail.com"}\n'
+        )
+        response = self.client.post(
+            "/api/bulk-transfer/", body, content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["succeeded"], 2)
+        self.beneficiary_wallet.refresh_from_db()
+        self.assertEqual(self.beneficiary_wallet.balance, 500)
+
+    def test_not_enough_funds_for_all_transfers(self):
+        self.client.force_authenticate(user=self.user1)
+        data = [
+            {"amount": "600", "email": "janedoe@gmail.com"},
+            {"amount": "600", "email": "janedoe@gmail.com"},
+        ]
+        response = self.client.post("/api/bulk-transfer/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data[0],
+            "You do not have enough funds in your savings wallet for these transfers.",
+        )
+        # assert nothing has been transferred.
+        self.remitter_wallet.refresh_from_db()
+        self.assertEqual(self.remitter_wallet.balance, 1000)
+        self.assertEqual(Transactions.objects.count(), 0)
+
+    def test_user_transfers_ten_thousand_items(self):
+        # set up a hundred beneficiaries with a savings wallet each.
+        beneficiaries = User.objects.bulk_create(
+            User(username=f"user{number}", email=f"user{number}@gmail.com")
+            for number in range(100)
+        )
+        Savings.objects.bulk_create(
+            Savings(first_name="User", last_name=str(number), user_id=user)
+            for number, user in enumerate(beneficiaries)
+        )
+        self.client.force_authenticate(user=self.user1)
+        data = [
+            {"amount": "0.10", "email": f"user{number % 100}@gmail.com"}
+            for number in range(10000)
+        ]
+        response = self.client.post("/api/bulk-transfer/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["succeeded"], 10000)
+        self.assertEqual(response.data["total"], "1000.00")
+        self.remitter_wallet.refresh_from_db()
+        self.assertEqual(self.remitter_wallet.balance, 0)
+        self.assertEqual(Savings.objects.get(last_name="7").balance, 10)
+        self.assertEqual(Transactions.objects.count(), 20000)
+
+    def test_beneficiaries_are_locked_in_order_across_batches(self):
+        # set up more beneficiaries than a single lookup resolves.
+        count = bulk.LOOKUP_BATCH_SIZE + 1
+        beneficiaries = User.objects.bulk_create(
+            User(username=f"user{number}", email=f"user{number}@gmail.com")
+            for number in range(count)
+        )
+        Savings.objects.bulk_create(
+            Savings(first_name="User", last_name=str(number), user_id=user)
+            for number, user in enumerate(beneficiaries)
+        )
+        self.client.force_authenticate(user=self.user1)
+        data = [
+            {"amount": "0.10", "email": f"user{number}@gmail.com"} for number in range(count)
+        ]
+        locked = []
+
+        def lock_for_update(wallets):
+            locked.append([wallet.pk for wallet in wallets])
+            return wallets
+
+        with mock.patch.object(bulk, "lock_for_update", side_effect=lock_for_update):
+            response = self.client.post("/api/bulk-transfer/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["succeeded"], count)
+        # the remitter and every beneficiary are locked in a single primary key order.
+        self.assertEqual(len(locked), 2)
+        pks = [pk for batch in locked for pk in batch]
+        self.assertEqual(pks, sorted(pks))
+        self.assertEqual(len(pks), count + 1)
+        self.assertEqual(Transactions.objects.count(), 2 * count)
+
+    def test_too_many_items(self):
+        self.client.force_authenticate(user=self.user1)
+        data = [{"amount": "1", "email": "janedoe@gmail.com"}] * 10001
+        response = self.client.post("/api/bulk-transfer/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class TransactionFiltersAPITests(APITestCase):
+    """
+    These tests ensure that users can filter the transactions of their savings wallets.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # setup two users with a savings wallet each, transactions and a token for our tests.
+        cls.user = User.objects.create_user(
+            username="john", email="johndoe@gmail.com", password="LENDSQR001"
+        )
+        cls.wallet = Savings.objects.create(first_name="John", last_name="Doe", user_id=cls.user)
+        jane = User.objects.create_user(username="jane", email="janedoe@gmail.com")
+        cls.other = Savings.objects.create(first_name="Jane", last_name="Doe", user_id=jane)
+        services.fund_wallet(cls.wallet, Decimal("1000"))
+        services.withdraw_from_wallet(cls.wallet, Decimal("250"))
+        services.transfer_to_wallet(cls.user, cls.other, Decimal("100"))
+        services.fund_wallet(cls.wallet, Decimal("40"))
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def amounts(self, response):
+        return [row["amount"] for row in response.json()]
+
+    def test_filters(self):
+        today = timezone.localdate()
+        for params, amounts in [
+            ({"entry_type": "fund"}, ["40.00", "1000.00"]),
+            ({"min_amount": "100", "max_amount": "500"}, ["-100.00", "-250.00"]),
+            ({"counterparty": self.other.pk}, ["-100.00"]),
+            ({"start_date": today, "end_date": today, "max_amount": "50"}, ["40.00"]),
+            ({"end_date": today - timedelta(days=1)}, []),
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get("/api/transactions/", params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(self.amounts(response), amounts)
+
+    def test_filters_combine_with_pagination(self):
+        response = self.client.get(
+            "/api/transactions/", {"min_amount": "50", "page_size": 1}
+        )
+        self.assertEqual(self.amounts(response), ["-100.00"])
+        next_url = response["Link"].split(">")[0].lstrip("<")
+        self.assertIn("min_amount=50", next_url)
+        response = self.client.get(next_url)
+        self.assertEqual(self.amounts(response), ["-250.00"])
+
+    def test_invalid_filters(self):
+        response = self.client.get(
+            "/api/transactions/", {"entry_type": "refund", "min_amount": "-1"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {"entry_type", "min_amount"})
+        response = self.client.get(
+            "/api/transactions/", {"min_amount": "10", "max_amount": "5"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class UserTransactionsAPITests(APITestCase):
     """
     These tests ensure that users can view all transactions on their savings wallets.
@@ -526,6 +950,308 @@ class UserTransactionsAPITests(APITestCase):
         transactions = Transactions.objects.all()
         self.assertEqual(len(transactions), 1)
 
+    def test_user_pages_through_transactions_with_cursors(self):
+        # create twenty five transactions for our test user.
+        for amount in range(25):
+            Transactions.objects.create(
+                details=f"You funded your account with {amount} naira.",
+                savings_id=self.savings_wallet,
+            )
+        # login user to retrieve token key.
+        url = "/api-dj-rest-auth/login/"
+        data = {
+            "username": "john",
+            "password": "LENDSQR001",
+        }
+        response = self.client.post(url, data, format="json")
+        # add token key to HTTP headers.
+        token_key = response.data.get("key")
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token_key)
+        # get the first page of user transactions (newest first).
+        response = self.client.get("/api/transactions/", {"page_size": 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(
+            response.data[0]["details"], "You funded your account with 24 naira."
+        )
+        self.assertIn('rel="next"', response["Link"])
+        self.assertNotIn('rel="prev"', response["Link"])
+        # follow the next cursors until the last page.
+        next_url = response["Link"].split(";")[0].strip("<>")
+        response = self.client.get(next_url)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(
+            response.data[0]["details"], "You funded your account with 14 naira."
+        )
+        self.assertIn('rel="prev"', response["Link"])
+        next_url = response["Link"].split(";")[0].strip("<>")
+        response = self.client.get(next_url)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(
+            response.data[-1]["details"], "You funded your account with 0 naira."
+        )
+        self.assertNotIn('rel="next"', response["Link"])
+        # go back to the previous page.
+        previous_url = response["Link"].split(";")[0].strip("<>")
+        response = self.client.get(previous_url)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(
+            response.data[0]["details"], "You funded your account with 14 naira."
+        )
+
+    def test_entries_are_described_from_ledger_columns(self):
+        beneficiary = User.objects.create_user(username="jane", email="janedoe@gmail.com")
+        Savings.objects.create(first_name="Jane", last_name="Doe", user_id=beneficiary)
+        self.client.force_authenticate(user=self.user)
+        self.client.put(
+            "/api/transfer-funds/", {"amount": "120.50", "email": "janedoe@gmail.com"}
+        )
+        response = self.client.get("/api/transactions/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        entry = response.data[0]
+        self.assertEqual(entry["details"], "You transferred 120.50 naira to Jane Doe.")
+        self.assertEqual((entry["entry_type"], entry["amount"]), ("transfer_out", "-120.50"))
+        self.assertIsNotNone(entry["reference"])
+
+    def test_user_provides_invalid_cursor(self):
+        # login user to retrieve token key.
+        url = "/api-dj-rest-auth/login/"
+        data = {
+            "username": "john",
+            "password": "LENDSQR001",
+        }
+        response = self.client.post(url, data, format="json")
+        # add token key to HTTP headers.
+        token_key = response.data.get("key")
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token_key)
+        response = self.client.get("/api/transactions/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], "The pagination cursor is invalid.")
+
+
+class TransactionRowsSerializerTests(TestCase):
+    """
+    These tests ensure that the fast transactions serializer matches TransactionsSerializer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="john", password="LENDSQR001")
+        wallet = Savings.objects.create(first_name="John", last_name="Doe", user_id=user)
+        other_user = User.objects.create_user(username="jane", password="LENDSQR001")
+        other_wallet = Savings.objects.create(
+            first_name="Jane", last_name="Doe", user_id=other_user
+        )
+        # entries recorded before the ledger columns, and structured entries.
+        for details in ["funded", "withdrew", "transferred"]:
+            Transactions.objects.create(details=details, savings_id=wallet)
+        Transactions.objects.bulk_create(
+            [
+                Transactions.funding(wallet, Decimal("250.50")),
+                *Transactions.transfer_pair(wallet, other_wallet, 100),
+            ]
+        )
+
+    def assert_same_output(self):
+        transactions = Transactions.objects.order_by("-date", "-id")
+        rows = transactions.values_list(*TransactionRowsSerializer.fields, named=True)
+        self.assertEqual(
+            TransactionRowsSerializer(rows).data,
+            TransactionsSerializer(transactions, many=True).data,
+        )
+
+    def test_same_output_as_transactions_serializer(self):
+        self.assert_same_output()
+
+    @override_settings(TIME_ZONE="UTC")
+    def test_same_output_in_utc(self):
+        self.assert_same_output()
+
+    @override_settings(REST_FRAMEWORK={"DATETIME_FORMAT": "%d/%m/%Y %H:%M"})
+    def test_same_output_with_custom_date_format(self):
+        self.assert_same_output()
+
+    def test_benchmark_checks_output(self):
+        out = StringIO()
+        call_command("benchmark_transactions_serializer", rows=10, pages=1, stdout=out)
+        self.assertIn("TransactionRowsSerializer", out.getvalue())
+
+
+class MessagePackAPITests(APITestCase):
+    """
+    These tests ensure that clients can exchange MessagePack and compressed responses.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # setup a user with a savings wallet, a long history and a token for our tests.
+        cls.user = User.objects.create_user(
+            username="john", email="johndoe@gmail.com", password="LENDSQR001"
+        )
+        cls.wallet = Savings.objects.create(
+            first_name="John", last_name="Doe", balance=500, user_id=cls.user
+        )
+        Transactions.objects.bulk_create(
+            Transactions(details=f"You funded your account with {index}", savings_id=cls.wallet)
+            for index in range(100)
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def test_msgpack_is_selected_by_suffix_or_accept_header(self):
+        json_response = self.client.get("/api/transactions/?page_size=100")
+        for response in [
+            self.client.get("/api/transactions.msgpack?page_size=100"),
+            self.client.get(
+                "/api/transactions/?page_size=100", HTTP_ACCEPT="application/msgpack"
+            ),
+        ]:
+            self.assertEqual(response["Content-Type"], "application/msgpack")
+            self.assertEqual(msgpack.unpackb(response.content), json_response.json())
+            self.assertLess(len(response.content), len(json_response.content))
+
+    def test_errors_are_rendered_as_msgpack(self):
+        self.client.credentials()
+        response = self.client.get("/api/savings-details.msgpack")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            msgpack.unpackb(response.content),
+            {"detail": "Authentication credentials were not provided."},
+        )
+
+    def test_msgpack_request_body_is_parsed(self):
+        response = self.client.put(
+            "/api/fund-savings/",
+            msgpack.packb({"amount": "250.50"}),
+            content_type="application/msgpack",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("750.50"))
+
+    def test_msgpack_values_outside_json_are_rejected(self):
+        response = self.client.put(
+            "/api/fund-savings/",
+            msgpack.packb({"amount": b"250.50"}),
+            content_type="application/msgpack",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_large_responses_are_compressed(self):
+        plain = self.client.get("/api/transactions.msgpack?page_size=100")
+        response = self.client.get(
+            "/api/transactions.msgpack?page_size=100", HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response["ETag"], "W/" + plain["ETag"])
+        self.assertIn("Accept-Encoding", response["Vary"])
+        # the compressed MessagePack is several times smaller than the JSON.
+        json_response = self.client.get("/api/transactions/?page_size=100")
+        self.assertLess(len(response.content) * 4, len(json_response.content))
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get("/api/savings-details/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    @override_settings(COMPRESSION_MIN_SIZE=None)
+    def test_compression_can_be_disabled(self):
+        response = self.client.get(
+            "/api/transactions/?page_size=100", HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class TransferStatsAPITests(APITestCase):
+    """
+    These tests ensure that only staff users can read the transfer and balance cache counters.
+    """
+
+    def test_user_is_not_staff(self):
+        user = User.objects.create_user(username="john", password="LENDSQR001")
+        self.client.force_authenticate(user=user)
+        response = self.client.get("/api/transfer-stats/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_staff_user_reads_counters(self):
+        user = User.objects.create_user(
+            username="admin", password="LENDSQR001", is_staff=True
+        )
+        self.client.force_authenticate(user=user)
+        response = self.client.get("/api/transfer-stats/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for counter in ["transfers", "retries", "failures", "transfers_per_second"]:
+            self.assertIn(counter, response.data)
+
+    def test_staff_user_reads_balance_cache_counters(self):
+        user = User.objects.create_user(
+            username="admin", password="LENDSQR001", is_staff=True
+        )
+        self.client.force_authenticate(user=user)
+        response = self.client.get("/api/balance-cache-stats/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for counter in ["hits", "misses", "errors", "hit_ratio"]:
+            self.assertIn(counter, response.data)
+
+@override_settings(TOKEN_CACHE_ALIAS="default")
+class CachedTokenAuthenticationAPITests(APITestCase):
+    """
+    These tests ensure that remembered tokens skip the token lookup until they are revoked.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # setup a user with a savings wallet and a token for our tests.
+        cls.user = User.objects.create_user(
+            username="john", email="johndoe@gmail.com", password="LENDSQR001"
+        )
+        Savings.objects.create(first_name="John", last_name="Doe", user_id=cls.user)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        caches["default"].clear()
+        token_cache.local_tokens.clear()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def get_savings_details(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/api/savings-details/")
+        tables = " ".join(query["sql"] for query in context.captured_queries)
+        return response, "authtoken_token" in tables
+
+    def test_remembered_token_skips_token_lookup(self):
+        response, looked_up = self.get_savings_details()
+        self.assertTrue(looked_up)
+        response, looked_up = self.get_savings_details()
+        self.assertFalse(looked_up)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["user_id"], "john")
+
+    def test_logout_revokes_remembered_token(self):
+        self.get_savings_details()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api-dj-rest-auth/logout/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response, looked_up = self.get_savings_details()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(str(response.data["detail"]), "Invalid token.")
+
+    def test_deactivated_user_is_not_remembered(self):
+        self.get_savings_details()
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response, looked_up = self.get_savings_details()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoked_token_is_not_remembered(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            token_cache.restamp([self.token.key], token_cache.REVOKED)
+        token_cache.resolve(self.token.key, lambda key: (self.user, self.token))
+        self.assertIsNone(token_cache.local_tokens.get(self.token.key))
+
 
 class LogoutAPITests(APITestCase):
     """
@@ -573,3 +1299,255 @@ class LogoutAPITests(APITestCase):
         # assert user cannot make further requests as token key is now invalid.
         response = self.client.get("/api/transactions/")
         self.assertEqual(str(response.data["detail"]), "Invalid token.")
+
+
+class FundWalletsCSVAPITests(APITestCase):
+    """
+    These tests ensure that staff users can fund many wallets from an uploaded CSV file.
+    """
+
+    def setUp(self):
+        # set up a staff user and two users with savings wallets.
+        self.staff_user = User.objects.create_user(
+            username="admin", password="2HJ1vRV0Z&3iD", is_staff=True
+        )
+        self.user1 = User.objects.create_user(
+            username="john", email="johndoe@gmail.com", password="2HJ1vRV0Z&3iD"
+        )
+        self.user2 = User.objects.create_user(
+            username="jane", email="janedoe@gmail.com", password="1X<ISRUkw+tuK"
+        )
+        self.wallet1 = Savings.objects.create(
+            first_name="John", last_name="Doe", balance=100.00, user_id=self.user1
+        )
+        self.wallet2 = Savings.objects.create(
+            first_name="Jane", last_name="Doe", user_id=self.user2
+        )
+
+    def upload(self, content):
+        csv_file = SimpleUploadedFile("funding.csv", content.encode(), content_type="text/csv")
+        return self.client.post(
+            "/api/fund-wallets-csv/", {"file": csv_file}, format="multipart"
+        )
+
+    def test_user_is_not_staff(self):
+        self.client.force_authenticate(user=self.user1)
+        response = self.upload("email,amount\njohndoe@gmail.com,100\n")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_staff_funds_wallets_from_csv(self):
+        self.client.force_authenticate(user=self.staff_user)
+        content = (
+            "email,amount\n"
+            "johndoe@gmail.com,100\n"
+            f"{self.user2.id},250.50\n"
+            "marydoe@gmail.com,10\n"  # no savings wallet.
+            "janedoe@gmail.com,-5\n"  # invalid amount.
+        )
+        response = self.upload(content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["funded"], 2)
+        self.assertEqual(response.data["failed"], 2)
+        self.assertEqual(response.data["total"], "350.50")
+        self.assertEqual([error["row"] for error in response.data["errors"]], [4, 5])
+        self.wallet1.refresh_from_db()
+        self.wallet2.refresh_from_db()
+        self.assertEqual(self.wallet1.balance, 200)
+        self.assertEqual(self.wallet2.balance, Decimal("250.50"))
+        self.assertEqual(
+            Transactions.objects.get(savings_id=self.wallet2).describe(),
+            "You funded your account with 250.50 naira.",
+        )
+
+    def test_same_upload_is_not_applied_twice(self):
+        self.client.force_authenticate(user=self.staff_user)
+        self.upload("johndoe@gmail.com,100\n")
+        response = self.upload("johndoe@gmail.com,100\n")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["finished"])
+        self.wallet1.refresh_from_db()
+        self.assertEqual(self.wallet1.balance, 200)
+
+
+class IdempotencyKeyAPITests(APITestCase):
+    """
+    These tests ensure that retried requests with an Idempotency-Key are applied only once.
+    """
+
+    def setUp(self):
+        # set up two users with savings wallets.
+        self.user1 = User.objects.create_user(
+            username="john", email="johndoe@gmail.com", password="2HJ1vRV0Z&3iD"
+        )
+        self.user2 = User.objects.create_user(
+            username="jane", email="janedoe@gmail.com", password="1X<ISRUkw+tuK"
+        )
+        self.wallet1 = Savings.objects.create(
+            first_name="John", last_name="Doe", balance=1000.00, user_id=self.user1
+        )
+        self.wallet2 = Savings.objects.create(
+            first_name="Jane", last_name="Doe", user_id=self.user2
+        )
+        self.client.force_authenticate(user=self.user1)
+
+    def put(self, url, data, key):
+        return self.client.put(url, data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_funding_is_applied_once(self):
+        first = self.put("/api/fund-savings/", {"amount": "500"}, "fund-1")
+        with CaptureQueriesContext(connection) as context:
+            second = self.put("/api/fund-savings/", {"amount": "500"}, "fund-1")
+        # the stored response is replayed without touching the wallets.
+        self.assertFalse(
+            any("wallet_" in query["sql"] for query in context.captured_queries)
+        )
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.wallet1.refresh_from_db()
+        self.assertEqual(self.wallet1.balance, 1500)
+        self.assertEqual(Transactions.objects.filter(savings_id=self.wallet1).count(), 1)
+
+    def test_retried_transfer_is_applied_once(self):
+        data = {"amount": "300", "email": "janedoe@gmail.com"}
+        self.put("/api/transfer-funds/", data, "transfer-1")
+        response = self.put("/api/transfer-funds/", data, "transfer-1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.wallet2.refresh_from_db()
+        self.assertEqual(self.wallet2.balance, 300)
+
+    def test_new_key_is_applied_again(self):
+        self.put("/api/withdraw-funds/", {"amount": "100"}, "withdraw-1")
+        self.put("/api/withdraw-funds/", {"amount": "100"}, "withdraw-2")
+        self.wallet1.refresh_from_db()
+        self.assertEqual(self.wallet1.balance, 800)
+
+    def test_key_reused_for_a_different_request(self):
+        self.put("/api/fund-savings/", {"amount": "500"}, "fund-1")
+        response = self.put("/api/fund-savings/", {"amount": "600"}, "fund-1")
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.wallet1.refresh_from_db()
+        self.assertEqual(self.wallet1.balance, 1500)
+
+    def test_keys_are_scoped_to_the_user(self):
+        self.put("/api/fund-savings/", {"amount": "500"}, "fund-1")
+        self.client.force_authenticate(user=self.user2)
+        self.put("/api/fund-savings/", {"amount": "500"}, "fund-1")
+        self.wallet2.refresh_from_db()
+        self.assertEqual(self.wallet2.balance, 500)
+
+    def test_failed_request_is_not_stored(self):
+        # a request raising an error is rolled back together with its key.
+        response = self.put("/api/withdraw-funds/", {"amount": "5000"}, "withdraw-1")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.put("/api/fund-savings/", {"amount": "5000"}, "fund-1")
+        response = self.put("/api/withdraw-funds/", {"amount": "5000"}, "withdraw-1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_expired_key_is_applied_again(self):
+        self.put("/api/fund-savings/", {"amount": "500"}, "fund-1")
+        IdempotencyKey.objects.update(created=timezone.now() - timedelta(days=2))
+        self.put("/api/fund-savings/", {"amount": "500"}, "fund-1")
+        self.wallet1.refresh_from_db()
+        self.assertEqual(self.wallet1.balance, 2000)
+
+    def test_purge_expired_keys(self):
+        self.put("/api/fund-savings/", {"amount": "500"}, "fund-1")
+        self.put("/api/fund-savings/", {"amount": "500"}, "fund-2")
+        IdempotencyKey.objects.filter(key="fund-1").update(
+            created=timezone.now() - timedelta(days=2)
+        )
+        call_command("purge_idempotency_keys", stdout=StringIO())
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)), ["fund-2"]
+        )
+
+
+class AsyncEndpointsAPITests(TestCase):
+    """
+    These tests ensure that the async registration and read endpoints behave like the others.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.karma_stub = KarmaStubServer(blacklisted=["fraud@gmail.com"]).start()
+        cls.addClassCleanup(cls.karma_stub.stop)
+
+    @classmethod
+    def setUpTestData(cls):
+        # setup a user with a savings wallet and two transactions.
+        cls.user = User.objects.create_user(
+            username="john", email="johndoe@gmail.com", password="LENDSQR001"
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        cls.savings_wallet = Savings.objects.create(
+            first_name="John", last_name="Doe", balance=500.00, user_id=cls.user
+        )
+        for details in ["first", "second"]:
+            Transactions.objects.create(details=details, savings_id=cls.savings_wallet)
+
+    def authorization(self):
+        return {"headers": {"Authorization": f"Token {self.token.key}"}}
+
+    async def test_register_user(self):
+        data = {"username": "jane", "email": "janedoe@gmail.com", "password": "LENDSQR001"}
+        with override_settings(ADJUTOR_KARMA_URL=self.karma_stub.url):
+            response = await self.async_client.post(
+                "/api/async/register/", data, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["username"], "jane")
+        self.assertTrue(await User.objects.filter(username="jane").aexists())
+
+    async def test_blacklisted_user_cannot_register(self):
+        data = {"username": "jane", "email": "fraud@gmail.com", "password": "LENDSQR001"}
+        with override_settings(ADJUTOR_KARMA_URL=self.karma_stub.url):
+            response = await self.async_client.post(
+                "/api/async/register/", data, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {"email": ["You have already been blacklisted."]})
+
+    async def test_invalid_registration(self):
+        data = {"username": "john", "email": "not-an-email", "password": "LENDSQR001"}
+        karma_requests = self.karma_stub.requests
+        response = await self.async_client.post(
+            "/api/async/register/", data, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.json()), {"username", "email"})
+        # invalid registrations are rejected before the karma check.
+        self.assertEqual(self.karma_stub.requests, karma_requests)
+
+    def test_middleware_runs_without_thread_switches(self):
+        # handlers are only adapted between sync and async code for sync-only middleware.
+        with override_settings(DEBUG=True), self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler()
+
+    async def test_user_not_authenticated(self):
+        response = await self.async_client.get("/api/async/savings-details/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_savings_detail(self):
+        response = await self.async_client.get(
+            "/api/async/savings-details/", **self.authorization()
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {"first_name": "John", "last_name": "Doe", "balance": "500.00", "user_id": "john"},
+        )
+
+    async def test_user_transactions_match_sync_endpoint(self):
+        response = await self.async_client.get(
+            "/api/async/transactions/?page_size=1", **self.authorization()
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]["details"], "second")
+        self.assertIn('rel="next"', response["Link"])
+        sync_response = await sync_to_async(self.client.get)(
+            "/api/transactions/?page_size=1", **self.authorization()
+        )
+        self.assertEqual(response.json(), sync_response.json())
@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import uuid
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from LENDSQR.local_cache import LocalCache
+
+# The following helpers remember the users of API tokens, so that authenticated requests
+# skip the token lookup.
+#
+# Each worker keeps the tokens it resolved in a local LRU. The shared cache holds a stamp per
+# token, and a local entry is only used while the stamp it was resolved under is current.
+# Deleting a token, e.g. on logout, or changing its user replaces the stamp, which stops
+# every worker from using its local entry at once.
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 10000  # tokens remembered per worker
+
+DEFAULT_TTL = 5 * 60  # seconds
+
+# the stamp of deleted tokens.
+REVOKED = "revoked"
+
+
+local_tokens = LocalCache(CACHE_SIZE, DEFAULT_TTL)
+
+
+def get_cache():
+    """Returns the cache shared by all workers, or None while token caching is disabled."""
+    alias = getattr(settings, "TOKEN_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def get_ttl():
+    return getattr(settings, "TOKEN_CACHE_TTL", DEFAULT_TTL)
+
+
+def stamp_key(key):
+    return "auth:token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def field_values(instance):
+    return [getattr(instance, field.attname) for field in instance._meta.concrete_fields]
+
+
+def from_values(model, values):
+    field_names = [field.attname for field in model._meta.concrete_fields]
+    return model.from_db(model._default_manager.db, field_names, values)
+
+
+def resolve(key, load):
+    """
+    Returns the (user, token) of a token key, calling `load(key)` when it is not cached.
+
+    `load` looks the token up in the database and raises for invalid tokens. Without a
+    shared cache, or when it fails, every call loads the token.
+    """
+    cache = get_cache()
+    if cache is None:
+        return load(key)
+    try:
+        stamp = cache.get(stamp_key(key))
+        entry = local_tokens.get(key)
+        if entry is not None and stamp is not None and entry[0] == stamp:
+            user = from_values(User, entry[1])
+            token = from_values(Token, entry[2])
+            token.user = user
+            return user, token
+        if stamp is None:
+            stamp = uuid.uuid4().hex
+            if not cache.add(stamp_key(key), stamp, get_ttl()):
+                stamp = cache.get(stamp_key(key))
+    except Exception:
+        logger.warning("Could not read the token cache.", exc_info=True)
+        return load(key)
+
+    user, token = load(key)
+    try:
+        # a token deleted or changed while it was loaded has a new stamp by now.
+        if stamp not in {None, REVOKED} and cache.get(stamp_key(key)) == stamp:
+            local_tokens.set(key, (stamp, field_values(user), field_values(token)))
+    except Exception:
+        logger.warning("Could not update the token cache.", exc_info=True)
+    return user, token
+
+
+def restamp(keys, stamp=None):
+    """Replaces the stamps of tokens once the current transaction commits."""
+    if get_cache() is None or not keys:
+        return
+    transaction.on_commit(lambda: _restamp(keys, stamp))
+
+
+def _restamp(keys, stamp):
+    try:
+        get_cache().set_many(
+            {stamp_key(key): stamp or uuid.uuid4().hex for key in keys}, get_ttl()
+        )
+    except Exception:
+        logger.error("Could not invalidate cached tokens.", exc_info=True)
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    restamp([instance.key], REVOKED)
+
+
+@receiver(post_save, sender=User)
+def restamp_tokens_of_changed_user(sender, instance, created, update_fields, **kwargs):
+    # logins only record their time; other changes, e.g. deactivation, must be seen at once.
+    if created or get_cache() is None or update_fields == frozenset({"last_login"}):
+        return
+    restamp(list(Token.objects.filter(user=instance).values_list("key", flat=True)))
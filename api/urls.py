@@ -4,12 +4,19 @@ from rest_framework import permissions
 from .views import (
     register_user,
     savings_detail,
+    balance_at,
+    summary,
     create_savings,
     fund_savings,
     withdraw_funds,
     transfer_funds,
-    user_transactions
+    user_transactions,
+    transfer_stats,
+    balance_cache_stats,
+    bulk_transfer_funds,
+    fund_wallets_csv,
 )
+from . import async_views
 
 
 urlpatterns = [
@@ -18,10 +25,20 @@ urlpatterns = [
    # path("savings/", savings_list, name="savings"), # remember to remove
     path("create-savings/", create_savings, name="create-savings"),
     path("savings-details/", savings_detail, name="savings-details"),
+    path("balance-at/", balance_at, name="balance-at"),
+    path("summary/", summary, name="summary"),
     path("fund-savings/", fund_savings, name="fund-savings"),
     path("withdraw-funds/", withdraw_funds, name="withdraw-funds"),
     path("transfer-funds/", transfer_funds, name="transfer-funds"),
+    path("bulk-transfer/", bulk_transfer_funds, name="bulk-transfer"),
+    path("fund-wallets-csv/", fund_wallets_csv, name="fund-wallets-csv"),
     path("transactions/", user_transactions, name="user-transactions"),
+    path("transfer-stats/", transfer_stats, name="transfer-stats"),
+    path("balance-cache-stats/", balance_cache_stats, name="balance-cache-stats"),
+    # async versions of the registration and read endpoints, for ASGI deployments.
+    path("async/register/", async_views.register_user, name="register-user-async"),
+    path("async/savings-details/", async_views.savings_detail, name="savings-details-async"),
+    path("async/transactions/", async_views.user_transactions, name="user-transactions-async"),
 ]
 
 urlpatterns = format_suffix_patterns(urlpatterns) # enables us to append format suffixes to endpoints.
\ No newline at end of file
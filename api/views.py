@@ -1,20 +1,34 @@
 from django.shortcuts import render
 from django.contrib.auth.models import User
-from wallet.models import Savings, Transactions
+from wallet.models import Transactions
+from wallet.pagination import paginate_transactions, InvalidCursor
+from wallet.transfers import stats as transfer_stats_counters
+from wallet.balance_cache import stats as balance_cache_counters
+from wallet.conditional import wallet_condition
+from wallet import rollups
 from .serializers import (
     UserSerializer,
     SavingsSerializer,
+    BalanceAtSerializer,
+    SummarySerializer,
     CreateSavingsSerializer,
     FundSavingsSerializer,
     WithdrawFundsSerializer,
     TransferFundsSerializer,
-    TransactionsSerializer,
+    TransactionRowsSerializer,
+    TransactionFilterSerializer,
+    BulkTransferSerializer,
+    FundWalletsCSVSerializer,
 )
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from .idempotency import idempotent
+from .parsers import MessagePackParser, NDJSONParser
+from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import serializers
+from rest_framework.utils.urls import replace_query_param
 
 # The following views handle the API requests and return appropiate responses.
 
@@ -41,24 +55,56 @@ def create_savings(request, format=None):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@wallet_condition
 def savings_detail(request, format=None):
     if request.method == "GET":
-        try:
-            savings_wallet = Savings.objects.get(user_id=request.user)
-        except Savings.DoesNotExist:
+        if not request.wallet:
+            raise serializers.ValidationError("You do not have a savings wallet.")
+        serializer = SavingsSerializer(request.wallet)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def balance_at(request, format=None):
+    if request.method == "GET":
+        if not request.wallet:
             raise serializers.ValidationError("You do not have a savings wallet.")
-        else:
-            serializer = SavingsSerializer(savings_wallet)
+        serializer = BalanceAtSerializer(data=request.query_params)
+        if serializer.is_valid():
+            moment = serializer.validated_data.get("at")
+            serializer = BalanceAtSerializer(
+                {"at": moment, "balance": request.wallet.balance_at(moment)}
+            )
             return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@wallet_condition
+def summary(request, format=None):
+    if request.method == "GET":
+        if not request.wallet:
+            raise serializers.ValidationError("You do not have a savings wallet.")
+        serializer = SummarySerializer(data=request.query_params)
+        if serializer.is_valid():
+            return Response(
+                rollups.summary(request.wallet, **serializer.validated_data),
+                status=status.HTTP_200_OK,
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(["PUT"])
 @permission_classes([IsAuthenticated])
+@idempotent
 def fund_savings(request, format=None):
     if request.method == "PUT":
         serializer = FundSavingsSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.validated_data["savings_owner"] = request.user
+            # the wallet was loaded along with the authenticated user.
+            serializer.validated_data["savings_wallet"] = request.wallet
             serializer.save()
             amount = serializer.validated_data.get("amount")
             return Response(
@@ -73,11 +119,13 @@ def fund_savings(request, format=None):
 
 @api_view(["PUT"])
 @permission_classes([IsAuthenticated])
+@idempotent
 def withdraw_funds(request, format=None):
     if request.method == "PUT":
         serializer = WithdrawFundsSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.validated_data["savings_owner"] = request.user
+            # the wallet was loaded along with the authenticated user.
+            serializer.validated_data["savings_wallet"] = request.wallet
             serializer.save()
             amount = serializer.validated_data.get("amount")
             return Response(
@@ -92,43 +140,106 @@ def withdraw_funds(request, format=None):
 
 @api_view(["PUT"])
 @permission_classes([IsAuthenticated])
+@idempotent
 def transfer_funds(request, format=None):
     if request.method == "PUT":
-        try:
-            remitter_savings_wallet = Savings.objects.get(user_id=request.user)
-        except Savings.DoesNotExist:
-            raise serializers.ValidationError(
-                "You cannot perform this transaction because you don't have a savings wallet."
+        serializer = TransferFundsSerializer(data=request.data)
+        if serializer.is_valid():
+            # the remitter wallet is resolved together with the beneficiary's.
+            serializer.save(request_user=request.user)
+            amount = serializer.validated_data.get("amount")
+            beneficiary_email = serializer.validated_data.get("email")
+            return Response(
+                {
+                    "status": "success",
+                    "message": f"You have successfully transferred {amount} naira from your account to {beneficiary_email}.",
+                },
+                status=status.HTTP_200_OK,
             )
-        else:
-            serializer = TransferFundsSerializer(data=request.data)
-            if serializer.is_valid():
-                serializer.save(request_user=request.user)
-                amount = serializer.validated_data.get("amount")
-                beneficiary_email = serializer.validated_data.get("email")
-                return Response(
-                    {
-                        "status": "success",
-                        "message": f"You have successfully transferred {amount} naira from your account to {beneficiary_email}.",
-                    },
-                    status=status.HTTP_200_OK,
-                )
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser, NDJSONParser, MessagePackParser])
+@idempotent
+def bulk_transfer_funds(request, format=None):
+    if request.method == "POST":
+        serializer = BulkTransferSerializer(data=request.data)
+        if serializer.is_valid():
+            serializer.save(request_user=request.user)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+@parser_classes([MultiPartParser])
+def fund_wallets_csv(request, format=None):
+    if request.method == "POST":
+        serializer = FundWalletsCSVSerializer(data=request.data)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@wallet_condition
 def user_transactions(request, format=None):
     if request.method == "GET":
+        if not request.wallet:
+            raise serializers.ValidationError("You do not have a savings wallet.")
+        filters = TransactionFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+        cursor = request.query_params.get("cursor")
         try:
-            user_savings_wallet = Savings.objects.get(user_id=request.user)
-            user_transactions = Transactions.objects.filter(
-                savings_id=user_savings_wallet
+            page = paginate_transactions(
+                Transactions.objects.filter(savings_id=request.wallet.pk)
+                .matching(**filters.validated_data)
+                .values_list(*TransactionRowsSerializer.fields, named=True),
+                cursor=cursor,
+                page_size=request.query_params.get("page_size"),
             )
-        except Savings.DoesNotExist:
-            raise serializers.ValidationError("You do not have a savings wallet.")
-        else:
-            if not user_transactions:
-                raise serializers.ValidationError("You do not have any transactions.")
-            serializer = TransactionsSerializer(user_transactions, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        except InvalidCursor as error:
+            raise serializers.ValidationError(str(error))
+        # a filter matching no transactions is answered with an empty page.
+        if not page.rows and not cursor and not filters.validated_data:
+            raise serializers.ValidationError("You do not have any transactions.")
+        serializer = TransactionRowsSerializer(page.rows)
+        return Response(
+            serializer.data,
+            status=status.HTTP_200_OK,
+            headers=pagination_headers(request, page),
+        )
+
+
+def pagination_headers(request, page):
+    """Returns a 'Link' header pointing at the neighbouring pages of a transactions page."""
+    url = request.build_absolute_uri()
+    links = []
+    if page.next_cursor:
+        links.append(f'<{replace_query_param(url, "cursor", page.next_cursor)}>; rel="next"')
+    if page.previous_cursor:
+        links.append(
+            f'<{replace_query_param(url, "cursor", page.previous_cursor)}>; rel="prev"'
+        )
+    return {"Link": ", ".join(links)} if links else {}
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def transfer_stats(request, format=None):
+    if request.method == "GET":
+        # counters are kept per worker process.
+        return Response(transfer_stats_counters.snapshot(), status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def balance_cache_stats(request, format=None):
+    if request.method == "GET":
+        # counters are kept per worker process.
+        return Response(balance_cache_counters.snapshot(), status=status.HTTP_200_OK)
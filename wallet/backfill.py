@@ -0,0 +1,213 @@
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from decimal import Decimal
+import django
+from django.db import connections
+from django.db.models import F, Max, Value
+from django.db.models.functions import Concat, Lower
+from .models import EntryType, JobCheckpoint, Savings, Transactions, to_kobo
+from .transfers import run_in_transaction
+
+# The following functions fill the ledger columns of transactions recorded before they existed.
+
+# legacy transactions read, parsed and updated in one transaction.
+BACKFILL_CHUNK_SIZE = 1000
+
+# transactions written by a single UPDATE.
+UPDATE_BATCH_SIZE = 500
+
+AMOUNT = r"(?P<amount>\d+(?:\.\d+)?)"
+
+# the details written by the web views and the API before the ledger columns existed. The
+# API ended them with a full stop, and the web views named the bank of a transfer.
+LEGACY_DETAILS = [
+    (EntryType.FUND, re.compile(rf"^You funded your account with {AMOUNT} naira\.?$")),
+    (EntryType.WITHDRAW, re.compile(rf"^You withdrew {AMOUNT} naira from your account\.?$")),
+    (
+        EntryType.TRANSFER_OUT,
+        re.compile(rf"^You transferred {AMOUNT} naira to (?P<name>.+?)(?: \([^()]*\))?\.?$"),
+    ),
+    (
+        EntryType.TRANSFER_IN,
+        re.compile(rf"^You were credited with {AMOUNT} naira from (?P<name>.+?)\.?$"),
+    ),
+]
+
+
+def parse_details(details):
+    """
+    Returns the (entry type, signed amount in kobo, counterparty name) of legacy details.
+
+    The name is None for fundings and withdrawals; None is returned for details in no
+    known format.
+    """
+    for entry_type, pattern in LEGACY_DETAILS:
+        match = pattern.match(details.strip())
+        if match:
+            amount = to_kobo(Decimal(match["amount"]))
+            if entry_type in (EntryType.WITHDRAW, EntryType.TRANSFER_OUT):
+                amount = -amount
+            name = match.groupdict().get("name")
+            return entry_type, amount, name
+    return None
+
+
+class BackfillReport:
+    """The progress of one key range of a backfill job."""
+
+    def __init__(self, checkpoint, until):
+        self.name = checkpoint.name
+        self.position = checkpoint.position
+        self.until = until
+        self.updated = checkpoint.succeeded
+        self.failed = checkpoint.failed
+        self.finished = checkpoint.finished
+
+
+def plan_ranges(name, workers):
+    """
+    Returns the (job name, after, until) primary key ranges of a backfill split between workers.
+
+    The end of the table is recorded by the first run of the job named `name`, so a rerun
+    with the same number of workers resumes the same ranges; legacy rows all precede it.
+    """
+    checkpoint, created = JobCheckpoint.objects.get_or_create(name=name)
+    if created:
+        checkpoint.position = Transactions.objects.aggregate(end=Max("pk"))["end"] or 0
+        JobCheckpoint.objects.filter(pk=checkpoint.pk).update(position=checkpoint.position)
+    end = checkpoint.position
+    size = -(-end // workers)
+    return [
+        (f"{name}:{index + 1}/{workers}", index * size, min((index + 1) * size, end))
+        for index in range(workers)
+        if index * size < end
+    ]
+
+
+def backfill_range(
+    name, after, until, chunk_size=BACKFILL_CHUNK_SIZE, rows_per_second=None, progress=None
+):
+    """
+    Fills the ledger columns of the legacy transactions with a primary key in (after, until].
+
+    The range is walked in primary key order, one chunk per transaction; every chunk
+    advances the checkpoint of the job named `name` to its last primary key, so an
+    interrupted job resumes after its last committed chunk. Chunks are spaced to read at
+    most `rows_per_second` rows. `progress(report)` is called after every chunk.
+    """
+    checkpoint, created = JobCheckpoint.objects.get_or_create(
+        name=name, defaults={"position": after}
+    )
+    report = BackfillReport(checkpoint, until)
+    while not report.finished:
+        started = time.monotonic()
+        entries = list(
+            Transactions.objects.filter(
+                pk__gt=report.position, pk__lte=until, entry_type__isnull=True
+            )
+            .order_by("pk")
+            .only("pk", "savings_id", "details", "counterparty", "reference")[:chunk_size]
+        )
+        if entries:
+            updated = _backfill_chunk(checkpoint, entries)
+            report.position = entries[-1].pk
+            report.updated += updated
+            report.failed += len(entries) - updated
+        if len(entries) < chunk_size:
+            JobCheckpoint.objects.filter(pk=checkpoint.pk).update(finished=True)
+            report.finished = True
+        if progress:
+            progress(report)
+        if rows_per_second and not report.finished:
+            time.sleep(max(0, len(entries) / rows_per_second - (time.monotonic() - started)))
+    return report
+
+
+def _backfill_chunk(checkpoint, entries):
+    parsed = []
+    for entry in entries:
+        result = parse_details(entry.details)
+        if result is not None:
+            entry.entry_type, entry.amount, name = result
+            parsed.append((entry, name))
+
+    # the two halves of a legacy transfer were recorded one after the other.
+    for (debit, _), (credit, _) in zip(parsed, parsed[1:]):
+        if (
+            debit.entry_type == EntryType.TRANSFER_OUT
+            and credit.entry_type == EntryType.TRANSFER_IN
+            and credit.pk == debit.pk + 1
+            and credit.amount == -debit.amount
+            and credit.savings_id_id != debit.savings_id_id
+        ):
+            debit.counterparty_id = credit.savings_id_id
+            credit.counterparty_id = debit.savings_id_id
+            debit.reference = credit.reference = uuid.uuid4()
+    # the other transfers name a counterparty, which is kept when only one wallet has its name.
+    names = {
+        name.lower()
+        for entry, name in parsed
+        if name is not None and entry.counterparty_id is None
+    }
+    counterparties = {}
+    if names:
+        wallets = (
+            Savings.objects.annotate(
+                full_name=Lower(Concat("first_name", Value(" "), "last_name"))
+            )
+            .filter(full_name__in=names)
+            .values_list("full_name", "pk")
+        )
+        for full_name, pk in wallets:
+            counterparties[full_name] = None if full_name in counterparties else pk
+    for entry, name in parsed:
+        if name is not None and entry.counterparty_id is None:
+            entry.counterparty_id = counterparties.get(name.lower())
+
+    def run():
+        Transactions.objects.bulk_update(
+            [entry for entry, name in parsed],
+            ["entry_type", "amount", "counterparty", "reference"],
+            batch_size=UPDATE_BATCH_SIZE,
+        )
+        JobCheckpoint.objects.filter(pk=checkpoint.pk).update(
+            position=entries[-1].pk,
+            succeeded=F("succeeded") + len(parsed),
+            failed=F("failed") + len(entries) - len(parsed),
+        )
+
+    run_in_transaction(run)
+    return len(parsed)
+
+
+def backfill_ledger(
+    name, workers=1, chunk_size=BACKFILL_CHUNK_SIZE, rows_per_second=None, progress=None
+):
+    """
+    Fills the ledger columns of every legacy transaction and returns the range reports.
+
+    The table is split into one primary key range per worker (see plan_ranges). Several
+    workers run the ranges in a process pool, sharing `rows_per_second` between them, and
+    `progress(report)` is then only called once a range is finished.
+    """
+    ranges = plan_ranges(name, workers)
+    if workers == 1:
+        return [
+            backfill_range(*key_range, chunk_size, rows_per_second, progress)
+            for key_range in ranges
+        ]
+    rate = rows_per_second / workers if rows_per_second else None
+    # the workers open their own connections rather than share the parent's.
+    connections.close_all()
+    reports = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        futures = [
+            pool.submit(backfill_range, *key_range, chunk_size, rate) for key_range in ranges
+        ]
+        for future in as_completed(futures):
+            reports.append(future.result())
+            if progress:
+                progress(reports[-1])
+    return reports
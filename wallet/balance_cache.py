@@ -0,0 +1,216 @@
+import logging
+import threading
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+# The following helpers cache savings wallets, keyed by wallet id and balance version.
+#
+# Every write to a wallet increments its `version` column and sets its `updated` time. The
+# cache holds, per wallet, a pointer to its current version, the balance and time of each
+# version and its owner and names:
+#
+#   savings:owner:<user id>             -> wallet id
+#   savings:<wallet id>:profile         -> (user id, first name, last name)
+#   savings:<wallet id>:version         -> current version
+#   savings:<wallet id>:state:<v>       -> (balance, time of the write) at version v
+#
+# Writers move the version pointer while they hold the wallet row lock, so pointers move in
+# commit order, and store the new balance once their transaction commits. Until then
+# readers find no balance for the new version and read the wallet from the database, which
+# only shows them committed balances. A state stored under a version never changes.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 24 * 60 * 60  # seconds
+
+# A wallet as read from the cache.
+CachedWallet = namedtuple(
+    "CachedWallet",
+    ["id", "user_id_id", "first_name", "last_name", "balance", "version", "updated"],
+)
+
+
+class CacheStats:
+    """Thread-safe counters used to watch the hit ratio of the balance cache."""
+
+    COUNTERS = ["hits", "misses", "writes", "errors"]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def record(self, counter, count=1):
+        with self._lock:
+            self._counts[counter] += count
+
+    def snapshot(self):
+        """Returns the counters of this process along with the hit ratio."""
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_ratio"] = round(counts["hits"] / lookups, 3) if lookups else 0.0
+        return counts
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    """Returns the cache holding wallet balances, or None while it is disabled."""
+    alias = getattr(settings, "BALANCE_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def get_timeout():
+    return getattr(settings, "BALANCE_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+
+
+def owner_key(user_id):
+    return f"savings:owner:{user_id}"
+
+
+def profile_key(wallet_id):
+    return f"savings:{wallet_id}:profile"
+
+
+def version_key(wallet_id):
+    return f"savings:{wallet_id}:version"
+
+
+def state_key(wallet_id, version):
+    return f"savings:{wallet_id}:state:{version}"
+
+
+def lookup(user_id):
+    """Returns the CachedWallet of a user, or None when any part of it is not cached."""
+    cache = get_cache()
+    if cache is None:
+        return None
+    try:
+        wallet_id = cache.get(owner_key(user_id))
+        if wallet_id is not None:
+            entries = cache.get_many([profile_key(wallet_id), version_key(wallet_id)])
+            profile = entries.get(profile_key(wallet_id))
+            version = entries.get(version_key(wallet_id))
+            if profile is not None and version is not None:
+                state = cache.get(state_key(wallet_id, version))
+                if state is not None:
+                    balance, updated = state
+                    stats.record("hits")
+                    return CachedWallet(wallet_id, *profile, balance, version, updated)
+    except Exception:
+        # the database stays the source of truth when the cache is unavailable.
+        logger.warning("Could not read the balance cache.", exc_info=True)
+        stats.record("errors")
+    stats.record("misses")
+    return None
+
+
+def fill(wallet):
+    """Caches a wallet read from the database, once the rows read are known to be committed."""
+    if get_cache() is None:
+        return
+    entries = (
+        wallet.pk,
+        wallet.user_id_id,
+        wallet.first_name,
+        wallet.last_name,
+        wallet.balance,
+        wallet.version,
+        wallet.updated,
+    )
+    transaction.on_commit(lambda: _fill(*entries))
+
+
+def _fill(wallet_id, user_id, first_name, last_name, balance, version, updated):
+    cache = get_cache()
+    timeout = get_timeout()
+    try:
+        # add() never moves a pointer set by a writer since the wallet was read.
+        cache.add(owner_key(user_id), wallet_id, timeout)
+        cache.add(profile_key(wallet_id), (user_id, first_name, last_name), timeout)
+        cache.add(version_key(wallet_id), version, timeout)
+        cache.set(state_key(wallet_id, version), (balance, updated), timeout)
+    except Exception:
+        logger.warning("Could not fill the balance cache.", exc_info=True)
+        stats.record("errors")
+
+
+def publish(updates):
+    """
+    Writes the (wallet id, version, balance, updated) updates of the current transaction
+    through.
+
+    Call it right after the UPDATE, while the wallet rows are locked: the version pointers
+    move at once and the balances are stored once the transaction commits.
+    """
+    cache = get_cache()
+    if cache is None or not updates:
+        return
+    timeout = get_timeout()
+    pointers = {version_key(wallet_id): version for wallet_id, version, *state in updates}
+    try:
+        failed = cache.set_many(pointers, timeout)
+    except Exception:
+        logger.warning("Could not update the balance cache.", exc_info=True)
+        stats.record("errors")
+        failed = list(pointers)
+    if failed:
+        # a pointer left on an older version would serve its balance, so it is dropped.
+        _delete(failed)
+    states = {
+        state_key(wallet_id, version): tuple(state) for wallet_id, version, *state in updates
+    }
+    transaction.on_commit(lambda: _store(states))
+
+
+def _store(entries):
+    try:
+        get_cache().set_many(entries, get_timeout())
+    except Exception:
+        # readers fall back to the database until the balances are stored.
+        logger.warning("Could not update the balance cache.", exc_info=True)
+        stats.record("errors")
+    else:
+        stats.record("writes", len(entries))
+
+
+def publish_profile(wallet):
+    """Writes the owner and names of a saved wallet through, once the transaction commits."""
+    if get_cache() is None:
+        return
+    wallet_id, user_id = wallet.pk, wallet.user_id_id
+    entries = {
+        owner_key(user_id): wallet_id,
+        profile_key(wallet_id): (user_id, wallet.first_name, wallet.last_name),
+    }
+    transaction.on_commit(lambda: _store(entries))
+
+
+def forget(wallet_id, user_id):
+    """Removes a deleted wallet from the cache, once the transaction commits."""
+    if get_cache() is None:
+        return
+    keys = [owner_key(user_id), profile_key(wallet_id), version_key(wallet_id)]
+    transaction.on_commit(lambda: _delete(keys))
+
+
+def _delete(keys):
+    try:
+        get_cache().delete_many(keys)
+    except Exception:
+        logger.error("Could not remove stale entries from the balance cache.", exc_info=True)
+        stats.record("errors")
+
+
+@receiver(post_delete, sender="wallet.Savings")
+def forget_deleted_wallet(sender, instance, **kwargs):
+    forget(instance.pk, instance.user_id_id)
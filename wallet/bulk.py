@@ -0,0 +1,356 @@
+import csv
+from collections import defaultdict
+from decimal import Decimal
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db.models import Case, F, PositiveBigIntegerField, Q, When
+from .exceptions import InsufficientFunds, JobConflict, WalletNotFound
+from .models import BalanceCheckpoint, JobCheckpoint, Savings, Transactions, next_version
+from .transfers import lock_for_update, publish_wallets, run_in_transaction, stats
+from . import balance_cache, rollups
+
+# The following functions move money to many wallets with a constant number of statements per batch.
+
+MAX_BULK_TRANSFER_ITEMS = 10000
+
+# wallets resolved by a single IN query.
+LOOKUP_BATCH_SIZE = 5000
+
+# wallets credited by a single UPDATE.
+CREDIT_BATCH_SIZE = 500
+
+# transactions written by a single INSERT.
+INSERT_BATCH_SIZE = 1000
+
+
+class PayoutResult:
+    """The outcome of a single item of a bulk transfer."""
+
+    def __init__(self, index, email, amount, error=None):
+        self.index = index
+        self.email = email
+        self.amount = amount
+        self.error = error
+
+    @property
+    def succeeded(self):
+        return self.error is None
+
+    def as_dict(self):
+        result = {
+            "index": self.index,
+            "email": self.email,
+            "amount": str(self.amount) if self.amount is not None else None,
+            "status": "success" if self.succeeded else "failed",
+        }
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+def apply_credits(credits, written):
+    """
+    Adds {wallet id: amount} credits to their wallets with one UPDATE per batch.
+
+    Each wallet moves past the {wallet id: ledger entries} written to it (see next_version).
+    While the balance cache is enabled, the new balances are read back with one SELECT per
+    batch, while the UPDATE still holds the rows, and written through the cache.
+    """
+    wallet_ids = sorted(credits)
+    for start in range(0, len(wallet_ids), CREDIT_BATCH_SIZE):
+        batch = wallet_ids[start : start + CREDIT_BATCH_SIZE]
+        changes = next_version()
+        changes["version"] = Case(
+            *[When(pk=pk, then=F("version") + max(written[pk], 1)) for pk in batch],
+            default=F("version"),
+            output_field=PositiveBigIntegerField(),
+        )
+        Savings.objects.filter(pk__in=batch).update(
+            balance=Case(
+                *[When(pk=pk, then=F("balance") + credits[pk]) for pk in batch],
+                default=F("balance"),
+            ),
+            **changes,
+        )
+        if balance_cache.get_cache() is not None:
+            balance_cache.publish(
+                list(
+                    Savings.objects.filter(pk__in=batch).values_list(
+                        "pk", "version", "balance", "updated"
+                    )
+                )
+            )
+
+
+def bulk_transfer(remitter_owner, payouts):
+    """
+    Transfers money from a user's wallet to many beneficiaries in one database transaction.
+
+    `payouts` is a list of PayoutResult items whose amounts have been validated; items that
+    already carry an error are skipped. Beneficiary wallets are resolved and locked together
+    with the remitter's in primary key order, the total is checked against the remitter
+    balance once, and every item is recorded as a debit and credit entry pair (see
+    Transactions.transfer_pair). The whole batch is rejected with
+    InsufficientFunds when the remitter cannot cover its total.
+    """
+    emails = sorted({payout.email for payout in payouts if payout.succeeded})
+
+    def run():
+        remitter_wallet, beneficiaries = _lock_wallets(remitter_owner, emails)
+        accepted = []
+        for payout in payouts:
+            if not payout.succeeded:
+                continue
+            wallets = beneficiaries.get(payout.email, [])
+            if not wallets:
+                payout.error = "This beneficiary does not have a savings wallet."
+            elif len(wallets) > 1:
+                payout.error = "More than one savings wallet belongs to this email address."
+            elif wallets[0].pk == remitter_wallet.pk:
+                payout.error = "You cannot transfer funds to your own savings wallet."
+            else:
+                accepted.append((payout, wallets[0]))
+
+        total = sum((payout.amount for payout, wallet in accepted), 0)
+        if total > remitter_wallet.balance:
+            raise InsufficientFunds(
+                "You do not have enough funds in your savings wallet for these transfers."
+            )
+        if not accepted:
+            return remitter_wallet
+
+        credits, written = defaultdict(int), defaultdict(int)
+        entries = []
+        for payout, wallet in accepted:
+            credits[wallet.pk] += payout.amount
+            written[wallet.pk] += 1
+            entries.extend(Transactions.transfer_pair(remitter_wallet, wallet, payout.amount))
+        changes = next_version(len(accepted))
+        Savings.objects.filter(pk=remitter_wallet.pk).update(
+            balance=F("balance") - total, **changes
+        )
+        remitter_wallet.balance -= total
+        publish_wallets([remitter_wallet], changes["updated"], len(accepted))
+        apply_credits(credits, written)
+        Transactions.objects.bulk_create(entries, batch_size=INSERT_BATCH_SIZE)
+        rollups.record(entries)
+        BalanceCheckpoint.objects.record(
+            [remitter_wallet.pk, *credits], {remitter_wallet.pk: len(accepted), **written}
+        )
+        return remitter_wallet
+
+    try:
+        remitter_wallet = run_in_transaction(run)
+    except InsufficientFunds:
+        stats.record("insufficient_funds")
+        raise
+    stats.record("transfers", sum(1 for payout in payouts if payout.succeeded))
+    return remitter_wallet
+
+
+def _lock_wallets(remitter_owner, emails):
+    """Returns the locked remitter wallet and the beneficiary wallets keyed by email."""
+    # the wallets are resolved batch by batch without locks, then locked in primary key order
+    # across all batches, so bulk transfers sharing beneficiaries always lock them in the same
+    # order and cannot deadlock. The remitter is resolved with the first batch.
+    wallet_ids = set()
+    for start in range(0, max(len(emails), 1), LOOKUP_BATCH_SIZE):
+        lookup = Q(user_id__email__in=emails[start : start + LOOKUP_BATCH_SIZE])
+        if start == 0:
+            lookup |= Q(user_id=remitter_owner)
+        wallet_ids.update(Savings.objects.filter(lookup).values_list("pk", flat=True))
+    wallet_ids = sorted(wallet_ids)
+    requested = set(emails)
+    remitter_wallet = None
+    beneficiaries = defaultdict(list)
+    for start in range(0, len(wallet_ids), LOOKUP_BATCH_SIZE):
+        wallets = lock_for_update(
+            Savings.objects.select_related("user_id")
+            .filter(pk__in=wallet_ids[start : start + LOOKUP_BATCH_SIZE])
+            .order_by("pk")
+        )
+        for wallet in wallets:
+            if wallet.user_id_id == remitter_owner.pk:
+                remitter_wallet = wallet
+            # an email changed since the wallet was resolved no longer names it.
+            if wallet.user_id.email in requested:
+                beneficiaries[wallet.user_id.email].append(wallet)
+    if remitter_wallet is None:
+        raise WalletNotFound(
+            "You cannot perform this transaction because you don't have a savings wallet."
+        )
+    return remitter_wallet, beneficiaries
+
+
+# rows of a funding file applied in one transaction.
+FUNDING_CHUNK_SIZE = 1000
+
+# failed rows reported back in full; the rest are only counted.
+MAX_REPORTED_ERRORS = 1000
+
+# amounts are validated like those sent to the fund-savings endpoint.
+FUNDING_AMOUNT = forms.DecimalField(max_digits=12, decimal_places=2)
+
+# the largest user id a bigint column holds.
+MAX_USER_ID = 2**63 - 1
+
+
+def parse_user_id(identity):
+    """Returns the user id of an identity in ASCII digits, or None if it cannot be one."""
+    if not (identity.isascii() and identity.isdigit()) or int(identity) > MAX_USER_ID:
+        return None
+    return int(identity)
+
+
+class FundingReport:
+    """The progress of a bulk funding job."""
+
+    def __init__(self, checkpoint):
+        self.name = checkpoint.name
+        self.rows = checkpoint.position
+        self.funded = checkpoint.succeeded
+        self.failed = checkpoint.failed
+        self.finished = checkpoint.finished
+        self.resumed_from = checkpoint.position
+        self.total = Decimal("0.00")
+        self.errors = []
+
+    def add_error(self, row_number, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": error})
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "rows": self.rows,
+            "funded": self.funded,
+            "failed": self.failed,
+            "total": str(self.total),
+            "resumed_from": self.resumed_from,
+            "finished": self.finished,
+            "errors": self.errors,
+        }
+
+
+def read_funding_rows(lines):
+    """
+    Yields the (row number, identity, amount) rows of a CSV of user ids or emails and amounts.
+
+    A leading header row is skipped. Rows are read one at a time, so the file is never held
+    in memory.
+    """
+    for row_number, row in enumerate(csv.reader(lines), start=1):
+        if not row or not "".join(row).strip():
+            continue
+        if row_number == 1 and row[0].strip().lower() in {"email", "user", "user_id", "id"}:
+            continue
+        identity = row[0].strip()
+        amount = row[1].strip() if len(row) > 1 else ""
+        yield row_number, identity, amount
+
+
+def fund_from_rows(rows, name, chunk_size=FUNDING_CHUNK_SIZE, progress=None):
+    """
+    Credits wallets from (row number, identity, amount) rows in fixed-size chunks.
+
+    Every chunk resolves its wallets with one query, credits them set-based, writes its
+    transactions with bulk_create and advances the job checkpoint in the same transaction,
+    so an interrupted job named `name` resumes after its last committed chunk. A chunk
+    already applied by an overlapping run of the same job is rolled back and JobConflict
+    raised. `progress(report)` is called after every chunk.
+    """
+    checkpoint, created = JobCheckpoint.objects.get_or_create(name=name)
+    report = FundingReport(checkpoint)
+    if checkpoint.finished:
+        return report
+
+    position = 0
+    chunk = []
+    for row in rows:
+        position += 1
+        # rows up to the checkpoint have already been committed.
+        if position <= checkpoint.position:
+            continue
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            _fund_chunk(checkpoint, chunk, report)
+            chunk = []
+            if progress:
+                progress(report)
+    if chunk:
+        _fund_chunk(checkpoint, chunk, report)
+    JobCheckpoint.objects.filter(pk=checkpoint.pk).update(finished=True)
+    report.finished = True
+    if progress:
+        progress(report)
+    return report
+
+
+def _fund_chunk(checkpoint, chunk, report):
+    user_ids = {parse_user_id(identity) for row_number, identity, amount in chunk} - {None}
+    emails = {identity for row_number, identity, amount in chunk if not identity.isdigit()}
+    position = report.rows
+
+    def run():
+        wallets_by_user, wallets_by_email = defaultdict(list), defaultdict(list)
+        wallets = Savings.objects.select_related("user_id").filter(
+            Q(user_id__in=user_ids) | Q(user_id__email__in=emails)
+        )
+        for wallet in wallets:
+            wallets_by_user[wallet.user_id_id].append(wallet)
+            wallets_by_email[wallet.user_id.email].append(wallet)
+
+        credits, written = defaultdict(int), defaultdict(int)
+        entries = []
+        errors = []
+        total = Decimal("0.00")
+        for row_number, identity, amount in chunk:
+            try:
+                amount = FUNDING_AMOUNT.clean(amount).quantize(Decimal("0.01"))
+            except ValidationError as error:
+                errors.append((row_number, " ".join(error.messages)))
+                continue
+            if amount <= 0:
+                errors.append((row_number, "Please enter an amount greater than zero."))
+                continue
+            if identity.isdigit():
+                user_id = parse_user_id(identity)
+                if user_id is None:
+                    errors.append((row_number, f"'{identity}' is not a valid user id."))
+                    continue
+                matches = wallets_by_user[user_id]
+            else:
+                matches = wallets_by_email[identity]
+            if len(matches) != 1:
+                errors.append(
+                    (row_number, f"'{identity}' does not match exactly one savings wallet.")
+                )
+                continue
+            credits[matches[0].pk] += amount
+            written[matches[0].pk] += 1
+            total += amount
+            entries.append(Transactions.funding(matches[0], amount))
+        apply_credits(credits, written)
+        Transactions.objects.bulk_create(entries, batch_size=INSERT_BATCH_SIZE)
+        rollups.record(entries)
+        BalanceCheckpoint.objects.record(credits, written)
+        # an overlapping run of the same job that committed this chunk first has moved the
+        # checkpoint on, and the credits of this run are rolled back.
+        advanced = JobCheckpoint.objects.filter(pk=checkpoint.pk, position=position).update(
+            position=F("position") + len(chunk),
+            succeeded=F("succeeded") + len(entries),
+            failed=F("failed") + len(errors),
+        )
+        if not advanced:
+            raise JobConflict(
+                f"Another run of the job '{checkpoint.name}' has already applied these rows."
+            )
+        return len(entries), total, errors
+
+    funded, total, errors = run_in_transaction(run)
+    report.rows += len(chunk)
+    report.funded += funded
+    report.total += total
+    for row_number, error in errors:
+        report.add_error(row_number, error)
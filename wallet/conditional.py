@@ -0,0 +1,51 @@
+import hashlib
+import time
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+# The following helpers let clients revalidate wallet pages with ETag and Last-Modified.
+#
+# A page showing a wallet only changes when the wallet does, and every write to a wallet
+# moves it to a new version (see wallet.balance_cache). The validators are therefore taken
+# from the request's wallet alone, which is served from the balance cache when it is
+# enabled, so a request answered with 304 Not Modified reads nothing else.
+
+
+def wallet_etag(request, *args, **kwargs):
+    """Returns a strong ETag for the page of the request's wallet, or None without a wallet."""
+    wallet = request.wallet
+    if not wallet:
+        return None
+    user = request.user
+    renderer = getattr(request, "accepted_renderer", None)
+    parts = [
+        wallet.pk,
+        wallet.version,
+        # the rest of the page: its owner, query, format and the CSRF secret of its forms.
+        user.pk,
+        user.get_username(),
+        user.first_name,
+        request.get_full_path(),
+        renderer.media_type if renderer else "",
+        request.META.get("CSRF_COOKIE", ""),
+        # the totals of the current day and month (see wallet.rollups) roll over at midnight.
+        timezone.localdate(),
+    ]
+    return '"%s"' % hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32]
+
+
+def wallet_last_modified(request, *args, **kwargs):
+    """Returns the time of the last write to the request's wallet (or midnight), or None."""
+    wallet = request.wallet
+    if not wallet:
+        return None
+    # Last-Modified has a resolution of one second, so a time within the current second is
+    # left out: a later write in that same second could not be told apart from it.
+    if int(wallet.updated.timestamp()) >= int(time.time()):
+        return None
+    midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(wallet.updated, midnight)
+
+
+# answers conditional GET requests for pages of the request's wallet.
+wallet_condition = condition(etag_func=wallet_etag, last_modified_func=wallet_last_modified)
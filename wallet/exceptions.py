@@ -0,0 +1,29 @@
+# The following exceptions are raised by the wallet money-moving operations.
+
+
+class WalletError(Exception):
+    """Base class of the errors raised while moving money between wallets."""
+
+
+class InsufficientFunds(WalletError):
+    """Raised when a wallet does not hold enough funds for a debit."""
+
+
+class InvalidAmount(WalletError):
+    """Raised when an amount to move is not a positive sum of money."""
+
+
+class WalletNotFound(WalletError):
+    """Raised when a user does not have a savings wallet."""
+
+
+class BeneficiaryNotFound(WalletError):
+    """Raised when the beneficiary of a transfer cannot be resolved to a wallet."""
+
+
+class SelfTransfer(WalletError):
+    """Raised when a user tries to transfer funds to their own wallet."""
+
+
+class JobConflict(WalletError):
+    """Raised when another run of a job has committed progress this run did not expect."""
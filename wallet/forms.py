@@ -1,6 +1,8 @@
 from django import forms
 from django.forms import TextInput
-from .models import Savings
+from .models import EntryType, Savings
+from .exceptions import BeneficiaryNotFound
+from .services import find_beneficiary_by_name
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 
@@ -40,18 +42,6 @@ class TransferForm(forms.Form):
                 _("Please enter a real beneficiary with a first name and last name."),
                 code="invalid",
             )
-        beneficiary_first_name, beneficiary_last_name = name
-        try:
-            Savings.objects.get(
-                first_name__iexact=beneficiary_first_name,
-                last_name__iexact=beneficiary_last_name,
-            )
-        except Savings.DoesNotExist:
-            raise ValidationError(
-                _("%(beneficiary)s does not exist. Please enter a real beneficiary."),
-                code="invalid",
-                params={"beneficiary": curr_val},
-            )
 
     BANKS = [
         ("AC", "Access Bank"),
@@ -78,8 +68,54 @@ class TransferForm(forms.Form):
         label="Beneficiary Name",
         validators=[validate_beneficiary_name],
     )
+    # the bank is not part of the ledger entries, as transfers stay between wallets of this service.
     bank = forms.ChoiceField(
         help_text="Select the beneficiary's bank",
         label="Select a bank",
         choices=BANKS,
-    )
\ No newline at end of file
+    )
+
+    def clean_name(self):
+        """Resolves the beneficiary wallet once, so the view can reuse it."""
+        name = self.cleaned_data["name"].strip()
+        beneficiary_first_name, beneficiary_last_name = name.split()
+        try:
+            self.beneficiary_wallet = find_beneficiary_by_name(
+                beneficiary_first_name, beneficiary_last_name
+            )
+        except BeneficiaryNotFound as error:
+            raise ValidationError(str(error), code="invalid")
+        return name
+
+
+class TransactionFilterForm(forms.Form):
+    """Form used to filter the transactions history"""
+
+    start_date = forms.DateField(
+        widget=forms.DateInput(attrs={"type": "date"}), label="From", required=False
+    )
+    end_date = forms.DateField(
+        widget=forms.DateInput(attrs={"type": "date"}), label="To", required=False
+    )
+    entry_type = forms.ChoiceField(
+        choices=[("", "All transactions"), *EntryType.choices], label="Type", required=False
+    )
+    min_amount = forms.DecimalField(
+        max_digits=12, decimal_places=2, min_value=0, label="Minimum amount", required=False
+    )
+    max_amount = forms.DecimalField(
+        max_digits=12, decimal_places=2, min_value=0, label="Maximum amount", required=False
+    )
+    counterparty = forms.IntegerField(min_value=1, label="Other wallet ID", required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # the empty choice selects every type.
+        cleaned_data["entry_type"] = cleaned_data.get("entry_type") or None
+        start_date, end_date = cleaned_data.get("start_date"), cleaned_data.get("end_date")
+        if start_date and end_date and start_date > end_date:
+            raise ValidationError(_("The start date must not be after the end date."))
+        min_amount, max_amount = cleaned_data.get("min_amount"), cleaned_data.get("max_amount")
+        if min_amount is not None and max_amount is not None and min_amount > max_amount:
+            raise ValidationError(_("The minimum amount must not exceed the maximum amount."))
+        return cleaned_data
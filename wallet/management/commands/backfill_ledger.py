@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from wallet import backfill
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the ledger columns of transactions recorded before they existed from their "
+        "details, in resumable primary key chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--name",
+            default="backfill-ledger",
+            help="Name of the job to resume.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=backfill.BACKFILL_CHUNK_SIZE,
+            help="Number of transactions updated in each transaction.",
+        )
+        parser.add_argument(
+            "--rows-per-second",
+            type=int,
+            default=0,
+            help="Maximum number of transactions read per second by all workers (0 for no limit).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes sharing the table by primary key range.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("The chunk size must be greater than zero.")
+        if options["workers"] < 1:
+            raise CommandError("The number of workers must be greater than zero.")
+        if options["rows_per_second"] < 0:
+            raise CommandError("The rows per second cannot be negative.")
+        reports = backfill.backfill_ledger(
+            options["name"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            rows_per_second=options["rows_per_second"] or None,
+            progress=self.progress,
+        )
+        updated = sum(report.updated for report in reports)
+        failed = sum(report.failed for report in reports)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Job {options['name']} finished: {updated} transactions backfilled, "
+                f"{failed} transactions left with unrecognised details."
+            )
+        )
+
+    def progress(self, report):
+        self.stdout.write(
+            f"{report.name}: up to #{report.position} of #{report.until} committed, "
+            f"{report.updated} backfilled, {report.failed} unrecognised."
+        )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Max, Q
+from wallet.models import BalanceCheckpoint, Savings
+
+CHECKPOINT_CHUNK_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Records a balance checkpoint of every wallet written to since its last checkpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHECKPOINT_CHUNK_SIZE,
+            help="Number of wallets checkpointed with each statement.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("The chunk size must be greater than zero.")
+        last_pk, written = 0, 0
+        while True:
+            # wallets are walked in primary key ranges, so no statement reads them all.
+            ids = list(
+                Savings.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["chunk_size"]]
+            )
+            if not ids:
+                break
+            last_pk = ids[-1]
+            stale = (
+                Savings.objects.filter(pk__in=ids)
+                .annotate(checkpointed=Max("checkpoints__version"))
+                .filter(Q(checkpointed__isnull=True) | Q(checkpointed__lt=F("version")))
+            )
+            written += BalanceCheckpoint.objects.record(stale.values_list("pk", flat=True))
+        self.stdout.write(self.style.SUCCESS(f"{written} balance checkpoints recorded."))
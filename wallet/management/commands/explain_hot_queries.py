@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import connection
+from wallet.models import EntryType, Savings, Transactions
+from wallet.pagination import DEFAULT_PAGE_SIZE
+
+
+class Command(BaseCommand):
+    help = "Prints the EXPLAIN plan of every hot query on the wallet request paths."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run EXPLAIN ANALYZE (PostgreSQL only) to report actual timings.",
+        )
+
+    def handle(self, *args, **options):
+        # use a real wallet where available so the planner sees realistic values.
+        wallet = Savings.objects.select_related("user_id").first()
+        user = wallet.user_id if wallet else User.objects.first()
+        user_pk = user.pk if user else 0
+        wallet_pk = wallet.pk if wallet else 0
+        first_name = wallet.first_name if wallet else "John"
+        last_name = wallet.last_name if wallet else "Doe"
+        email = user.email if user else "johndoe@gmail.com"
+
+        history = Transactions.objects.filter(savings_id=wallet_pk).order_by(
+            "-date", "-id"
+        )
+        hot_queries = [
+            ("Savings wallet by owner", Savings.objects.filter(user_id=user_pk)),
+            ("Transaction history page", history[: DEFAULT_PAGE_SIZE + 1]),
+            (
+                "Transaction history page by type",
+                history.matching(entry_type=EntryType.TRANSFER_OUT)[: DEFAULT_PAGE_SIZE + 1],
+            ),
+            (
+                "Transaction history page by counterparty",
+                history.matching(counterparty=wallet_pk)[: DEFAULT_PAGE_SIZE + 1],
+            ),
+            (
+                "Transaction history page by amount",
+                history.matching(min_amount=100, max_amount=500)[: DEFAULT_PAGE_SIZE + 1],
+            ),
+            (
+                "Beneficiary wallet by name",
+                Savings.objects.filter(
+                    first_name__iexact=first_name, last_name__iexact=last_name
+                ),
+            ),
+            ("Beneficiary user by email", User.objects.filter(email=email)),
+        ]
+
+        explain_options = {}
+        if options["analyze"] and connection.vendor == "postgresql":
+            explain_options = {"analyze": True, "buffers": True}
+        for title, queryset in hot_queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write("")
@@ -0,0 +1,60 @@
+import hashlib
+from django.core.management.base import BaseCommand, CommandError
+from wallet import services
+from wallet.exceptions import WalletError
+from wallet.bulk import FUNDING_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Funds many savings wallets from a CSV file of (email or user id, amount) rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path of the CSV file to apply.")
+        parser.add_argument(
+            "--name",
+            help="Name of the job to resume (defaults to one derived from the file content).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=FUNDING_CHUNK_SIZE,
+            help="Number of rows applied in each transaction.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("The chunk size must be greater than zero.")
+        try:
+            name = options["name"] or self.job_name(options["path"])
+            with open(options["path"], encoding="utf-8-sig", newline="") as lines:
+                report = services.fund_wallets_from_csv(
+                    lines, name, chunk_size=options["chunk_size"], progress=self.progress
+                )
+        except OSError as error:
+            raise CommandError(str(error))
+        except UnicodeDecodeError:
+            raise CommandError("The file must be a UTF-8 encoded CSV file.")
+        except WalletError as error:
+            raise CommandError(str(error))
+
+        for error in report.errors:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Job {report.name} finished: {report.funded} rows funded "
+                f"({report.total} naira), {report.failed} rows failed."
+            )
+        )
+
+    def job_name(self, path):
+        # the job of a file is named after its content, so that a rerun resumes it.
+        digest = hashlib.sha256()
+        with open(path, "rb") as csv_file:
+            for chunk in iter(lambda: csv_file.read(64 * 1024), b""):
+                digest.update(chunk)
+        return f"fund-wallets-csv:{digest.hexdigest()}"
+
+    def progress(self, report):
+        self.stdout.write(
+            f"{report.rows} rows committed: {report.funded} funded, {report.failed} failed."
+        )
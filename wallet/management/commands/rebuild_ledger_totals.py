@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from wallet.models import Savings
+from wallet.rollups import REBUILD_CHUNK_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily and monthly ledger totals of every wallet from its transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=REBUILD_CHUNK_SIZE,
+            help="Number of wallets rebuilt in each transaction.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("The chunk size must be greater than zero.")
+        last_pk, rebuilt = 0, 0
+        while True:
+            # wallets are walked in primary key ranges, so each transaction locks only a few.
+            ids = list(
+                Savings.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["chunk_size"]]
+            )
+            if not ids:
+                break
+            last_pk = ids[-1]
+            rebuilt += rebuild(ids)
+            self.stdout.write(f"{rebuilt} wallets rebuilt.")
+        self.stdout.write(self.style.SUCCESS(f"Ledger totals of {rebuilt} wallets rebuilt."))
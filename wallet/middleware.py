@@ -0,0 +1,49 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.functional import SimpleLazyObject
+from .models import Savings
+
+# The following middleware resolves the savings wallet of the current user once per request.
+
+
+def get_wallet(request):
+    """
+    Returns the savings wallet of the request's user, or None.
+
+    The wallet is looked up at most once per request. Authentication classes that load it
+    together with the user store it on the request beforehand (see api.authentication).
+    """
+    if not hasattr(request, "_cached_wallet"):
+        user = request.user
+        wallet = None
+        if user.is_authenticated:
+            # served from the balance cache when it is enabled (see wallet.balance_cache).
+            wallet = Savings.objects.for_owner(user)
+        request._cached_wallet = wallet
+    return request._cached_wallet
+
+
+@sync_and_async_middleware
+class WalletMiddleware:
+    """
+    Sets request.wallet to the lazily resolved savings wallet of the current user.
+
+    request.wallet is a lazy object, so it is never None: test it for truth instead, as it
+    is falsy when the user has no wallet. Under ASGI the middleware runs in the event loop,
+    and async views load the wallet themselves rather than touch request.wallet.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.wallet = SimpleLazyObject(lambda: get_wallet(request))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.wallet = SimpleLazyObject(lambda: get_wallet(request))
+        return await self.get_response(request)
@@ -0,0 +1,37 @@
+# Generated by Django 5.1 on 2026-10-18 10:34
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+USER_EMAIL_INDEX = models.Index(fields=["email"], name="auth_user_email_idx")
+
+
+def add_user_email_index(apps, schema_editor):
+    # the user model belongs to django.contrib.auth, so its index is added from here.
+    schema_editor.add_index(apps.get_model(settings.AUTH_USER_MODEL), USER_EMAIL_INDEX)
+
+
+def remove_user_email_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model(settings.AUTH_USER_MODEL), USER_EMAIL_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='savings',
+            index=models.Index(django.db.models.functions.text.Upper('first_name'), django.db.models.functions.text.Upper('last_name'), name='savings_upper_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactions',
+            index=models.Index(fields=['savings_id', '-date', '-id'], name='transactions_history_idx'),
+        ),
+        migrations.RunPython(add_user_email_index, remove_user_email_index),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-18 10:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def check_no_negative_balances(apps, schema_editor):
+    # withdrawals and transfers did not always check balances, so some may have gone below
+    # zero; those need a correcting entry from support rather than an automatic fix.
+    Savings = apps.get_model("wallet", "Savings")
+    wallets = list(
+        Savings.objects.filter(balance__lt=0).order_by("id").values_list("id", flat=True)
+    )
+    if wallets:
+        raise RuntimeError(
+            f"Savings wallets {wallets} have a negative balance. Correct their balances "
+            "before applying this migration."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0002_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_negative_balances, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='savings',
+            constraint=models.CheckConstraint(condition=models.Q(('balance__gte', 0)), name='savings_balance_non_negative'),
+        ),
+    ]
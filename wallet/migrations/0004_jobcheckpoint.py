@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-18 10:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0003_balance_non_negative'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Enter a unique name for this job', max_length=100, unique=True)),
+                ('position', models.BigIntegerField(default=0, help_text='Number of input rows committed so far')),
+                ('succeeded', models.BigIntegerField(default=0)),
+                ('failed', models.BigIntegerField(default=0)),
+                ('finished', models.BooleanField(default=False)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
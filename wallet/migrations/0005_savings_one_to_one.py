@@ -0,0 +1,39 @@
+# Generated by Django 5.1 on 2026-10-18 11:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_one_wallet_per_user(apps, schema_editor):
+    # balances cannot be merged automatically, so duplicate wallets are left to support.
+    Savings = apps.get_model("wallet", "Savings")
+    owners = list(
+        Savings.objects.values_list("user_id", flat=True)
+        .annotate(wallets=Count("id"))
+        .filter(wallets__gt=1)
+        .order_by("user_id")
+    )
+    if owners:
+        raise RuntimeError(
+            f"Users {owners} own more than one savings wallet. Merge their wallets before "
+            "applying this migration."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0004_jobcheckpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_one_wallet_per_user, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='savings',
+            name='user_id',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='savings', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0005_savings_one_to_one'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savings',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
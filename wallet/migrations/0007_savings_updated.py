@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-18 11:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0006_savings_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savings',
+            name='updated',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1 on 2026-10-18 11:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0007_savings_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactions',
+            name='amount',
+            field=models.BigIntegerField(blank=True, help_text='Signed amount in kobo: positive for credits, negative for debits', null=True),
+        ),
+        migrations.AddField(
+            model_name='transactions',
+            name='counterparty',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='wallet.savings'),
+        ),
+        migrations.AddField(
+            model_name='transactions',
+            name='entry_type',
+            field=models.CharField(blank=True, choices=[('fund', 'Fund'), ('withdraw', 'Withdrawal'), ('transfer_out', 'Transfer out'), ('transfer_in', 'Transfer in')], max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='transactions',
+            name='reference',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transactions',
+            name='details',
+            field=models.CharField(blank=True, default='', help_text='Enter the details of this transaction', max_length=50),
+        ),
+    ]
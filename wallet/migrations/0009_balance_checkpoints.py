@@ -0,0 +1,45 @@
+# Generated by Django 5.1 on 2026-10-18 11:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+import wallet.operations
+
+
+class Migration(migrations.Migration):
+
+    # the transactions index is built concurrently on PostgreSQL, which a transaction would
+    # prevent.
+    atomic = False
+
+    dependencies = [
+        ('wallet', '0008_transactions_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('version', models.PositiveBigIntegerField()),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('date', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        wallet.operations.AddIndexConcurrently(
+            model_name='transactions',
+            index=models.Index(fields=['savings_id', 'id'], name='transactions_position_idx'),
+        ),
+        migrations.AddField(
+            model_name='balancecheckpoint',
+            name='savings_id',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='wallet.savings'),
+        ),
+        migrations.AddIndex(
+            model_name='balancecheckpoint',
+            index=models.Index(fields=['savings_id', 'date'], name='checkpoint_wallet_date_idx'),
+        ),
+    ]
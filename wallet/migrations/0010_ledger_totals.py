@@ -0,0 +1,46 @@
+# Generated by Django 5.1 on 2026-10-18 12:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0009_balance_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('inflow', models.BigIntegerField(default=0)),
+                ('outflow', models.BigIntegerField(default=0)),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('savings_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wallet.savings')),
+            ],
+            options={
+                'ordering': ['savings_id', 'period'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('savings_id', 'period'), name='dailytotals_wallet_period_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('inflow', models.BigIntegerField(default=0)),
+                ('outflow', models.BigIntegerField(default=0)),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('savings_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wallet.savings')),
+            ],
+            options={
+                'ordering': ['savings_id', 'period'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('savings_id', 'period'), name='monthlytotals_wallet_period_uniq')],
+            },
+        ),
+    ]
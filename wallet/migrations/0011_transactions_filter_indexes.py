@@ -0,0 +1,29 @@
+# Generated by Django 5.1 on 2026-10-18 12:11
+
+from django.db import migrations, models
+import wallet.operations
+
+
+class Migration(migrations.Migration):
+
+    # the indexes are built concurrently on PostgreSQL, which a transaction would prevent.
+    atomic = False
+
+    dependencies = [
+        ('wallet', '0010_ledger_totals'),
+    ]
+
+    operations = [
+        wallet.operations.AddIndexConcurrently(
+            model_name='transactions',
+            index=models.Index(fields=['savings_id', 'entry_type', '-date', '-id'], name='transactions_type_idx'),
+        ),
+        wallet.operations.AddIndexConcurrently(
+            model_name='transactions',
+            index=models.Index(fields=['savings_id', 'counterparty', '-date', '-id'], name='transactions_counterparty_idx'),
+        ),
+        wallet.operations.AddIndexConcurrently(
+            model_name='transactions',
+            index=models.Index(fields=['savings_id', 'amount'], name='transactions_amount_idx'),
+        ),
+    ]
@@ -1,6 +1,127 @@
-from django.db import models
+import uuid
+from collections import defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import models, connection, transaction
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Upper
+from django.utils import timezone
+from . import balance_cache
+
+# The (id, balance, version) of a wallet after a balance update.
+BalanceUpdate = namedtuple("BalanceUpdate", ["id", "balance", "version"])
+
+DEFAULT_CHECKPOINT_INTERVAL = 500  # wallet versions between two balance checkpoints
+
+
+def next_version(entries=1):
+    """
+    Returns the UPDATE values moving wallets past a write recording `entries` ledger entries.
+
+    The version moves by one per entry, and by one for writes recording none.
+    """
+    return {"version": F("version") + max(entries, 1), "updated": timezone.now()}
+
+
+class SavingsManager(models.Manager):
+    """Manager providing single-statement balance updates for savings wallets."""
+
+    def credit(self, wallet_id, amount):
+        """Adds an amount to a wallet and returns its new balance (None if it does not exist)."""
+        return self._update_balance(wallet_id, amount, guarded=False)
+
+    def debit(self, wallet_id, amount):
+        """
+        Takes an amount from a wallet holding enough funds and returns its new balance.
+
+        The funds check is part of the UPDATE itself, so concurrent debits cannot both pass
+        it; None is returned when the wallet does not exist or has too little money.
+        """
+        return self._update_balance(wallet_id, -amount, guarded=True)
+
+    def _update_balance(self, wallet_id, delta, guarded):
+        # the row stays locked until the new version is published (see wallet.balance_cache).
+        with transaction.atomic(savepoint=False):
+            changes = next_version()
+            if self._can_return_from_update():
+                table = connection.ops.quote_name(self.model._meta.db_table)
+                pk = connection.ops.quote_name(self.model._meta.pk.column)
+                balance = connection.ops.quote_name("balance")
+                version = connection.ops.quote_name("version")
+                updated = connection.ops.quote_name("updated")
+                sql = (
+                    f"UPDATE {table} SET {balance} = {balance} + %s, "
+                    f"{version} = {version} + 1, {updated} = %s WHERE {pk} = %s"
+                )
+                params = [
+                    delta,
+                    connection.ops.adapt_datetimefield_value(changes["updated"]),
+                    wallet_id,
+                ]
+                if guarded:
+                    sql += f" AND {balance} >= %s"
+                    params.append(-delta)
+                with connection.cursor() as cursor:
+                    cursor.execute(sql + f" RETURNING {balance}, {version}", params)
+                    row = cursor.fetchone()
+                if row is None:
+                    return None
+                new_balance, new_version = self._to_decimal(row[0]), row[1]
+            else:
+                # backends without UPDATE ... RETURNING read the new balance back.
+                wallets = self.filter(pk=wallet_id)
+                if guarded:
+                    wallets = wallets.filter(balance__gte=-delta)
+                if not wallets.update(balance=F("balance") + delta, **changes):
+                    return None
+                new_balance, new_version = (
+                    self.filter(pk=wallet_id).values_list("balance", "version").get()
+                )
+            balance_cache.publish([(wallet_id, new_version, new_balance, changes["updated"])])
+        return BalanceUpdate(wallet_id, new_balance, new_version)
+
+    def _can_return_from_update(self):
+        if connection.vendor == "postgresql":
+            return True
+        # SQLite supports RETURNING from 3.35, the same release it gained INSERT ... RETURNING.
+        return (
+            connection.vendor == "sqlite"
+            and connection.features.can_return_columns_from_insert
+        )
+
+    def for_owner(self, owner):
+        """
+        Returns the savings wallet of a user, or None, reading it from the balance cache first.
+
+        Wallets read from the cache are never older than the last committed write to them.
+        """
+        cached = balance_cache.lookup(owner.pk)
+        if cached is None:
+            wallet = self.filter(user_id=owner).first()
+            if wallet is None:
+                return None
+            balance_cache.fill(wallet)
+        else:
+            values = cached._asdict()
+            field_names = [
+                field.attname
+                for field in self.model._meta.concrete_fields
+                if field.attname in values
+            ]
+            wallet = self.model.from_db(
+                self.db, field_names, [values[name] for name in field_names]
+            )
+        # the owner is already loaded, so reuse it rather than fetch it again.
+        wallet.user_id = owner
+        return wallet
+
+    def _to_decimal(self, value):
+        field = self.model._meta.get_field("balance")
+        return field.to_python(value).quantize(Decimal(10) ** -field.decimal_places)
+
 
 # Create your models here.
 class Savings(models.Model):
@@ -22,10 +143,48 @@ class Savings(models.Model):
         decimal_places=2,
         default=0.00,
     )
-    user_id = models.ForeignKey(User, on_delete=models.CASCADE)
+    # each user owns at most one wallet, reachable as user.savings.
+    user_id = models.OneToOneField(User, on_delete=models.CASCADE, related_name="savings")
+    # moved forward by every write to the wallet, by one per ledger entry it records (see
+    # next_version and wallet.balance_cache).
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    # the time of the last write to the wallet, set along with its version.
+    updated = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = SavingsManager()
 
     class Meta:
         ordering = ["id"]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(balance__gte=0), name="savings_balance_non_negative"
+            ),
+        ]
+        indexes = [
+            # serves the case-insensitive beneficiary lookups ('iexact' compiles to UPPER()).
+            models.Index(
+                Upper("first_name"), Upper("last_name"), name="savings_upper_name_idx"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        # changes made outside the manager, e.g. from the admin, also move the wallet to a
+        # new version.
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "version", "updated"}
+        with transaction.atomic():
+            changes = next_version()
+            self.version, self.updated = changes["version"], changes["updated"]
+            super().save(*args, **kwargs)
+            self.refresh_from_db(fields=["balance", "version"])
+            balance_cache.publish([(self.pk, self.version, self.balance, self.updated)])
+            balance_cache.publish_profile(self)
+
+    def balance_at(self, moment):
+        """Returns the balance of this wallet at a moment (see BalanceCheckpointManager)."""
+        return BalanceCheckpoint.objects.balance_at(self, moment)
 
     def get_absolute_url(self):
         """Returns the URL to access the details for this savings record."""
@@ -36,21 +195,384 @@ class Savings(models.Model):
         return f"{self.first_name} {self.last_name} - {self.balance}"
 
 
+def to_kobo(amount):
+    """Returns a naira amount as a whole number of kobo."""
+    return int(Decimal(amount).scaleb(2).to_integral_value())
+
+
+def from_kobo(kobo):
+    """Returns a whole number of kobo as a naira amount."""
+    return Decimal(kobo).scaleb(-2)
+
+
+class EntryType(models.TextChoices):
+    """The kinds of ledger entries recorded as transactions."""
+
+    FUND = "fund", "Fund"
+    WITHDRAW = "withdraw", "Withdrawal"
+    TRANSFER_OUT = "transfer_out", "Transfer out"
+    TRANSFER_IN = "transfer_in", "Transfer in"
+
+
+def describe_entry(entry_type, amount, counterparty_first_name, counterparty_last_name):
+    """Returns the human-readable details of a ledger entry."""
+    naira = from_kobo(abs(amount))
+    if counterparty_first_name is None:
+        counterparty = "a closed wallet"
+    else:
+        counterparty = f"{counterparty_first_name} {counterparty_last_name}"
+    if entry_type == EntryType.FUND:
+        return f"You funded your account with {naira} naira."
+    if entry_type == EntryType.WITHDRAW:
+        return f"You withdrew {naira} naira from your account."
+    if entry_type == EntryType.TRANSFER_OUT:
+        return f"You transferred {naira} naira to {counterparty}."
+    return f"You were credited with {naira} naira from {counterparty}."
+
+
+class TransactionsQuerySet(models.QuerySet):
+    def totals(self):
+        """Returns the inflow and outflow of the ledger entries, in kobo, with one query."""
+        totals = self.aggregate(
+            inflow=Sum("amount", filter=Q(amount__gt=0), default=0),
+            outflow=Sum("amount", filter=Q(amount__lt=0), default=0),
+        )
+        return {"inflow": totals["inflow"], "outflow": -totals["outflow"]}
+
+    def matching(
+        self,
+        start_date=None,
+        end_date=None,
+        entry_type=None,
+        min_amount=None,
+        max_amount=None,
+        counterparty=None,
+    ):
+        """
+        Returns the ledger entries matching the given filters; None leaves a filter out.
+
+        Dates are inclusive local dates. Amounts are naira amounts compared to the size of
+        the entries, whether they are credits or debits. Entries recorded before the ledger
+        columns existed only match date filters.
+        """
+        queryset = self
+        if start_date is not None:
+            queryset = queryset.filter(date__gte=start_of_day(start_date))
+        if end_date is not None:
+            queryset = queryset.filter(date__lt=start_of_day(end_date + timedelta(days=1)))
+        if entry_type is not None:
+            queryset = queryset.filter(entry_type=entry_type)
+        if min_amount is not None or max_amount is not None:
+            # two ranges of the signed column, rather than abs(amount), keep it indexable.
+            credits, debits = Q(amount__gt=0), Q(amount__lt=0)
+            if min_amount is not None:
+                credits &= Q(amount__gte=to_kobo(min_amount))
+                debits &= Q(amount__lte=-to_kobo(min_amount))
+            if max_amount is not None:
+                credits &= Q(amount__lte=to_kobo(max_amount))
+                debits &= Q(amount__gte=-to_kobo(max_amount))
+            queryset = queryset.filter(credits | debits)
+        if counterparty is not None:
+            queryset = queryset.filter(counterparty=counterparty)
+        return queryset
+
+
+def start_of_day(day):
+    """Returns the aware datetime at which a local date starts."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
 class Transactions(models.Model):
-    """Model representing a transaction record."""
+    """
+    Model representing a transaction record, i.e. a ledger entry of a wallet.
+
+    Entries carry their type, a signed amount in kobo (credits are positive, debits
+    negative) and, for transfers, the other wallet and a reference shared by the debit and
+    credit of the transfer. Their details are rendered from these columns when displayed;
+    only entries recorded before the columns existed store their details as text, which
+    is still displayed once their columns are backfilled (see wallet.backfill).
+    """
 
     details = models.CharField(
-        help_text="Enter the details of this transaction", max_length=50, blank=False
+        help_text="Enter the details of this transaction",
+        max_length=50,
+        blank=True,
+        default="",
     )
     date = models.DateTimeField(auto_now_add=True)
     savings_id = models.ForeignKey(Savings, on_delete=models.CASCADE)
+    # the ledger columns; null on entries recorded before they existed.
+    entry_type = models.CharField(
+        max_length=12, choices=EntryType.choices, null=True, blank=True
+    )
+    amount = models.BigIntegerField(
+        help_text="Signed amount in kobo: positive for credits, negative for debits",
+        null=True,
+        blank=True,
+    )
+    counterparty = models.ForeignKey(
+        Savings,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    reference = models.UUIDField(null=True, blank=True, db_index=True)
+
+    objects = TransactionsQuerySet.as_manager()
 
     class Meta:
         ordering = ["id"]
+        indexes = [
+            # serves the newest-first transaction history of a wallet.
+            models.Index(
+                fields=["savings_id", "-date", "-id"], name="transactions_history_idx"
+            ),
+            # serves the entries of a wallet between two balance checkpoints.
+            models.Index(fields=["savings_id", "id"], name="transactions_position_idx"),
+            # serve the filtered histories of a wallet (see TransactionsQuerySet.matching).
+            models.Index(
+                fields=["savings_id", "entry_type", "-date", "-id"],
+                name="transactions_type_idx",
+            ),
+            models.Index(
+                fields=["savings_id", "counterparty", "-date", "-id"],
+                name="transactions_counterparty_idx",
+            ),
+            models.Index(fields=["savings_id", "amount"], name="transactions_amount_idx"),
+        ]
+
+    @classmethod
+    def funding(cls, wallet, amount):
+        """Returns an unsaved entry crediting a wallet with a naira amount."""
+        return cls(savings_id_id=wallet.pk, entry_type=EntryType.FUND, amount=to_kobo(amount))
+
+    @classmethod
+    def withdrawal(cls, wallet, amount):
+        """Returns an unsaved entry debiting a wallet with a naira amount."""
+        return cls(
+            savings_id_id=wallet.pk, entry_type=EntryType.WITHDRAW, amount=-to_kobo(amount)
+        )
+
+    @classmethod
+    def transfer_pair(cls, remitter_wallet, beneficiary_wallet, amount):
+        """Returns the unsaved debit and credit entries of a transfer between two wallets."""
+        reference = uuid.uuid4()
+        kobo = to_kobo(amount)
+        return [
+            cls(
+                savings_id_id=remitter_wallet.pk,
+                entry_type=EntryType.TRANSFER_OUT,
+                amount=-kobo,
+                counterparty_id=beneficiary_wallet.pk,
+                reference=reference,
+            ),
+            cls(
+                savings_id_id=beneficiary_wallet.pk,
+                entry_type=EntryType.TRANSFER_IN,
+                amount=kobo,
+                counterparty_id=remitter_wallet.pk,
+                reference=reference,
+            ),
+        ]
+
+    def describe(self):
+        """Returns the human-readable details of this transaction."""
+        if self.details or self.entry_type is None:
+            return self.details
+        counterparty = self.counterparty
+        return describe_entry(
+            self.entry_type,
+            self.amount,
+            counterparty.first_name if counterparty else None,
+            counterparty.last_name if counterparty else None,
+        )
 
     def get_absolute_url(self):
         """Returns the URL to access the details for this transaction record."""
         return reverse("transaction-detail", args=[str(self.id)])
 
     def __str__(self):
-        return f"{self.details}"
\ No newline at end of file
+        return self.describe()
+
+
+def get_checkpoint_interval():
+    return getattr(settings, "BALANCE_CHECKPOINT_INTERVAL", DEFAULT_CHECKPOINT_INTERVAL)
+
+
+class BalanceCheckpointManager(models.Manager):
+    """
+    Manager recording balance checkpoints and computing past balances from them.
+
+    A checkpoint holds the balance of a wallet after its transactions up to `last_entry_id`.
+    Checkpoints are written for every wallet by the checkpoint_balances command and, for
+    a single wallet, whenever its version crosses a multiple of BALANCE_CHECKPOINT_INTERVAL.
+    The version moves by one per ledger entry, including the many entries of a bulk write,
+    so at most one interval of transactions, plus those of the write that crossed it, lie
+    between two checkpoints of a wallet.
+    """
+
+    def snapshot(self, wallets):
+        """
+        Returns unsaved checkpoints of the current balances of a Savings queryset.
+
+        The balances and the last transaction of every wallet are read by one statement,
+        which sees them as committed together.
+        """
+        last_entry = Transactions.objects.filter(savings_id=OuterRef("pk")).order_by("-id")
+        rows = wallets.annotate(
+            last_entry_id=Subquery(last_entry.values("id")[:1])
+        ).values_list("pk", "balance", "version", "last_entry_id")
+        rows = list(rows)
+        # later transactions are dated after this time, which follows the read.
+        now = timezone.now()
+        return [
+            self.model(
+                savings_id_id=pk,
+                balance=balance,
+                version=version,
+                last_entry_id=last_entry_id or 0,
+                date=now,
+            )
+            for pk, balance, version, last_entry_id in rows
+        ]
+
+    def record(self, wallet_ids, written=None):
+        """
+        Writes checkpoints of the current balances of wallets and returns how many.
+
+        With `written`, the {wallet id: ledger entries} of a write, only the wallets whose
+        version crossed a multiple of the checkpoint interval during that write are
+        checkpointed; call it in the transaction of the write.
+        """
+        wallets = Savings.objects.filter(pk__in=list(wallet_ids))
+        if written is not None:
+            # a version moved forward by n crossed a multiple when its remainder is below n.
+            by_entries = defaultdict(list)
+            for pk, entries in written.items():
+                by_entries[max(entries, 1)].append(pk)
+            crossed = Q(pk__in=[])
+            for entries, pks in by_entries.items():
+                crossed |= Q(pk__in=pks, step__lt=entries)
+            wallets = wallets.alias(step=F("version") % get_checkpoint_interval()).filter(
+                crossed
+            )
+        return len(self.bulk_create(self.snapshot(wallets)))
+
+    def record_crossed(self, versions, written=None):
+        """
+        Checkpoints the wallets of {wallet id: new version} that crossed the interval.
+
+        `written` holds the {wallet id: ledger entries} of the write, one each by default.
+        """
+        interval = get_checkpoint_interval()
+        written = written or {}
+        crossed = [
+            pk
+            for pk, version in versions.items()
+            if version % interval < max(written.get(pk, 1), 1)
+        ]
+        if crossed:
+            self.record(crossed)
+
+    def balance_at(self, wallet, moment):
+        """
+        Returns the balance of a wallet at a moment, as a Decimal.
+
+        The balance is that of the last checkpoint up to the moment plus the transactions
+        recorded after it, up to the next checkpoint at most; moments before the first
+        checkpoint start from the next one, or from the current balance, and subtract the
+        later transactions instead.
+        """
+        checkpoints = self.filter(savings_id=wallet.pk)
+        before = checkpoints.filter(date__lte=moment).order_by("-date", "-id").first()
+        after = checkpoints.filter(date__gt=moment).order_by("date", "id").first()
+        if after is None:
+            after = self.snapshot(Savings.objects.filter(pk=wallet.pk))[0]
+        entries = Transactions.objects.filter(
+            savings_id=wallet.pk, id__lte=after.last_entry_id
+        )
+        if before is not None:
+            totals = entries.filter(id__gt=before.last_entry_id, date__lte=moment).totals()
+            return before.balance + from_kobo(totals["inflow"] - totals["outflow"])
+        totals = entries.filter(date__gt=moment).totals()
+        return after.balance - from_kobo(totals["inflow"] - totals["outflow"])
+
+
+class BalanceCheckpoint(models.Model):
+    """Model representing the balance of a wallet after one of its transactions."""
+
+    savings_id = models.ForeignKey(
+        Savings, on_delete=models.CASCADE, related_name="checkpoints"
+    )
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    # the version of the wallet at this balance (see Savings.version).
+    version = models.PositiveBigIntegerField()
+    # the id of the last transaction included in the balance, or 0 if there was none.
+    last_entry_id = models.BigIntegerField(default=0)
+    date = models.DateTimeField()
+
+    objects = BalanceCheckpointManager()
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["savings_id", "date"], name="checkpoint_wallet_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.savings_id_id} - {self.balance} on {self.date}"
+
+
+class LedgerTotals(models.Model):
+    """Abstract model representing the ledger totals of a wallet over a period."""
+
+    savings_id = models.ForeignKey(Savings, on_delete=models.CASCADE, related_name="+")
+    # the first day of the period.
+    period = models.DateField()
+    # the credits and debits of the period, in kobo (see Transactions.amount).
+    inflow = models.BigIntegerField(default=0)
+    outflow = models.BigIntegerField(default=0)
+    entries = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ["savings_id", "period"]
+        constraints = [
+            # also serves the recent totals of a wallet.
+            models.UniqueConstraint(
+                fields=["savings_id", "period"], name="%(class)s_wallet_period_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.savings_id_id} - {self.period}: +{self.inflow} -{self.outflow}"
+
+
+class DailyTotals(LedgerTotals):
+    """Model representing the ledger totals of a wallet over a day (see wallet.rollups)."""
+
+
+class MonthlyTotals(LedgerTotals):
+    """Model representing the ledger totals of a wallet over a month (see wallet.rollups)."""
+
+
+class JobCheckpoint(models.Model):
+    """Model representing the progress of a resumable batch job."""
+
+    name = models.CharField(
+        help_text="Enter a unique name for this job", max_length=100, unique=True
+    )
+    position = models.BigIntegerField(
+        help_text="Number of input rows committed so far", default=0
+    )
+    succeeded = models.BigIntegerField(default=0)
+    failed = models.BigIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.name} - {self.position}"
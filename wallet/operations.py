@@ -0,0 +1,32 @@
+from django.db import migrations
+
+# The following migration operations change large tables without blocking writes to them.
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    Adds an index with PostgreSQL's CREATE INDEX CONCURRENTLY, and like AddIndex elsewhere.
+
+    PostgreSQL then builds the index without blocking writes to the table. Migrations
+    using this operation must set `atomic = False`.
+    """
+
+    def postgres_operation(self):
+        # imported here, as django.contrib.postgres needs the PostgreSQL driver.
+        from django.contrib.postgres.operations import AddIndexConcurrently
+
+        return AddIndexConcurrently(self.model_name, self.index)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            return self.postgres_operation().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        return super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            return self.postgres_operation().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        return super().database_backwards(app_label, schema_editor, from_state, to_state)
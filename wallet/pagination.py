@@ -0,0 +1,105 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from django.db.models import Q
+
+# The following helpers implement keyset (cursor) pagination of transaction histories.
+
+DEFAULT_PAGE_SIZE = 20
+
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(Exception):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+class TransactionsPage:
+    """A single page of transactions along with the cursors of its neighbouring pages."""
+
+    def __init__(self, rows, next_cursor=None, previous_cursor=None):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+
+def encode_cursor(transaction, reverse=False):
+    """Returns an opaque cursor pointing at the (date, id) position of a transaction."""
+    payload = json.dumps([transaction.date.isoformat(), transaction.id, int(reverse)])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns the (date, id, reverse) position encoded in a cursor."""
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        date, pk, reverse = payload
+        return datetime.fromisoformat(date), int(pk), bool(reverse)
+    except (TypeError, ValueError, binascii.Error):
+        raise InvalidCursor("The pagination cursor is invalid.")
+
+
+def get_page_size(value):
+    """Returns a page size clamped to the allowed range, falling back to the default."""
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def paginate_transactions(queryset, cursor=None, page_size=None):
+    """
+    Returns a page of the queryset ordered from the newest to the oldest transaction.
+
+    Pages are located by seeking past the (date, id) position stored in the cursor rather
+    than by counting rows, so the cost of a page does not grow with its depth.
+    """
+    page_queryset, page_size, reverse = _seek(queryset, cursor, page_size)
+    return _build_page(list(page_queryset), page_size, reverse, cursor)
+
+
+async def apaginate_transactions(queryset, cursor=None, page_size=None):
+    """Async version of paginate_transactions."""
+    page_queryset, page_size, reverse = _seek(queryset, cursor, page_size)
+    rows = [row async for row in page_queryset]
+    return _build_page(rows, page_size, reverse, cursor)
+
+
+def _seek(queryset, cursor, page_size):
+    page_size = get_page_size(page_size)
+    reverse = False
+    if cursor:
+        date, pk, reverse = decode_cursor(cursor)
+        if reverse:
+            # walk back towards newer transactions.
+            queryset = queryset.filter(
+                Q(date__gt=date) | Q(date=date, id__gt=pk)
+            ).order_by("date", "id")
+        else:
+            queryset = queryset.filter(
+                Q(date__lt=date) | Q(date=date, id__lt=pk)
+            ).order_by("-date", "-id")
+    else:
+        queryset = queryset.order_by("-date", "-id")
+    return queryset[: page_size + 1], page_size, reverse
+
+
+def _build_page(rows, page_size, reverse, cursor):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+    if not rows:
+        return TransactionsPage(rows)
+
+    # a page reached from a cursor always has a neighbour on the side it came from.
+    has_next = has_more if not reverse else True
+    has_previous = has_more if reverse else bool(cursor)
+    return TransactionsPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1]) if has_next else None,
+        previous_cursor=encode_cursor(rows[0], reverse=True) if has_previous else None,
+    )
@@ -0,0 +1,257 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from django.db import connection
+from django.db.models import Case, Count, DateField, F, Q, Sum, When
+from django.db.models.functions import TruncDate, TruncMonth
+from django.db.models.sql import InsertQuery
+from django.utils import timezone
+from .models import DailyTotals, MonthlyTotals, Savings, Transactions, from_kobo
+from . import transfers
+
+# The following functions keep the daily and monthly ledger totals of wallets up to date.
+
+# totals rows written by a single UPDATE or INSERT.
+TOTALS_BATCH_SIZE = 500
+
+# wallets rebuilt in one transaction.
+REBUILD_CHUNK_SIZE = 100
+
+
+def day_of(moment):
+    return timezone.localdate(moment)
+
+
+def month_of(moment):
+    return timezone.localdate(moment).replace(day=1)
+
+
+ROLLUPS = [(DailyTotals, day_of), (MonthlyTotals, month_of)]
+
+
+def record(entries):
+    """
+    Adds saved ledger entries to the daily and monthly totals of their wallets.
+
+    Call it in the transaction recording the entries. Each table takes one INSERT ... ON
+    CONFLICT DO UPDATE statement per batch on PostgreSQL and SQLite. Other backends take one
+    UPDATE per batch, plus one SELECT and INSERT when the batch opens a new period; there,
+    the locks on the wallet rows updated by the transaction keep other writers away.
+    """
+    for model, period_of in ROLLUPS:
+        increments = increments_of(entries, period_of)
+        keys = sorted(increments)
+        for start in range(0, len(keys), TOTALS_BATCH_SIZE):
+            _apply(model, keys[start : start + TOTALS_BATCH_SIZE], increments)
+
+
+def increments_of(entries, period_of):
+    """Returns the [inflow, outflow, entries] increments of entries by (wallet id, period)."""
+    increments = defaultdict(lambda: [0, 0, 0])
+    for entry in entries:
+        if entry.amount is None:
+            continue
+        increment = increments[(entry.savings_id_id, period_of(entry.date))]
+        if entry.amount > 0:
+            increment[0] += entry.amount
+        else:
+            increment[1] -= entry.amount
+        increment[2] += 1
+    return increments
+
+
+def save_and_record(entries):
+    """
+    Saves the ledger entries of one operation and adds them to the totals of their wallets.
+
+    On PostgreSQL the INSERT of the entries carries the upserts of both totals tables as
+    data-modifying WITH queries, so the whole write is one statement. Other backends bulk
+    insert the entries and then record() them.
+    """
+    if connection.vendor != "postgresql":
+        entries = Transactions.objects.bulk_create(entries)
+        record(entries)
+        return entries
+    query = InsertQuery(Transactions)
+    query.insert_values(
+        [field for field in Transactions._meta.concrete_fields if not field.primary_key], entries
+    )
+    # compiling the INSERT fills the dates of the entries, which decide their periods.
+    [(insert, params)] = query.get_compiler(connection=connection).as_sql()
+    upserts, upsert_params = [], []
+    for index, (model, period_of) in enumerate(ROLLUPS):
+        increments = increments_of(entries, period_of)
+        if not increments:
+            continue
+        sql, values = _upsert_sql(model, sorted(increments), increments)
+        upserts.append(f"totals_{index} AS ({sql})")
+        upsert_params.extend(values)
+    pk = connection.ops.quote_name(Transactions._meta.pk.column)
+    with_clause = f"WITH {', '.join(upserts)} " if upserts else ""
+    with connection.cursor() as cursor:
+        cursor.execute(f"{with_clause}{insert} RETURNING {pk}", [*upsert_params, *params])
+        for entry, (entry_id,) in zip(entries, cursor.fetchall()):
+            entry.pk = entry_id
+            entry._state.adding = False
+            entry._state.db = connection.alias
+    return entries
+
+
+def _apply(model, keys, increments):
+    if connection.vendor in ("postgresql", "sqlite"):
+        return _upsert(model, keys, increments)
+    lookup = Q()
+    for wallet_id, period in keys:
+        lookup |= Q(savings_id=wallet_id, period=period)
+
+    def column(name, index):
+        return Case(
+            *[
+                When(
+                    savings_id=wallet_id,
+                    period=period,
+                    then=F(name) + increments[(wallet_id, period)][index],
+                )
+                for wallet_id, period in keys
+            ],
+            default=F(name),
+            output_field=model._meta.get_field(name),
+        )
+
+    updated = model.objects.filter(lookup).update(
+        inflow=column("inflow", 0), outflow=column("outflow", 1), entries=column("entries", 2)
+    )
+    if updated == len(keys):
+        return
+    existing = set()
+    if updated:
+        existing = set(model.objects.filter(lookup).values_list("savings_id", "period"))
+    model.objects.bulk_create(
+        [
+            model(
+                savings_id_id=wallet_id,
+                period=period,
+                inflow=increments[(wallet_id, period)][0],
+                outflow=increments[(wallet_id, period)][1],
+                entries=increments[(wallet_id, period)][2],
+            )
+            for wallet_id, period in keys
+            if (wallet_id, period) not in existing
+        ]
+    )
+
+
+def _upsert(model, keys, increments):
+    sql, params = _upsert_sql(model, keys, increments)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _upsert_sql(model, keys, increments):
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    wallet, period, *totals = [
+        quote_name(model._meta.get_field(name).column)
+        for name in ["savings_id", "period", "inflow", "outflow", "entries"]
+    ]
+    params = []
+    for wallet_id, day in keys:
+        params.extend(
+            [wallet_id, connection.ops.adapt_datefield_value(day), *increments[(wallet_id, day)]]
+        )
+    values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(keys))
+    updates = ", ".join(f"{column} = {table}.{column} + EXCLUDED.{column}" for column in totals)
+    sql = (
+        f"INSERT INTO {table} ({wallet}, {period}, {', '.join(totals)}) VALUES {values} "
+        f"ON CONFLICT ({wallet}, {period}) DO UPDATE SET {updates}"
+    )
+    return sql, params
+
+
+def rebuild(wallet_ids):
+    """
+    Recomputes the daily and monthly totals of wallets from their ledger entries.
+
+    The wallets are locked while their totals are replaced, so writes to them wait for
+    the new totals rather than add to the old ones.
+    """
+
+    def run():
+        wallets = transfers.lock_for_update(Savings.objects.filter(pk__in=wallet_ids).order_by("pk"))
+        locked = [wallet.pk for wallet in wallets]
+        entries = Transactions.objects.filter(savings_id__in=locked, amount__isnull=False)
+        for model, truncate in [
+            (DailyTotals, TruncDate("date")),
+            (MonthlyTotals, TruncMonth("date", output_field=DateField())),
+        ]:
+            model.objects.filter(savings_id__in=locked).delete()
+            rows = (
+                entries.annotate(period=truncate)
+                .values("savings_id", "period")
+                .annotate(
+                    inflow=Sum("amount", filter=Q(amount__gt=0), default=0),
+                    outflow=Sum("amount", filter=Q(amount__lt=0), default=0),
+                    entries=Count("id"),
+                )
+                .order_by()
+            )
+            model.objects.bulk_create(
+                [
+                    model(
+                        savings_id_id=row["savings_id"],
+                        period=row["period"],
+                        inflow=row["inflow"],
+                        outflow=-row["outflow"],
+                        entries=row["entries"],
+                    )
+                    for row in rows
+                ],
+                batch_size=TOTALS_BATCH_SIZE,
+            )
+        return len(locked)
+
+    return transfers.run_in_transaction(run)
+
+
+def as_dict(totals):
+    return {
+        "period": totals.period,
+        "inflow": str(from_kobo(totals.inflow)),
+        "outflow": str(from_kobo(totals.outflow)),
+        "entries": totals.entries,
+    }
+
+
+def summary(wallet, days, months):
+    """
+    Returns the totals of a wallet over its last days and months, newest first.
+
+    Periods without transactions are left out. Only the totals rows of the requested
+    periods are read, whatever the length of the wallet's history.
+    """
+    today = timezone.localdate()
+    year, month = divmod(today.year * 12 + today.month - months, 12)
+    return {
+        "daily": [
+            as_dict(totals)
+            for totals in DailyTotals.objects.filter(
+                savings_id=wallet.pk, period__gt=today - timedelta(days=days)
+            ).order_by("-period")
+        ],
+        "monthly": [
+            as_dict(totals)
+            for totals in MonthlyTotals.objects.filter(
+                savings_id=wallet.pk, period__gte=date(year, month + 1, 1)
+            ).order_by("-period")
+        ],
+    }
+
+
+def month_totals(wallet):
+    """Returns the inflow and outflow of a wallet in the current month, in naira."""
+    totals = MonthlyTotals.objects.filter(
+        savings_id=wallet.pk, period=month_of(timezone.now())
+    ).first()
+    return {
+        "inflow": from_kobo(totals.inflow if totals else 0),
+        "outflow": from_kobo(totals.outflow if totals else 0),
+    }
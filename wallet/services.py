@@ -0,0 +1,130 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from .exceptions import (
+    InsufficientFunds,
+    InvalidAmount,
+    WalletNotFound,
+    BeneficiaryNotFound,
+)
+from .models import BalanceCheckpoint, Savings, Transactions
+from .transfers import transfer
+from . import bulk, rollups
+
+# The following functions implement the money-moving operations shared by the web views and the API.
+
+
+def check_amount(amount):
+    if amount is None or amount <= 0:
+        raise InvalidAmount("Please enter an amount greater than zero.")
+
+
+def fund_wallet(wallet, amount):
+    """Credits a wallet and records the transaction, its totals and any balance checkpoint."""
+    check_amount(amount)
+    with transaction.atomic():
+        update = Savings.objects.credit(wallet.id, amount)
+        if update is None:
+            raise WalletNotFound("You do not have a savings wallet.")
+        entry = Transactions.funding(wallet, amount)
+        entry.save()
+        rollups.record([entry])
+        BalanceCheckpoint.objects.record_crossed({update.id: update.version})
+    wallet.balance = update.balance
+    return update
+
+
+def withdraw_from_wallet(wallet, amount):
+    """
+    Debits a wallet holding enough funds and records the transaction, its totals and any
+    balance checkpoint.
+    """
+    check_amount(amount)
+    with transaction.atomic():
+        update = Savings.objects.debit(wallet.id, amount)
+        if update is None:
+            raise InsufficientFunds("You do not have enough funds in your savings wallet.")
+        entry = Transactions.withdrawal(wallet, amount)
+        entry.save()
+        rollups.record([entry])
+        BalanceCheckpoint.objects.record_crossed({update.id: update.version})
+    wallet.balance = update.balance
+    return update
+
+
+def missing_beneficiary_by_email(email):
+    """Returns the error explaining why no wallet belongs to an email address."""
+    # only failed lookups pay for telling a missing user from a missing wallet.
+    if User.objects.filter(email=email).exists():
+        return BeneficiaryNotFound("This beneficiary does not have a savings wallet.")
+    return BeneficiaryNotFound(f"The beneficiary with email '{email}' does not exist.")
+
+
+def find_beneficiary_by_name(first_name, last_name):
+    """Returns the wallet registered under a first and last name (one query)."""
+    beneficiary_wallets = list(
+        Savings.objects.filter(
+            first_name__iexact=first_name, last_name__iexact=last_name
+        )[:2]
+    )
+    if not beneficiary_wallets:
+        raise BeneficiaryNotFound(
+            f"{first_name} {last_name} does not exist. Please enter a real beneficiary."
+        )
+    if len(beneficiary_wallets) > 1:
+        raise BeneficiaryNotFound(
+            f"More than one wallet belongs to {first_name} {last_name}. Please contact support."
+        )
+    return beneficiary_wallets[0]
+
+
+def transfer_to_email(remitter_owner, email, amount):
+    """
+    Moves money from a user's wallet to the wallet of the user with an email address.
+
+    Both wallets are resolved, updated and recorded within TRANSFER_QUERY_BUDGET statements
+    (see wallet.transfers.transfer).
+    """
+    check_amount(amount)
+    try:
+        return transfer(remitter_owner, Q(user_id__email=email), amount)
+    except BeneficiaryNotFound:
+        raise missing_beneficiary_by_email(email)
+
+
+def transfer_to_wallet(remitter_owner, beneficiary_wallet, amount):
+    """Moves money from a user's wallet to an already resolved beneficiary wallet."""
+    check_amount(amount)
+    return transfer(remitter_owner, Q(pk=beneficiary_wallet.pk), amount)
+
+
+def transfer_to_emails(remitter_owner, payouts):
+    """
+    Moves money from a user's wallet to the wallets of many users in one transaction.
+
+    Items with an amount that is not positive fail on their own; the others are applied
+    with a constant number of statements per batch (see wallet.bulk.bulk_transfer).
+    """
+    for payout in payouts:
+        if payout.succeeded:
+            try:
+                check_amount(payout.amount)
+            except InvalidAmount as error:
+                payout.error = str(error)
+    return bulk.bulk_transfer(remitter_owner, payouts)
+
+
+def fund_wallets_from_csv(lines, name, chunk_size=bulk.FUNDING_CHUNK_SIZE, progress=None):
+    """
+    Funds many wallets from the lines of a CSV of (email or user id, amount) rows.
+
+    The lines are streamed and applied in chunks of `chunk_size` rows, each committed with
+    the progress of the job `name` (see wallet.bulk.fund_from_rows), so running a job again
+    resumes it from its last committed chunk.
+    """
+    return bulk.fund_from_rows(
+        bulk.read_funding_rows(lines),
+        name,
+        chunk_size=chunk_size,
+        progress=progress,
+    )
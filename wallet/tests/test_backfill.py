@@ -0,0 +1,128 @@
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from wallet.models import EntryType, JobCheckpoint, Savings, Transactions
+from wallet import backfill
+
+# The following classes handle tests for the ledger backfill.
+
+
+class ParseDetailsTest(TestCase):
+    """This subclass tests that the details of legacy transactions are parsed."""
+
+    def test_web_and_api_formats(self):
+        for details, expected in [
+            ("You funded your account with 1000 naira", (EntryType.FUND, 100000, None)),
+            ("You funded your account with 1000.50 naira.", (EntryType.FUND, 100050, None)),
+            (
+                "You withdrew 250 naira from your account",
+                (EntryType.WITHDRAW, -25000, None),
+            ),
+            (
+                "You transferred 300 naira to John Doe (Access Bank)",
+                (EntryType.TRANSFER_OUT, -30000, "John Doe"),
+            ),
+            (
+                "You transferred 300 naira to John Doe.",
+                (EntryType.TRANSFER_OUT, -30000, "John Doe"),
+            ),
+            (
+                "You were credited with 300 naira from Jane Doe.",
+                (EntryType.TRANSFER_IN, 30000, "Jane Doe"),
+            ),
+        ]:
+            with self.subTest(details=details):
+                self.assertEqual(backfill.parse_details(details), expected)
+
+    def test_unknown_details(self):
+        self.assertIsNone(backfill.parse_details("funded"))
+        self.assertIsNone(backfill.parse_details("You funded your account with lots of naira"))
+
+
+class BackfillLedgerTest(TestCase):
+    """This subclass tests that legacy transactions are backfilled in resumable chunks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # set up two users with a savings wallet each and legacy transactions for our tests.
+        cls.wallets = []
+        for username, first_name in [("jane", "Jane"), ("john", "John")]:
+            user = User.objects.create_user(username=username, password="2HJ1vRV0Z&3iD")
+            cls.wallets.append(
+                Savings.objects.create(first_name=first_name, last_name="Doe", user_id=user)
+            )
+        jane, john = cls.wallets
+        for details, wallet in [
+            ("You funded your account with 1000 naira", jane),
+            ("You transferred 300 naira to John Doe (Access Bank)", jane),
+            ("You were credited with 300 naira from Jane Doe", john),
+            ("You withdrew 50.50 naira from your account.", john),
+            ("You transferred 20 naira to John Doe.", jane),
+            ("funded", jane),
+        ]:
+            Transactions.objects.create(details=details, savings_id=wallet)
+
+    def entries(self):
+        return {entry.details: entry for entry in Transactions.objects.all()}
+
+    def test_ledger_columns_are_filled(self):
+        reports = backfill.backfill_ledger("job", chunk_size=4)
+        self.assertEqual(
+            [(report.updated, report.failed) for report in reports], [(5, 1)]
+        )
+        entries = self.entries()
+        funding = entries["You funded your account with 1000 naira"]
+        self.assertEqual((funding.entry_type, funding.amount), (EntryType.FUND, 100000))
+        debit = entries["You transferred 300 naira to John Doe (Access Bank)"]
+        credit = entries["You were credited with 300 naira from Jane Doe"]
+        # the halves of a transfer are paired and share a reference.
+        self.assertEqual(debit.counterparty_id, self.wallets[1].pk)
+        self.assertEqual(credit.counterparty_id, self.wallets[0].pk)
+        self.assertIsNotNone(debit.reference)
+        self.assertEqual(debit.reference, credit.reference)
+        # a lone transfer half is matched to its counterparty by name.
+        lone = entries["You transferred 20 naira to John Doe."]
+        self.assertEqual((lone.amount, lone.counterparty_id), (-2000, self.wallets[1].pk))
+        self.assertIsNone(lone.reference)
+        # the stored details are still displayed, and unknown ones are left alone.
+        self.assertEqual(str(debit), "You transferred 300 naira to John Doe (Access Bank)")
+        self.assertIsNone(entries["funded"].entry_type)
+
+    def test_interrupted_job_resumes_after_its_last_chunk(self):
+        progress = mock.Mock(side_effect=[None, KeyboardInterrupt])
+        with self.assertRaises(KeyboardInterrupt):
+            backfill.backfill_ledger("job", chunk_size=2, progress=progress)
+        self.assertEqual(JobCheckpoint.objects.get(name="job:1/1").succeeded, 4)
+        with mock.patch.object(
+            backfill, "_backfill_chunk", wraps=backfill._backfill_chunk
+        ) as chunk:
+            backfill.backfill_ledger("job", chunk_size=2)
+        self.assertEqual(chunk.call_count, 1)
+        self.assertEqual(
+            Transactions.objects.filter(entry_type__isnull=True).count(), 1
+        )
+
+    def test_workers_split_the_table_by_key_range(self):
+        first, last = Transactions.objects.first().pk, Transactions.objects.last().pk
+        ranges = backfill.plan_ranges("job", 2)
+        self.assertEqual([name for name, after, until in ranges], ["job:1/2", "job:2/2"])
+        self.assertEqual(ranges[0][2], ranges[1][1])
+        self.assertLess(ranges[0][1], first)
+        self.assertEqual(ranges[1][2], last)
+
+    def test_reads_are_throttled(self):
+        with mock.patch("wallet.backfill.time.sleep") as sleep:
+            backfill.backfill_ledger("job", chunk_size=2, rows_per_second=1)
+        # the three full chunks of two rows are each followed by a pause of about two seconds.
+        self.assertEqual(sleep.call_count, 3)
+        self.assertGreater(sleep.call_args[0][0], 1.5)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("backfill_ledger", chunk_size=10, stdout=out)
+        self.assertIn(
+            "5 transactions backfilled, 1 transactions left with unrecognised details",
+            out.getvalue(),
+        )
@@ -0,0 +1,106 @@
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+from wallet.models import Savings
+from wallet import balance_cache, services, transfers
+
+# The following classes handle tests for the balance cache.
+
+
+@override_settings(BALANCE_CACHE_ALIAS="default")
+class BalanceCacheTest(TestCase):
+    """This subclass tests that cached wallets are never older than the last committed write."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # set up two users with savings wallets for our tests.
+        cls.user_1 = User.objects.create_user(username="jane", password="2HJ1vRV0Z&3iD")
+        cls.user_2 = User.objects.create_user(username="john", password="LENDSQR001")
+        cls.wallet_1 = Savings.objects.create(
+            first_name="Jane", last_name="Doe", balance=500, user_id=cls.user_1
+        )
+        cls.wallet_2 = Savings.objects.create(
+            first_name="John", last_name="Doe", balance=0, user_id=cls.user_2
+        )
+
+    def setUp(self):
+        caches["default"].clear()
+        balance_cache.stats.reset()
+
+    def load(self, owner):
+        """Returns the wallet of a user and fills the cache as a committed read would."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return Savings.objects.for_owner(owner)
+
+    def test_wallet_is_read_from_cache_after_a_miss(self):
+        with self.assertNumQueries(1):
+            self.load(self.user_1)
+        with self.assertNumQueries(0):
+            wallet = Savings.objects.for_owner(self.user_1)
+        self.assertEqual(wallet.pk, self.wallet_1.pk)
+        self.assertEqual(wallet.first_name, "Jane")
+        self.assertEqual(wallet.balance, Decimal("500.00"))
+        self.assertEqual(balance_cache.stats.snapshot()["hits"], 1)
+        self.assertEqual(balance_cache.stats.snapshot()["misses"], 1)
+
+    def test_writes_go_through_cache(self):
+        self.load(self.user_1)
+        with self.captureOnCommitCallbacks(execute=True):
+            services.fund_wallet(self.wallet_1, Decimal("250.50"))
+        with self.assertNumQueries(0):
+            wallet = Savings.objects.for_owner(self.user_1)
+        self.assertEqual(wallet.balance, Decimal("750.50"))
+        self.assertEqual(wallet.version, 1)
+
+    def test_uncommitted_write_is_not_served(self):
+        self.load(self.user_1)
+        with self.captureOnCommitCallbacks(execute=False):
+            Savings.objects.debit(self.wallet_1.pk, Decimal("200"))
+            # the version has moved but its balance is not stored before the commit.
+            self.assertIsNone(balance_cache.lookup(self.user_1.pk))
+
+    def test_transfer_goes_through_cache(self):
+        self.load(self.user_1)
+        self.load(self.user_2)
+        with self.captureOnCommitCallbacks(execute=True):
+            transfers.transfer(
+                self.user_1,
+                Q(pk=self.wallet_2.pk),
+                Decimal("100"),
+            )
+        self.assertEqual(balance_cache.lookup(self.user_1.pk).balance, Decimal("400.00"))
+        self.assertEqual(balance_cache.lookup(self.user_2.pk).balance, Decimal("100.00"))
+
+    def test_saved_wallet_goes_through_cache(self):
+        self.load(self.user_1)
+        wallet = Savings.objects.get(pk=self.wallet_1.pk)
+        wallet.first_name = "Janet"
+        wallet.balance = Decimal("10")
+        with self.captureOnCommitCallbacks(execute=True):
+            wallet.save()
+        self.assertEqual(wallet.version, 1)
+        cached = balance_cache.lookup(self.user_1.pk)
+        self.assertEqual((cached.first_name, cached.balance), ("Janet", Decimal("10.00")))
+
+    def test_deleted_wallet_is_forgotten(self):
+        self.load(self.user_1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Savings.objects.filter(pk=self.wallet_1.pk).delete()
+        self.assertIsNone(Savings.objects.for_owner(self.user_1))
+
+    def test_cache_failure_falls_back_to_database(self):
+        self.load(self.user_1)
+        with mock.patch.object(caches["default"], "get", side_effect=ConnectionError):
+            with self.assertNumQueries(1), self.assertLogs("wallet.balance_cache", "WARNING"):
+                wallet = Savings.objects.for_owner(self.user_1)
+        self.assertEqual(wallet.balance, Decimal("500.00"))
+        self.assertEqual(balance_cache.stats.snapshot()["errors"], 1)
+
+    @override_settings(BALANCE_CACHE_ALIAS=None)
+    def test_disabled_cache_reads_database(self):
+        self.load(self.user_1)
+        with self.assertNumQueries(1):
+            Savings.objects.for_owner(self.user_1)
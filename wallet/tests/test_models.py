@@ -1,6 +1,20 @@
-from django.test import TestCase
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.contrib.auth.models import User
-from wallet.models import Savings, Transactions
+from django.db import IntegrityError
+from wallet.models import (
+    BalanceCheckpoint,
+    EntryType,
+    Savings,
+    Transactions,
+    from_kobo,
+    to_kobo,
+)
+from wallet import services
 
 # The following classes handle tests for the models.
 
@@ -85,6 +99,59 @@ class SavingsModelTest(TestCase):
         expected_string = f'{savings_wallet.first_name} {savings_wallet.last_name} - {savings_wallet.balance}'
         self.assertEqual(expected_string, str(savings_wallet))
 
+    def test_name_index(self):
+        index_names = [index.name for index in Savings._meta.indexes]
+        self.assertIn("savings_upper_name_idx", index_names)
+
+
+class SavingsManagerTest(TestCase):
+    """This subclass tests the single-statement balance updates of the savings manager."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # set up a user with a savings wallet holding 500 for our tests.
+        new_user = User.objects.create_user(username="jane", password="2HJ1vRV0Z&3iD")
+        cls.savings_wallet = Savings.objects.create(
+            first_name="Jane", last_name="Doe", balance=500.00, user_id=new_user
+        )
+
+    def test_credit_returns_new_balance(self):
+        update = Savings.objects.credit(self.savings_wallet.id, Decimal("250.50"))
+        self.assertEqual(update.balance, Decimal("750.50"))
+        self.savings_wallet.refresh_from_db()
+        self.assertEqual(self.savings_wallet.balance, Decimal("750.50"))
+
+    def test_debit_returns_new_balance(self):
+        with self.assertNumQueries(1):
+            update = Savings.objects.debit(self.savings_wallet.id, Decimal("200"))
+        self.assertEqual(update, (self.savings_wallet.id, Decimal("300.00"), 1))
+
+    def test_debit_of_entire_balance(self):
+        update = Savings.objects.debit(self.savings_wallet.id, Decimal("500"))
+        self.assertEqual(update.balance, Decimal("0.00"))
+
+    def test_debit_with_insufficient_funds(self):
+        self.assertIsNone(Savings.objects.debit(self.savings_wallet.id, Decimal("500.01")))
+        self.savings_wallet.refresh_from_db()
+        self.assertEqual(self.savings_wallet.balance, Decimal("500.00"))
+
+    def test_debit_of_missing_wallet(self):
+        self.assertIsNone(Savings.objects.debit(0, Decimal("1")))
+
+    def test_debit_without_update_returning(self):
+        # backends such as MySQL read the new balance back after the guarded update.
+        with mock.patch.object(
+            Savings.objects, "_can_return_from_update", return_value=False
+        ):
+            update = Savings.objects.debit(self.savings_wallet.id, Decimal("200"))
+            self.assertEqual(update.balance, Decimal("300.00"))
+            self.assertIsNone(Savings.objects.debit(self.savings_wallet.id, Decimal("400")))
+
+    def test_balance_cannot_be_negative(self):
+        self.savings_wallet.balance = Decimal("-1")
+        with self.assertRaises(IntegrityError):
+            self.savings_wallet.save()
+
 
 class TransactionsModelTest(TestCase):
     """This subclass tests the model used for creating instances of a transaction."""
@@ -132,3 +199,122 @@ class TransactionsModelTest(TestCase):
         transaction = Transactions.objects.get(id=1)
         expected_string = f"{transaction.details}"
         self.assertEqual(expected_string, str(transaction))
+
+    def test_history_index(self):
+        index = Transactions._meta.indexes[0]
+        self.assertEqual(index.name, "transactions_history_idx")
+        self.assertEqual(index.fields, ["savings_id", "-date", "-id"])
+
+
+class LedgerEntriesTest(TestCase):
+    """This subclass tests the structured ledger columns of transactions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # set up two users with a savings wallet each for our tests.
+        cls.wallets = []
+        for username, first_name in [("jane", "Jane"), ("john", "John")]:
+            user = User.objects.create_user(username=username, password="2HJ1vRV0Z&3iD")
+            cls.wallets.append(
+                Savings.objects.create(first_name=first_name, last_name="Doe", user_id=user)
+            )
+
+    def test_amounts_are_stored_in_kobo(self):
+        self.assertEqual(to_kobo(Decimal("250.50")), 25050)
+        self.assertEqual(from_kobo(-25050), Decimal("-250.50"))
+        entry = Transactions.withdrawal(self.wallets[0], Decimal("250.50"))
+        self.assertEqual((entry.entry_type, entry.amount), (EntryType.WITHDRAW, -25050))
+
+    def test_transfer_pair_shares_a_reference(self):
+        debit, credit = Transactions.transfer_pair(self.wallets[0], self.wallets[1], 300)
+        self.assertEqual((debit.amount, credit.amount), (-30000, 30000))
+        self.assertEqual(debit.reference, credit.reference)
+        self.assertEqual(debit.counterparty_id, self.wallets[1].pk)
+        self.assertEqual(credit.counterparty_id, self.wallets[0].pk)
+
+    def test_details_of_closed_counterparty(self):
+        Transactions.objects.bulk_create(
+            Transactions.transfer_pair(self.wallets[0], self.wallets[1], 300)
+        )
+        self.wallets[1].delete()
+        entry = Transactions.objects.get()
+        self.assertEqual(str(entry), "You transferred 300.00 naira to a closed wallet.")
+
+    def test_totals_are_aggregated_in_sql(self):
+        Transactions.objects.bulk_create(
+            [
+                Transactions.funding(self.wallets[0], 1000),
+                Transactions.withdrawal(self.wallets[0], Decimal("250.50")),
+                *Transactions.transfer_pair(self.wallets[0], self.wallets[1], 100),
+            ]
+        )
+        with self.assertNumQueries(1):
+            totals = Transactions.objects.filter(savings_id=self.wallets[0]).totals()
+        self.assertEqual(totals, {"inflow": 100000, "outflow": 35050})
+
+
+@override_settings(BALANCE_CHECKPOINT_INTERVAL=2)
+class BalanceCheckpointsTest(TestCase):
+    """This subclass tests the balance checkpoints used to compute past balances."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # set up two users with a savings wallet each for our tests.
+        cls.wallets = []
+        for username, first_name in [("jane", "Jane"), ("john", "John")]:
+            user = User.objects.create_user(username=username, password="2HJ1vRV0Z&3iD")
+            cls.wallets.append(
+                Savings.objects.create(first_name=first_name, last_name="Doe", user_id=user)
+            )
+
+    def test_checkpoint_is_recorded_when_the_interval_is_crossed(self):
+        wallet = self.wallets[0]
+        services.fund_wallet(wallet, Decimal("100"))
+        self.assertFalse(BalanceCheckpoint.objects.exists())
+        services.fund_wallet(wallet, Decimal("50"))
+        checkpoint = BalanceCheckpoint.objects.get()
+        self.assertEqual((checkpoint.balance, checkpoint.version), (Decimal("150.00"), 2))
+        self.assertEqual(
+            checkpoint.last_entry_id, Transactions.objects.latest("id").id
+        )
+
+    def test_bulk_writes_move_the_version_per_entry(self):
+        wallet = self.wallets[0]
+        lines = ["user_id,amount\n"] + [f"{wallet.user_id_id},100\n"] * 3
+        services.fund_wallets_from_csv(lines, "job")
+        # the three entries of the chunk crossed the interval, in a single write.
+        checkpoint = BalanceCheckpoint.objects.get()
+        self.assertEqual((checkpoint.balance, checkpoint.version), (Decimal("300.00"), 3))
+        self.assertEqual(wallet.balance_at(timezone.now()), Decimal("300.00"))
+
+    def test_balance_at_a_moment(self):
+        wallet = self.wallets[0]
+        start = timezone.now()
+        services.fund_wallet(wallet, Decimal("100"))
+        after_first = timezone.now()
+        services.fund_wallet(wallet, Decimal("50"))
+        after_second = timezone.now()
+        services.withdraw_from_wallet(wallet, Decimal("30.50"))
+        services.transfer_to_wallet(self.wallets[0].user_id, self.wallets[1], Decimal("20"))
+        self.assertEqual(wallet.balance_at(start), Decimal("0.00"))
+        self.assertEqual(wallet.balance_at(after_first), Decimal("100.00"))
+        self.assertEqual(wallet.balance_at(after_second), Decimal("150.00"))
+        self.assertEqual(wallet.balance_at(timezone.now()), Decimal("99.50"))
+        self.assertEqual(self.wallets[1].balance_at(timezone.now()), Decimal("20.00"))
+
+    def test_balance_at_starts_from_the_nearest_checkpoint(self):
+        wallet = self.wallets[0]
+        services.fund_wallet(wallet, Decimal("100"))
+        services.fund_wallet(wallet, Decimal("100"))
+        moment = timezone.now()
+        with self.assertNumQueries(4):
+            self.assertEqual(wallet.balance_at(moment), Decimal("200.00"))
+
+    def test_command_checkpoints_wallets_written_since_their_last_checkpoint(self):
+        services.fund_wallet(self.wallets[0], Decimal("100"))
+        out = StringIO()
+        call_command("checkpoint_balances", chunk_size=1, stdout=out)
+        self.assertIn("2 balance checkpoints recorded.", out.getvalue())
+        out = StringIO()
+        call_command("checkpoint_balances", stdout=out)
+        self.assertIn("0 balance checkpoints recorded.", out.getvalue())
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from wallet.models import DailyTotals, MonthlyTotals, Savings, Transactions
+from wallet.bulk import PayoutResult
+from wallet import rollups, services
+
+# The following classes handle tests for the daily and monthly ledger totals.
+
+
+class LedgerTotalsTest(TestCase):
+    """This subclass tests that the ledger totals follow every money-moving operation."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # set up two users with a savings wallet each for our tests.
+        cls.users, cls.wallets = [], []
+        for username, first_name in [("jane", "Jane"), ("john", "John")]:
+            user = User.objects.create_user(
+                username=username, email=f"{username}@gmail.com", password="2HJ1vRV0Z&3iD"
+            )
+            cls.users.append(user)
+            cls.wallets.append(
+                Savings.objects.create(first_name=first_name, last_name="Doe", user_id=user)
+            )
+
+    def totals(self, model, wallet):
+        return list(
+            model.objects.filter(savings_id=wallet).values_list("inflow", "outflow", "entries")
+        )
+
+    def move_money(self):
+        jane, john = self.wallets
+        services.fund_wallet(jane, Decimal("1000"))
+        services.withdraw_from_wallet(jane, Decimal("250.50"))
+        services.transfer_to_wallet(self.users[0], john, Decimal("100"))
+        services.transfer_to_emails(
+            self.users[0], [PayoutResult(0, "john@gmail.com", Decimal("50"))]
+        )
+
+    def test_operations_update_the_totals(self):
+        self.move_money()
+        jane, john = self.wallets
+        for model in [DailyTotals, MonthlyTotals]:
+            self.assertEqual(self.totals(model, jane), [(100000, 40050, 4)])
+            self.assertEqual(self.totals(model, john), [(15000, 0, 2)])
+        self.assertEqual(
+            DailyTotals.objects.get(savings_id=jane).period, timezone.localdate()
+        )
+        self.assertEqual(
+            MonthlyTotals.objects.get(savings_id=jane).period,
+            timezone.localdate().replace(day=1),
+        )
+
+    def test_totals_without_upsert(self):
+        with mock.patch.object(rollups.connection, "vendor", "mysql"):
+            self.move_money()
+        self.assertEqual(self.totals(DailyTotals, self.wallets[0]), [(100000, 40050, 4)])
+
+    def test_rebuild_matches_the_incremental_totals(self):
+        self.move_money()
+        # entries of earlier days are only added to the totals by a rebuild.
+        Transactions.objects.bulk_create([Transactions.funding(self.wallets[0], 10)])
+        Transactions.objects.filter(amount=1000).update(
+            date=timezone.now() - timedelta(days=40)
+        )
+        out = StringIO()
+        call_command("rebuild_ledger_totals", chunk_size=1, stdout=out)
+        self.assertIn("Ledger totals of 2 wallets rebuilt.", out.getvalue())
+        daily = DailyTotals.objects.filter(savings_id=self.wallets[0])
+        self.assertEqual(
+            list(daily.values_list("inflow", "outflow", "entries")),
+            [(1000, 0, 1), (100000, 40050, 4)],
+        )
+        self.assertEqual(self.totals(MonthlyTotals, self.wallets[1]), [(15000, 0, 2)])
+        self.assertEqual(MonthlyTotals.objects.filter(savings_id=self.wallets[0]).count(), 2)
+
+    def test_summary_reads_only_the_requested_periods(self):
+        self.move_money()
+        with self.assertNumQueries(2):
+            summary = rollups.summary(self.wallets[0], days=7, months=1)
+        self.assertEqual(
+            summary["daily"],
+            [
+                {
+                    "period": timezone.localdate(),
+                    "inflow": "1000.00",
+                    "outflow": "400.50",
+                    "entries": 4,
+                }
+            ],
+        )
+        self.assertEqual(len(summary["monthly"]), 1)
+        self.assertEqual(
+            rollups.month_totals(self.wallets[1]),
+            {"inflow": Decimal("150.00"), "outflow": Decimal("0.00")},
+        )
@@ -0,0 +1,193 @@
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase
+from django.contrib.auth.models import User
+from wallet.models import JobCheckpoint, Savings, Transactions
+from wallet.exceptions import (
+    InsufficientFunds,
+    InvalidAmount,
+    BeneficiaryNotFound,
+    JobConflict,
+)
+from wallet import services
+
+# The following classes handle tests for the wallet service layer.
+
+
+class WalletServicesTest(TestCase):
+    """This subclass tests the money-moving operations shared by the views and the API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # set up two users with a savings wallet each, and a third user without one.
+        cls.user_1 = User.objects.create_user(
+            username="jane", email="janedoe@gmail.com", password="1X<ISRUkw+tuK"
+        )
+        cls.user_2 = User.objects.create_user(
+            username="john", email="johndoe@gmail.com", password="2HJ1vRV0Z&3iD"
+        )
+        cls.user_3 = User.objects.create_user(
+            username="mary", email="marydoe@gmail.com", password="LENDSQR001"
+        )
+        cls.wallet_1 = Savings.objects.create(
+            first_name="Jane", last_name="Doe", balance=1000.00, user_id=cls.user_1
+        )
+        cls.wallet_2 = Savings.objects.create(
+            first_name="John", last_name="Doe", balance=200.00, user_id=cls.user_2
+        )
+
+    def test_fund_wallet(self):
+        update = services.fund_wallet(self.wallet_1, Decimal("250"))
+        self.assertEqual(update.balance, Decimal("1250.00"))
+        entry = Transactions.objects.get()
+        self.assertEqual((entry.entry_type, entry.amount), ("fund", 25000))
+        self.assertEqual(entry.describe(), "You funded your account with 250.00 naira.")
+
+    def test_amount_must_be_positive(self):
+        for amount in [Decimal("0"), Decimal("-100")]:
+            with self.assertRaises(InvalidAmount):
+                services.fund_wallet(self.wallet_1, amount)
+            with self.assertRaises(InvalidAmount):
+                services.withdraw_from_wallet(self.wallet_1, amount)
+            with self.assertRaises(InvalidAmount):
+                services.transfer_to_wallet(self.user_1, self.wallet_2, amount)
+        self.assertEqual(Transactions.objects.count(), 0)
+
+    def test_withdraw_from_wallet(self):
+        update = services.withdraw_from_wallet(self.wallet_1, Decimal("400"))
+        self.assertEqual(update.balance, Decimal("600.00"))
+        with self.assertRaises(InsufficientFunds):
+            services.withdraw_from_wallet(self.wallet_1, Decimal("600.01"))
+        self.assertEqual(Transactions.objects.count(), 1)
+
+    def test_find_beneficiary_by_name(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                services.find_beneficiary_by_name("JOHN", "doe"), self.wallet_2
+            )
+        with self.assertRaises(BeneficiaryNotFound):
+            services.find_beneficiary_by_name("Jack", "Doe")
+
+    def test_find_ambiguous_beneficiary_by_name(self):
+        Savings.objects.create(first_name="John", last_name="Doe", user_id=self.user_3)
+        with self.assertRaisesMessage(BeneficiaryNotFound, "More than one wallet"):
+            services.find_beneficiary_by_name("John", "Doe")
+
+    def test_transfer_to_email(self):
+        remitter_wallet, beneficiary_wallet = services.transfer_to_email(
+            self.user_1, "johndoe@gmail.com", Decimal("300")
+        )
+        self.assertEqual(remitter_wallet.balance, Decimal("700.00"))
+        self.assertEqual(beneficiary_wallet.balance, Decimal("500.00"))
+        self.assertEqual(Transactions.objects.count(), 2)
+
+    def test_transfer_to_email_errors(self):
+        with self.assertRaisesMessage(
+            BeneficiaryNotFound, "This beneficiary does not have a savings wallet."
+        ):
+            services.transfer_to_email(self.user_1, "marydoe@gmail.com", Decimal("300"))
+        with self.assertRaisesMessage(
+            BeneficiaryNotFound, "The beneficiary with email 'jack@gmail.com' does not exist."
+        ):
+            services.transfer_to_email(self.user_1, "jack@gmail.com", Decimal("300"))
+
+    def test_transfer_to_wallet(self):
+        remitter_wallet, beneficiary_wallet = services.transfer_to_wallet(
+            self.user_1, self.wallet_2, Decimal("300")
+        )
+        self.assertEqual(remitter_wallet.balance, Decimal("700.00"))
+        self.assertEqual(beneficiary_wallet.balance, Decimal("500.00"))
+
+
+class FundWalletsFromCSVTest(TestCase):
+    """This subclass tests the chunked, resumable funding of wallets from a CSV file."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # set up three users with an empty savings wallet each.
+        cls.wallets = []
+        for index in range(3):
+            user = User.objects.create_user(
+                username=f"user{index}", email=f"user{index}@gmail.com", password="LENDSQR001"
+            )
+            cls.wallets.append(
+                Savings.objects.create(first_name="Jane", last_name="Doe", user_id=user)
+            )
+        cls.lines = ["email,amount\n"] + [
+            f"user{index}@gmail.com,100\n" for index in range(3)
+        ] * 2
+
+    def balances(self):
+        return [Savings.objects.get(pk=wallet.pk).balance for wallet in self.wallets]
+
+    def test_rows_are_applied_in_chunks(self):
+        with CaptureQueriesContext(connection) as context:
+            report = services.fund_wallets_from_csv(self.lines, "job", chunk_size=2)
+        # savepoints only exist because the test itself runs in a transaction.
+        statements = [
+            query["sql"]
+            for query in context.captured_queries
+            if "SAVEPOINT" not in query["sql"]
+        ]
+        # the checkpoint is created, each chunk issues seven statements (including the
+        # balance checkpoints and the daily and monthly totals), and the job finishes.
+        self.assertEqual(len(statements), 2 + 7 * 3 + 1)
+        self.assertEqual((report.funded, report.failed), (6, 0))
+        self.assertEqual(self.balances(), [200, 200, 200])
+        self.assertEqual(JobCheckpoint.objects.get(name="job").position, 6)
+
+    def test_interrupted_job_resumes_after_last_committed_chunk(self):
+        def interrupt(report):
+            if report.rows == 4:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            services.fund_wallets_from_csv(self.lines, "job", chunk_size=2, progress=interrupt)
+        self.assertEqual(self.balances(), [200, 100, 100])
+
+        report = services.fund_wallets_from_csv(self.lines, "job", chunk_size=2)
+        self.assertEqual(report.resumed_from, 4)
+        self.assertEqual(report.funded, 6)
+        self.assertTrue(report.finished)
+        self.assertEqual(self.balances(), [200, 200, 200])
+        self.assertEqual(Transactions.objects.count(), 6)
+
+    def test_overlapping_runs_credit_each_row_once(self):
+        def rerun(report):
+            # a second run of the job starts after the first chunk and finishes it.
+            if report.rows == 2:
+                services.fund_wallets_from_csv(self.lines, "job", chunk_size=2)
+
+        with self.assertRaises(JobConflict):
+            services.fund_wallets_from_csv(self.lines, "job", chunk_size=2, progress=rerun)
+        self.assertEqual(self.balances(), [200, 200, 200])
+        self.assertEqual(Transactions.objects.count(), 6)
+        self.assertEqual(JobCheckpoint.objects.get(name="job").position, 6)
+
+    def test_invalid_user_ids_are_reported(self):
+        user_id = self.wallets[0].user_id_id
+        lines = [f"{user_id},100\n", "\u00b2,100\n", f"{2**63},100\n", f"00{user_id},50\n"]
+        report = services.fund_wallets_from_csv(lines, "job")
+        self.assertEqual((report.funded, report.failed), (2, 2))
+        self.assertEqual(
+            [error["error"] for error in report.errors],
+            ["'\u00b2' is not a valid user id.", f"'{2**63}' is not a valid user id."],
+        )
+        self.assertEqual(self.balances(), [150, 0, 0])
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as csv_file:
+            csv_file.writelines(self.lines + ["unknown@gmail.com,100\n"])
+        self.addCleanup(os.remove, csv_file.name)
+        out, err = StringIO(), StringIO()
+        call_command("fund_wallets_csv", csv_file.name, stdout=out, stderr=err)
+        self.assertIn("6 rows funded (600.00 naira), 1 rows failed", out.getvalue())
+        self.assertIn("Row 8:", err.getvalue())
+        # running the same file again does not fund the wallets twice.
+        call_command("fund_wallets_csv", csv_file.name, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(self.balances(), [200, 200, 200])
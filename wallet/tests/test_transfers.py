@@ -0,0 +1,197 @@
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.db import connection, OperationalError
+from django.db.models import Q
+from wallet.models import DailyTotals, MonthlyTotals, Savings, Transactions
+from wallet.exceptions import (
+    InsufficientFunds,
+    WalletNotFound,
+    BeneficiaryNotFound,
+    SelfTransfer,
+)
+from wallet import transfers
+
+# The following classes handle tests for the transfer engine.
+
+
+def deadlock_error():
+    """Returns a database error caused by a detected deadlock."""
+    cause = Exception("deadlock detected")
+    cause.pgcode = "40P01"
+    error = OperationalError(*cause.args)
+    error.__cause__ = cause
+    return error
+
+
+class TransferEngineTest(TestCase):
+    """This subclass tests that transfers move money atomically between two wallets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # set up two users with a savings wallet each for our tests.
+        cls.user_1 = user_1 = User.objects.create_user(
+            username="jane", password="1X<ISRUkw+tuK"
+        )
+        cls.user_3 = User.objects.create_user(username="mary", password="LENDSQR001")
+        user_2 = User.objects.create_user(
+            username="john", email="johndoe@gmail.com", password="2HJ1vRV0Z&3iD"
+        )
+        cls.remitter = Savings.objects.create(
+            first_name="Jane", last_name="Doe", balance=1000.00, user_id=user_1
+        )
+        cls.beneficiary = Savings.objects.create(
+            first_name="John", last_name="Doe", balance=200.00, user_id=user_2
+        )
+
+    def setUp(self):
+        transfers.stats.reset()
+
+    def test_transfer_moves_money_and_records_transactions(self):
+        remitter, beneficiary = transfers.transfer(
+            self.user_1, Q(user_id__email="johndoe@gmail.com"), Decimal("300")
+        )
+        self.assertEqual(remitter.balance, Decimal("700.00"))
+        self.assertEqual(beneficiary.balance, Decimal("500.00"))
+        self.remitter.refresh_from_db()
+        self.beneficiary.refresh_from_db()
+        self.assertEqual(self.remitter.balance, Decimal("700.00"))
+        self.assertEqual(self.beneficiary.balance, Decimal("500.00"))
+        self.assertEqual(
+            list(
+                Transactions.objects.values_list(
+                    "entry_type", "amount", "savings_id", "counterparty"
+                )
+            ),
+            [
+                ("transfer_out", -30000, self.remitter.id, self.beneficiary.id),
+                ("transfer_in", 30000, self.beneficiary.id, self.remitter.id),
+            ],
+        )
+        debit, credit = Transactions.objects.select_related("counterparty")
+        self.assertEqual(debit.reference, credit.reference)
+        self.assertEqual(debit.describe(), "You transferred 300.00 naira to John Doe.")
+        self.assertEqual(
+            credit.describe(), "You were credited with 300.00 naira from Jane Doe."
+        )
+        self.assertEqual(transfers.stats.snapshot()["transfers"], 1)
+
+    def test_transfer_stays_within_query_budget(self):
+        with CaptureQueriesContext(connection) as context:
+            transfers.transfer(
+                self.user_1, Q(user_id__email="johndoe@gmail.com"), Decimal("300")
+            )
+        # savepoints only exist because the test itself runs in a transaction.
+        statements = [
+            query["sql"]
+            for query in context.captured_queries
+            if "SAVEPOINT" not in query["sql"]
+        ]
+        # the ledger totals only share the INSERT of the transactions on PostgreSQL.
+        if connection.vendor != "postgresql":
+            totals = [DailyTotals._meta.db_table, MonthlyTotals._meta.db_table]
+            statements = [
+                sql for sql in statements if not any(table in sql for table in totals)
+            ]
+        self.assertEqual(transfers.TRANSFER_QUERY_BUDGET, 3)
+        self.assertLessEqual(len(statements), transfers.TRANSFER_QUERY_BUDGET)
+
+    def test_transfer_errors(self):
+        with self.assertRaises(WalletNotFound):
+            transfers.transfer(self.user_3, Q(pk=self.beneficiary.pk), Decimal("1"))
+        with self.assertRaises(BeneficiaryNotFound):
+            transfers.transfer(
+                self.user_1, Q(user_id__email="jack@gmail.com"), Decimal("1")
+            )
+        with self.assertRaises(SelfTransfer):
+            transfers.transfer(self.user_1, Q(pk=self.remitter.pk), Decimal("1"))
+        self.assertEqual(Transactions.objects.count(), 0)
+
+    def test_transfer_with_insufficient_funds(self):
+        with self.assertRaises(InsufficientFunds):
+            transfers.transfer(
+                self.user_1, Q(pk=self.beneficiary.pk), Decimal("1000.01")
+            )
+        self.remitter.refresh_from_db()
+        self.beneficiary.refresh_from_db()
+        self.assertEqual(self.remitter.balance, Decimal("1000.00"))
+        self.assertEqual(self.beneficiary.balance, Decimal("200.00"))
+        self.assertEqual(Transactions.objects.count(), 0)
+        self.assertEqual(transfers.stats.snapshot()["insufficient_funds"], 1)
+
+    def test_failed_transfer_is_rolled_back(self):
+        # simulate a crash after the debit and the credit have been applied.
+        with mock.patch.object(
+            Transactions.objects, "bulk_create", side_effect=RuntimeError("crash")
+        ):
+            with self.assertRaises(RuntimeError):
+                transfers.transfer(
+                    self.user_1, Q(pk=self.beneficiary.pk), Decimal("300")
+                )
+        self.remitter.refresh_from_db()
+        self.beneficiary.refresh_from_db()
+        self.assertEqual(self.remitter.balance, Decimal("1000.00"))
+        self.assertEqual(self.beneficiary.balance, Decimal("200.00"))
+
+    def test_backoff_is_bounded(self):
+        for attempt in range(1, 20):
+            self.assertLessEqual(transfers.backoff(attempt), transfers.MAX_BACKOFF)
+
+    def test_deadlock_errors_are_retryable(self):
+        self.assertTrue(transfers.is_retryable(deadlock_error()))
+        self.assertFalse(transfers.is_retryable(OperationalError("disk full")))
+
+
+class TransferEngineRetryTest(TransactionTestCase):
+    """This subclass tests that deadlocked transfers are retried outside of a transaction."""
+
+    def setUp(self):
+        transfers.stats.reset()
+        self.user_1 = user_1 = User.objects.create_user(
+            username="jane", password="1X<ISRUkw+tuK"
+        )
+        user_2 = User.objects.create_user(username="john", password="2HJ1vRV0Z&3iD")
+        self.remitter = Savings.objects.create(
+            first_name="Jane", last_name="Doe", balance=1000.00, user_id=user_1
+        )
+        self.beneficiary = Savings.objects.create(
+            first_name="John", last_name="Doe", balance=200.00, user_id=user_2
+        )
+
+    @mock.patch("wallet.transfers.time.sleep")
+    def test_deadlocked_transfer_is_retried(self, sleep):
+        transfer_once = transfers._transfer_once
+        errors = [deadlock_error()]
+
+        def deadlock_once(*args):
+            if errors:
+                raise errors.pop()
+            return transfer_once(*args)
+
+        with mock.patch(
+            "wallet.transfers._transfer_once", side_effect=deadlock_once
+        ) as patched:
+            transfers.transfer(self.user_1, Q(pk=self.beneficiary.pk), Decimal("300"))
+        self.assertEqual(patched.call_count, 2)
+        sleep.assert_called_once()
+        self.remitter.refresh_from_db()
+        self.assertEqual(self.remitter.balance, Decimal("700.00"))
+        snapshot = transfers.stats.snapshot()
+        self.assertEqual(snapshot["retries"], 1)
+        self.assertEqual(snapshot["transfers"], 1)
+
+    @mock.patch("wallet.transfers.time.sleep")
+    def test_transfer_gives_up_after_max_attempts(self, sleep):
+        with mock.patch(
+            "wallet.transfers._transfer_once", side_effect=deadlock_error()
+        ) as patched:
+            with self.assertRaises(OperationalError):
+                transfers.transfer(
+                    self.user_1, Q(pk=self.beneficiary.pk), Decimal("300")
+                )
+        self.assertEqual(patched.call_count, transfers.MAX_ATTEMPTS)
+        snapshot = transfers.stats.snapshot()
+        self.assertEqual(snapshot["retries"], transfers.MAX_ATTEMPTS - 1)
+        self.assertEqual(snapshot["failures"], 1)
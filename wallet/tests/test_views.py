@@ -1,6 +1,10 @@
+from decimal import Decimal
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from wallet.models import Savings, Transactions
+from wallet import services
 from django.urls import reverse
 
 # The following classes handle tests for the views.
@@ -46,6 +50,38 @@ class HomePageViewTest(TestCase):
         self.assertNotContains(response, "Wallet Balance")
         self.assertTemplateUsed(response, "wallet/homepage.html")
 
+    def test_wallet_is_looked_up_once(self):
+        user = User.objects.get(id=1)
+        Savings.objects.create(first_name="Jane", last_name="Doe", user_id=user)
+        self.client.login(username="jane", password="1X<ISRUkw+tuK")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("home"))
+        self.assertContains(response, "Wallet Balance")
+        wallet_queries = [
+            query for query in context.captured_queries
+            if 'FROM "wallet_savings"' in query["sql"]
+        ]
+        self.assertEqual(len(wallet_queries), 1)
+
+    def test_unchanged_homepage_is_not_modified(self):
+        user = User.objects.get(id=1)
+        wallet = Savings.objects.create(first_name="Jane", last_name="Doe", user_id=user)
+        self.client.login(username="jane", password="1X<ISRUkw+tuK")
+        # the first page sets the CSRF cookie of its logout form.
+        self.client.get(reverse("home"))
+        etag = self.client.get(reverse("home"))["ETag"]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # the transactions are not read to answer a revalidation.
+        tables = " ".join(query["sql"] for query in context.captured_queries)
+        self.assertNotIn("wallet_transactions", tables)
+        # a write to the wallet changes the page.
+        services.fund_wallet(wallet, Decimal("100"))
+        response = self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
     def test_user_has_a_wallet(self):
         user = User.objects.get(id=1)
         new_savings_wallet = Savings.objects.create(
@@ -65,6 +101,19 @@ class HomePageViewTest(TestCase):
         self.assertContains(response, "Wallet Balance")
         self.assertTemplateUsed(response, "wallet/homepage.html")
         
+    def test_homepage_shows_month_totals(self):
+        user = User.objects.get(id=1)
+        wallet = Savings.objects.create(first_name="Jane", last_name="Doe", user_id=user)
+        services.fund_wallet(wallet, Decimal("1000"))
+        services.withdraw_from_wallet(wallet, Decimal("250"))
+        self.client.login(username="jane", password="1X<ISRUkw+tuK")
+        response = self.client.get(reverse("home"))
+        self.assertEqual(
+            response.context["month_totals"],
+            {"inflow": Decimal("1000.00"), "outflow": Decimal("250.00")},
+        )
+        self.assertContains(response, "Money out: &#8358;250.00 Naira")
+
     def test_user_has_multiple_transactions(self):
         # get the current user.
         curr_user = User.objects.get(id=1)
@@ -116,6 +165,13 @@ class DefaultWalletViewTest(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertRedirects(response, expected_url="/", status_code=302)
 
+    def test_user_cannot_create_second_wallet(self):
+        login = self.client.login(username="jane", password="1X<ISRUkw+tuK")
+        self.client.post("/create-default/")
+        response = self.client.post("/create-default/")
+        self.assertRedirects(response, expected_url="/", status_code=302)
+        self.assertEqual(Savings.objects.count(), 1)
+
 
 class CustomWalletViewTest(TestCase):
     """This subclass tests the view responsible for creating the custom savings wallet."""
@@ -206,7 +262,7 @@ class NewFundsViewTest(TestCase):
         transaction = Transactions.objects.all().first()
         # confirm transaction details.
         self.assertEqual(
-            f"{transaction.details}", "You funded your account with 1000 naira"
+            transaction.describe(), "You funded your account with 1000.00 naira."
         )
 
 
@@ -255,8 +311,20 @@ class WithdrawFundsViewTest(TestCase):
         transaction = Transactions.objects.all().first()
         # confirm transaction details.
         self.assertEqual(
-            f"{transaction.details}", "You withdrew 300 naira from your account"
+            transaction.describe(), "You withdrew 300.00 naira from your account."
+        )
+
+    def test_user_does_not_have_enough_funds(self):
+        login = self.client.login(username="jane", password="1X<ISRUkw+tuK")
+        response = self.client.post("/withdraw-funds/", {"balance": "1500"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context["form"].errors["balance"],
+            ["You do not have enough funds in your savings wallet."],
         )
+        # confirm the wallet balance and transactions are unchanged.
+        self.assertEqual(int(Savings.objects.get(id=1).balance), 1000)
+        self.assertEqual(Transactions.objects.count(), 0)
 
 
 class TransferFundsViewTest(TestCase):
@@ -347,9 +415,23 @@ class TransferFundsViewTest(TestCase):
         # confirm transaction details.
         transaction = Transactions.objects.all().first()
         self.assertEqual(
-            f"{transaction.details}",
-            "You transferred 300 naira to John Doe (Access Bank)",
+            transaction.describe(), "You transferred 300.00 naira to John Doe."
+        )
+
+    def test_user_does_not_have_enough_funds(self):
+        login = self.client.login(username="jane", password="1X<ISRUkw+tuK")
+        response = self.client.post(
+            "/transfer-funds/", {"amount": "1500", "name": "John Doe", "bank": "AC"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context["form"].errors["amount"],
+            ["You do not have enough funds in your savings wallet for this transaction."],
         )
+        # confirm neither wallet balance has changed.
+        self.assertEqual(int(Savings.objects.get(first_name="Jane").balance), 1000)
+        self.assertEqual(int(Savings.objects.get(first_name="John").balance), 200)
+        self.assertEqual(Transactions.objects.count(), 0)
         
 class UserTransactionsViewTest(TestCase):
     """This subclass tests the view responsible for returning all the current user's past transactions."""
@@ -372,6 +454,18 @@ class UserTransactionsViewTest(TestCase):
         Transactions.objects.create(details="You funded your account with 400 naira", savings_id=user_2_savings_wallet)
         
         
+    def test_unchanged_transactions_are_not_modified(self):
+        self.client.login(username="jane", password="1X<ISRUkw+tuK")
+        # the first page sets the CSRF cookie of its logout form.
+        self.client.get("/user-transactions/")
+        etag = self.client.get("/user-transactions/")["ETag"]
+        response = self.client.get("/user-transactions/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # another user's page of the same URL has its own ETag.
+        self.client.login(username="john", password="2HJ1vRV0Z&3iD")
+        response = self.client.get("/user-transactions/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
     def test_user1_can_see_all_transactions(self):
         # log in as user_1.
         login = self.client.login(username="jane", password="1X<ISRUkw+tuK")
@@ -396,4 +490,42 @@ class UserTransactionsViewTest(TestCase):
         # assert template and it's content.
         self.assertContains(response, "Past Transactions")
         self.assertTrue('user_transactions' in response.context)
-        self.assertTemplateUsed(response, "wallet/transactions_list.html")
\ No newline at end of file
+        self.assertTemplateUsed(response, "wallet/transactions_list.html")
+
+    def test_user1_filters_transactions(self):
+        user_1_savings_wallet = Savings.objects.get(first_name="Jane")
+        for amount in range(25):
+            services.fund_wallet(user_1_savings_wallet, Decimal(amount + 1))
+        services.withdraw_from_wallet(user_1_savings_wallet, Decimal("5"))
+        self.client.login(username="jane", password="1X<ISRUkw+tuK")
+        response = self.client.get("/user-transactions/", {"entry_type": "withdraw"})
+        self.assertEqual(
+            [transaction.amount for transaction in response.context['user_transactions']], [-500]
+        )
+        # the pages of a filtered history keep its filters.
+        response = self.client.get("/user-transactions/", {"entry_type": "fund", "page_size": 10})
+        self.assertContains(response, "entry_type=fund&amp;page_size=10&amp;cursor=")
+        # invalid filters are reported and leave the history unfiltered.
+        response = self.client.get("/user-transactions/", {"min_amount": "10", "max_amount": "1"})
+        self.assertTrue(response.context['filters'].errors)
+        self.assertEqual(len(response.context['user_transactions']), 20)
+
+    def test_user1_pages_through_transactions(self):
+        user_1_savings_wallet = Savings.objects.get(first_name="Jane")
+        for amount in range(25):
+            Transactions.objects.create(details=f"You funded your account with {amount} naira", savings_id=user_1_savings_wallet)
+        # log in as user_1.
+        login = self.client.login(username="jane", password="1X<ISRUkw+tuK")
+        response = self.client.get("/user-transactions/")
+        self.assertEqual(response.status_code, 200)
+        # assert only the first page of 20 transactions is rendered, newest first.
+        self.assertEqual(len(response.context['user_transactions']), 20)
+        self.assertEqual(response.context['user_transactions'][0].details, "You funded your account with 24 naira")
+        self.assertIsNone(response.context['previous_cursor'])
+        self.assertContains(response, "Older")
+        # follow the cursor to the remaining transactions.
+        response = self.client.get("/user-transactions/", {"cursor": response.context['next_cursor']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['user_transactions']), 7)
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertIsNotNone(response.context['previous_cursor'])
@@ -0,0 +1,198 @@
+import random
+import threading
+import time
+from django.db import transaction, connection, OperationalError
+from django.db.models import BooleanField, Case, ExpressionWrapper, F, Q, When
+from .exceptions import (
+    InsufficientFunds,
+    WalletNotFound,
+    BeneficiaryNotFound,
+    SelfTransfer,
+)
+from .models import BalanceCheckpoint, Savings, Transactions, next_version
+from . import balance_cache, rollups
+
+# The following engine moves money between two wallets in a single database transaction.
+
+MAX_ATTEMPTS = 5
+
+# statements issued by a successful transfer, excluding transaction control. Backends other
+# than PostgreSQL take one more statement for each table of ledger totals.
+TRANSFER_QUERY_BUDGET = 3
+
+BASE_BACKOFF = 0.01  # seconds
+
+MAX_BACKOFF = 0.25  # seconds
+
+# SQLSTATE codes of serialization failures and detected deadlocks (PostgreSQL).
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+
+# error codes of detected deadlocks and lock wait timeouts (MySQL).
+RETRYABLE_MYSQL_ERRORS = {1213, 1205}
+
+
+class TransferStats:
+    """Thread-safe counters used to watch transfer throughput and lock contention."""
+
+    COUNTERS = ["transfers", "retries", "insufficient_funds", "failures"]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._started = time.monotonic()
+            self._counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def record(self, counter, count=1):
+        with self._lock:
+            self._counts[counter] += count
+
+    def snapshot(self):
+        """Returns the counters of this process along with the transfer throughput."""
+        with self._lock:
+            counts = dict(self._counts)
+            elapsed = time.monotonic() - self._started
+        counts["uptime_seconds"] = round(elapsed, 3)
+        counts["transfers_per_second"] = (
+            round(counts["transfers"] / elapsed, 3) if elapsed else 0.0
+        )
+        return counts
+
+
+stats = TransferStats()
+
+
+def is_retryable(error):
+    """Returns True if a database error was caused by a deadlock or serialization failure."""
+    cause = error.__cause__
+    if getattr(cause, "pgcode", None) in RETRYABLE_SQLSTATES:
+        return True
+    args = getattr(cause, "args", ())
+    return bool(args) and args[0] in RETRYABLE_MYSQL_ERRORS
+
+
+def backoff(attempt):
+    """Returns the capped, jittered delay to wait before the next attempt."""
+    delay = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def transfer(remitter_owner, beneficiary, amount):
+    """
+    Moves an amount from a user's wallet to the wallet selected by the `beneficiary` Q object.
+
+    The transfer is recorded as a debit and a credit entry sharing a reference (see
+    Transactions.transfer_pair). The happy path issues TRANSFER_QUERY_BUDGET
+    statements: one joined SELECT ... FOR UPDATE resolving and locking both wallets in
+    primary key order, one UPDATE applying both balance changes and one bulk INSERT of the
+    two transactions, which also adds them to the daily and monthly totals on PostgreSQL
+    (see wallet.rollups.save_and_record). Locking in a consistent order makes opposite transfers between the
+    same wallets queue behind each other instead of deadlocking; deadlocks and serialization
+    failures are still retried (see run_in_transaction).
+
+    Returns the (remitter, beneficiary) wallets carrying their new balances.
+    """
+    try:
+        result = run_in_transaction(
+            lambda: _transfer_once(remitter_owner, beneficiary, amount)
+        )
+    except InsufficientFunds:
+        stats.record("insufficient_funds")
+        raise
+    stats.record("transfers")
+    return result
+
+
+def run_in_transaction(operation):
+    """
+    Returns the result of running operation() in a transaction.
+
+    Deadlocks and serialization failures are retried with a bounded backoff, unless the
+    operation runs inside an outer transaction which would have to be retried as a whole.
+    """
+    attempts = 1 if connection.in_atomic_block else MAX_ATTEMPTS
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return operation()
+        except OperationalError as error:
+            if attempt == attempts or not is_retryable(error):
+                stats.record("failures")
+                raise
+            stats.record("retries")
+            time.sleep(backoff(attempt))
+
+
+def publish_wallets(wallets, updated, entries=1):
+    """
+    Moves locked wallets past a write of `entries` ledger entries each (see next_version)
+    and writes their balances through.
+    """
+    for wallet in wallets:
+        wallet.version += max(entries, 1)
+        wallet.updated = updated
+    balance_cache.publish(
+        [(wallet.pk, wallet.version, wallet.balance, wallet.updated) for wallet in wallets]
+    )
+
+
+def lock_for_update(wallets):
+    """Returns a wallet queryset locking only the wallet rows of its joins where supported."""
+    if connection.features.has_select_for_update_of:
+        return wallets.select_for_update(of=("self",))
+    return wallets.select_for_update()
+
+
+def _transfer_once(remitter_owner, beneficiary, amount):
+    remitter = Q(user_id=remitter_owner)
+    wallets = (
+        Savings.objects.select_related("user_id")
+        .filter(remitter | beneficiary)
+        .annotate(
+            is_remitter=ExpressionWrapper(remitter, output_field=BooleanField()),
+            is_beneficiary=ExpressionWrapper(beneficiary, output_field=BooleanField()),
+        )
+        .order_by("pk")
+    )
+
+    remitter_wallets, beneficiary_wallets = [], []
+    for wallet in lock_for_update(wallets):
+        if wallet.is_remitter:
+            remitter_wallets.append(wallet)
+        if wallet.is_beneficiary:
+            beneficiary_wallets.append(wallet)
+    if not remitter_wallets:
+        raise WalletNotFound(
+            "You cannot perform this transaction because you don't have a savings wallet."
+        )
+    if len(beneficiary_wallets) != 1:
+        raise BeneficiaryNotFound("The beneficiary of this transfer could not be found.")
+    remitter_wallet, beneficiary_wallet = remitter_wallets[0], beneficiary_wallets[0]
+    if remitter_wallet.pk == beneficiary_wallet.pk:
+        raise SelfTransfer("You cannot transfer funds to your own savings wallet.")
+    # both rows are locked, so the balance read above cannot change before the update.
+    if remitter_wallet.balance < amount:
+        raise InsufficientFunds(
+            "You do not have enough funds in your savings wallet for this transaction."
+        )
+
+    changes = next_version()
+    Savings.objects.filter(pk__in=[remitter_wallet.pk, beneficiary_wallet.pk]).update(
+        balance=Case(
+            When(pk=remitter_wallet.pk, then=F("balance") - amount),
+            default=F("balance") + amount,
+        ),
+        **changes,
+    )
+    remitter_wallet.balance -= amount
+    beneficiary_wallet.balance += amount
+    publish_wallets([remitter_wallet, beneficiary_wallet], changes["updated"])
+    rollups.save_and_record(
+        Transactions.transfer_pair(remitter_wallet, beneficiary_wallet, amount)
+    )
+    BalanceCheckpoint.objects.record_crossed(
+        {wallet.pk: wallet.version for wallet in [remitter_wallet, beneficiary_wallet]}
+    )
+    return remitter_wallet, beneficiary_wallet
@@ -1,13 +1,20 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.db import IntegrityError, transaction
+from django.http import Http404
+from django.shortcuts import render, redirect
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from .models import Savings, Transactions
-from .forms import SavingsForm, FundsForm, TransferForm
+from .forms import SavingsForm, FundsForm, TransferForm, TransactionFilterForm
+from .pagination import paginate_transactions, InvalidCursor
+from .exceptions import WalletError
+from .conditional import wallet_condition
+from . import rollups, services
 from django.views.generic import ListView
-from django.db.models import F
 
 # Create your views here.
+@method_decorator(wallet_condition, name="dispatch")
 class HomePageView(LoginRequiredMixin, ListView):
     """This view displays the user wallet homepage"""
 
@@ -16,61 +23,81 @@ class HomePageView(LoginRequiredMixin, ListView):
     template_name = "wallet/homepage.html"
 
     def get_queryset(self):
-        try:
-            savings_wallet = Savings.objects.get(user_id=self.request.user)
-        except Savings.DoesNotExist:
-            return None
-        else:
-            return savings_wallet
+        # the wallet is resolved once per request (see wallet.middleware).
+        return self.request.wallet or None
 
     def get_context_data(self, **kwargs):
         # Call the base implementation first to get a context.
         context = super().get_context_data(**kwargs)
         # Add in a QuerySet of the last five transactions.
-        try:
-            user_savings_wallet = Savings.objects.get(user_id=self.request.user)
-            user_transactions = Transactions.objects.filter(
-                savings_id=user_savings_wallet
-            ).order_by("-date")[:5]
-        except Savings.DoesNotExist:
-            context["transactions_history"] = None
-        else:
-            if not user_transactions:
-                context["transactions_history"] = None
-            else:
+        context["transactions_history"] = None
+        context["month_totals"] = None
+        if self.request.wallet:
+            context["month_totals"] = rollups.month_totals(self.request.wallet)
+            # the names of transfer counterparties are read by the same query.
+            user_transactions = (
+                Transactions.objects.filter(savings_id=self.request.wallet.pk)
+                .select_related("counterparty")
+                .order_by("-date", "-id")[:5]
+            )
+            if user_transactions:
                 context["transactions_history"] = user_transactions
-        finally:
-            return context
+        return context
 
 
+@method_decorator(wallet_condition, name="dispatch")
 class UserTransactionsView(LoginRequiredMixin, ListView):
-    """This view displays all the current user's past transactions"""
+    """This view displays the current user's past transactions one page at a time"""
 
     model = Transactions
     context_object_name = "user_transactions"
     template_name = "wallet/transactions_list.html"
 
     def get_queryset(self):
-        try:
-            user_savings_wallet = Savings.objects.get(user_id=self.request.user)
-            user_transactions = Transactions.objects.filter(
-                savings_id=user_savings_wallet
-            ).order_by("-date")
-        except Savings.DoesNotExist:
+        self.page = None
+        self.filters = TransactionFilterForm(self.request.GET)
+        if not self.request.wallet:
             return None
-        else:
-            return user_transactions
+        user_transactions = Transactions.objects.filter(
+            savings_id=self.request.wallet.pk
+        ).select_related("counterparty")
+        # invalid filters are shown with their errors and leave the history unfiltered.
+        if self.filters.is_valid():
+            user_transactions = user_transactions.matching(**self.filters.cleaned_data)
+        try:
+            self.page = paginate_transactions(
+                user_transactions,
+                cursor=self.request.GET.get("cursor"),
+                page_size=self.request.GET.get("page_size"),
+            )
+        except InvalidCursor:
+            # an unreadable cursor falls back to the first page.
+            self.page = paginate_transactions(user_transactions)
+        return self.page.rows
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Add in the cursors of the neighbouring pages.
+        context["next_cursor"] = self.page.next_cursor if self.page else None
+        context["previous_cursor"] = self.page.previous_cursor if self.page else None
+        context["filters"] = self.filters
+        return context
 
 
 @login_required
 def default_wallet(request):
     """This view renders a form to create a savings wallet with the current user's default credentials."""
     if request.method == "POST":
-        new_wallet = Savings.objects.create(
-            first_name=request.user.first_name,
-            last_name=request.user.last_name,
-            user_id=request.user,
-        )
+        try:
+            with transaction.atomic():
+                Savings.objects.create(
+                    first_name=request.user.first_name,
+                    last_name=request.user.last_name,
+                    user_id=request.user,
+                )
+        except IntegrityError:
+            # the user already has a wallet, which the homepage shows.
+            pass
         return redirect(reverse("home"))
     return render(request, "wallet/create_default.html")
 
@@ -83,7 +110,12 @@ def custom_wallet(request):
         if form.is_valid():
             savings_wallet = form.save(commit=False)
             savings_wallet.user_id = request.user
-            savings_wallet.save()
+            try:
+                with transaction.atomic():
+                    savings_wallet.save()
+            except IntegrityError:
+                # the user already has a wallet, which the homepage shows.
+                pass
             return redirect(reverse("home"))
     else:
         form = SavingsForm()
@@ -95,17 +127,18 @@ def custom_wallet(request):
 def new_funds(request):
     """This view renders a form to process funding of user wallets."""
     if request.method == "POST":
-        savings_wallet = get_object_or_404(Savings, user_id=request.user)
+        if not request.wallet:
+            raise Http404("You do not have a savings wallet.")
+        savings_wallet = request.wallet
         form = FundsForm(request.POST)
         if form.is_valid():
             amount = form.cleaned_data.get("balance")
-            savings_wallet.balance = F("balance") + amount
-            savings_wallet.save()
-            Transactions.objects.create(
-                details=f"You funded your account with {amount} naira",
-                savings_id=savings_wallet,
-            )
-            return redirect(reverse("home"))
+            try:
+                services.fund_wallet(savings_wallet, amount)
+            except WalletError as error:
+                form.add_error("balance", str(error))
+            else:
+                return redirect(reverse("home"))
     else:
         form = FundsForm()
     context = {"form": form}
@@ -116,67 +149,38 @@ def new_funds(request):
 def withdraw_funds(request):
     """This view renders a form to process fund withdrawals."""
     if request.method == "POST":
-        savings_wallet = get_object_or_404(Savings, user_id=request.user)
+        if not request.wallet:
+            raise Http404("You do not have a savings wallet.")
+        savings_wallet = request.wallet
         form = FundsForm(request.POST)
         if form.is_valid():
             amount = form.cleaned_data.get("balance")
-            savings_wallet.balance = F("balance") - amount
-            savings_wallet.save()
-            Transactions.objects.create(
-                details=f"You withdrew {amount} naira from your account",
-                savings_id=savings_wallet,
-            )
-            return redirect(reverse("home"))
+            try:
+                services.withdraw_from_wallet(savings_wallet, amount)
+            except WalletError as error:
+                form.add_error("balance", str(error))
+            else:
+                return redirect(reverse("home"))
     else:
         form = FundsForm()
     context = {"form": form}
     return render(request, "wallet/withdraw_funds.html", context)
 
 
-BANKS = {
-    "AC": "Access Bank",
-    "GTB": "Guaranteed Trust Bank",
-    "UBA": "UBA Bank",
-    "FB": "First Bank",
-    "FIDB": "Fidelity Bank",
-    "SIBTC": "Stanbic IBTC Bank",
-    "STB": "Sterling Bank",
-    "WB": "Wema Bank",
-    "UB": "Union Bank",
-    "ZB": "Zenith Bank",
-}
-
-
 @login_required
 def transfer_funds(request):
     """This renders a form to process funds transfer."""
     if request.method == "POST":
         form = TransferForm(request.POST)
         if form.is_valid():
-            name = form.cleaned_data["name"].strip()
-            beneficiary_firstname, beneficiary_lastname = name.split()
             amount = form.cleaned_data["amount"]
-            bank = form.cleaned_data["bank"]
-            beneficiary_bank = BANKS[bank]
-            remitter_savings_wallet = get_object_or_404(Savings, user_id=request.user)
-            remitter_savings_wallet.balance = F("balance") - amount
-            remitter_savings_wallet.save()
-            beneficiary_savings_wallet = get_object_or_404(
-                Savings,
-                first_name__iexact=beneficiary_firstname,
-                last_name__iexact=beneficiary_lastname,
-            )
-            beneficiary_savings_wallet.balance = F("balance") + amount
-            beneficiary_savings_wallet.save()
-            Transactions.objects.create(
-                details=f"You transferred {amount} naira to {beneficiary_savings_wallet.first_name.capitalize()} {beneficiary_savings_wallet.last_name.capitalize()} ({beneficiary_bank})",
-                savings_id=remitter_savings_wallet,
-            )
-            Transactions.objects.create(
-                details=f"You were credited with {amount} naira from {remitter_savings_wallet.first_name} {remitter_savings_wallet.last_name}",
-                savings_id=beneficiary_savings_wallet,
-            )
-            return redirect(reverse("home"))
+            try:
+                # the form has already resolved the beneficiary wallet.
+                services.transfer_to_wallet(request.user, form.beneficiary_wallet, amount)
+            except WalletError as error:
+                form.add_error("amount", str(error))
+            else:
+                return redirect(reverse("home"))
     else:
         form = TransferForm()
     context = {"form": form}